@@ -0,0 +1,122 @@
+"""Performance benchmarks of fynd_assignment
+
+Benchmarks run against a throwaway test database created from the
+configured DATABASES, so they never touch real data. Run them as modules,
+e.g. ``python -m benchmarks.loader --help``.
+"""
+import os
+import json
+import random
+import tempfile
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configures Django for standalone benchmark script"""
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fynd_assignment.settings')
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """Creates test database for duration of benchmark
+
+    Notes
+    -----
+    SQLite test database is created as temporary file instead of in memory,
+    so that it's shared with worker processes.
+    """
+
+    from django.db import connection
+    from django.test.utils import setup_databases, teardown_databases
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = \
+                os.path.join(directory, 'benchmark.sqlite3')
+
+        old_config = setup_databases(verbosity, interactive=False)
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity)
+
+
+def iter_records(rows, fixture_path):
+    """Yields rows movie records based on fixture, with unique names"""
+
+    from movies.ingest import parse_movie_item
+
+    with open(fixture_path) as file_obj:
+        movie_items = json.load(file_obj)
+
+    for index in range(rows):
+        movie_item = dict(movie_items[index % len(movie_items)])
+        movie_item['name'] = '{0} #{1}'.format(movie_item['name'], index)
+        yield parse_movie_item(movie_item)
+
+
+def iter_synthetic_records(rows, fixture_path, seed=0):
+    """Yields rows movie records drawn from distributions of fixture
+
+    Notes
+    -----
+    Directors, number of genres per movie and genres are drawn with their
+    frequencies in fixture, scores and popularity from fixture values with
+    noise. Names are made of words of fixture names and are unique. Same
+    seed yields same records.
+    """
+
+    rng = random.Random(seed)
+    with open(fixture_path) as file_obj:
+        movie_items = json.load(file_obj)
+
+    directors = [item['director'] for item in movie_items]
+    genre_counts = [len(item['genre']) for item in movie_items]
+    genres = [genre.strip() for item in movie_items
+              for genre in item['genre']]
+    distinct_genres = len(set(genres))
+    scores = [item['imdb_score'] for item in movie_items]
+    popularities = [item['99popularity'] for item in movie_items]
+    words = sorted(set(word for item in movie_items
+                       for word in item['name'].split()))
+
+    for index in range(rows):
+        movie_genres = set()
+        count = min(rng.choice(genre_counts), distinct_genres)
+        while len(movie_genres) < count:
+            movie_genres.add(rng.choice(genres))
+        yield {
+            'name': '{0} #{1}'.format(
+                ' '.join(rng.sample(words, rng.randint(1, 4))), index),
+            'director': rng.choice(directors),
+            'imdb_score': min(max(round(
+                rng.choice(scores) + rng.gauss(0, 0.3), 1), 1.0), 10.0),
+            'popularity': min(max(round(
+                rng.choice(popularities) + rng.gauss(0, 3), 1), 0.0), 99.0),
+            'genres': sorted(movie_genres),
+        }
+
+
+def load_catalogue(records, batch_size=1000):
+    """Creates movies of records with bulk writer
+
+    Returns
+    -------
+    list of int :
+        Primary keys of movies
+    """
+
+    from movies.bulk import MovieBulkWriter
+    from movies.cache import bump_catalogue_version
+    from movies.ingest import batched
+    from movies.models import Movie
+
+    writer = MovieBulkWriter()
+    for batch in batched(records, batch_size):
+        writer.write(batch)
+    bump_catalogue_version()
+    return list(Movie.objects.values_list('pk', flat=True))
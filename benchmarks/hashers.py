@@ -0,0 +1,181 @@
+"""Benchmark of password hashers and work factors, serial and pooled
+
+Usage:
+    python -m benchmarks.hashers --threads 1 2 4 --concurrency 16 \\
+        --setting pbkdf2_sha256:iterations=36000 \\
+        --setting argon2:time_cost=2,memory_cost=65536,parallelism=2
+
+Each setting is hasher algorithm (see PASSWORD_HASHER) and its work
+factors:
+
+    pbkdf2_sha256 - iterations
+    argon2        - time_cost, memory_cost (KiB), parallelism
+    bcrypt_sha256 - rounds
+
+For each setting passwords are hashed for 'duration' seconds serially,
+then by 'concurrency' client threads through hashing pool
+(users.hashers.HashingPool) of each number of threads. Settings whose
+hasher library isn't installed are reported as skipped. Result is printed
+as JSON: hashes/s and milliseconds per hash.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+
+from benchmarks import setup_django
+
+# Settings of work factors of each hasher
+WORK_FACTORS = {
+    'pbkdf2_sha256': {'iterations': 'PASSWORD_PBKDF2_ITERATIONS'},
+    'argon2': {'time_cost': 'PASSWORD_ARGON2_TIME_COST',
+               'memory_cost': 'PASSWORD_ARGON2_MEMORY_COST',
+               'parallelism': 'PASSWORD_ARGON2_PARALLELISM'},
+    'bcrypt_sha256': {'rounds': 'PASSWORD_BCRYPT_ROUNDS'},
+}
+
+DEFAULT_SETTINGS = [
+    'pbkdf2_sha256:iterations=36000',
+    'pbkdf2_sha256:iterations=100000',
+    'argon2:time_cost=2,memory_cost=512,parallelism=2',
+    'argon2:time_cost=2,memory_cost=65536,parallelism=2',
+    'bcrypt_sha256:rounds=12',
+]
+
+
+def parse_setting(value):
+    """Returns algorithm and Django settings of 'algorithm:name=value,..'
+
+    Raises
+    ------
+    <argparse.ArgumentTypeError> :
+        if algorithm or work factor is unknown
+    """
+
+    algorithm, _, factors = value.partition(':')
+    if algorithm not in WORK_FACTORS:
+        raise argparse.ArgumentTypeError(
+            'Unknown hasher {0}'.format(algorithm))
+
+    overrides = dict()
+    for factor in filter(None, factors.split(',')):
+        name, _, number = factor.partition('=')
+        if name not in WORK_FACTORS[algorithm]:
+            raise argparse.ArgumentTypeError(
+                'Unknown work factor {0} of {1}'.format(name, algorithm))
+        overrides[WORK_FACTORS[algorithm][name]] = int(number)
+    return algorithm, overrides
+
+
+def hash_serially(duration):
+    """Returns number of passwords hashed in duration and elapsed seconds"""
+
+    from django.contrib.auth.hashers import make_password
+
+    count = 0
+    started_at = time.perf_counter()
+    deadline = started_at + duration
+    while time.perf_counter() < deadline:
+        make_password('benchmark password {0}'.format(count))
+        count += 1
+    return count, time.perf_counter() - started_at
+
+
+def hash_pooled(threads, concurrency, duration):
+    """Returns number of passwords hashed in duration by pool of threads,
+    requested by concurrency clients, and elapsed seconds"""
+
+    from django.contrib.auth.hashers import make_password
+    from users.hashers import HashingPool
+
+    pool = HashingPool(max_workers=threads, max_pending=concurrency)
+    counts = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        while time.perf_counter() < deadline:
+            pool.run(make_password, 'benchmark password {0}'.format(index))
+            counts[index] += 1
+
+    started_at = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(index,))
+               for index in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return sum(counts), time.perf_counter() - started_at
+
+
+def run(hasher_settings, threads, concurrency, duration):
+    """Hashes passwords with each setting
+
+    Returns
+    -------
+    list of dict :
+        Hashes per second and milliseconds per hash, serially and with
+        each number of threads, for each setting
+    """
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.test import override_settings
+
+    results = list()
+    for value in hasher_settings:
+        algorithm, overrides = parse_setting(value)
+        result = {'setting': value}
+        with override_settings(
+                PASSWORD_HASHERS=[settings.PASSWORD_HASHER_CLASSES[
+                    algorithm]], **overrides):
+            try:
+                make_password('benchmark password')
+            except ValueError as error:
+                # Library of hasher isn't installed
+                result['skipped'] = str(error)
+                results.append(result)
+                continue
+
+            count, elapsed = hash_serially(duration)
+            result['serial'] = {
+                'hashes_per_second': round(count / elapsed, 1),
+                'ms_per_hash': round(elapsed * 1000 / count, 2),
+            }
+            result['pooled'] = list()
+            for thread_count in threads:
+                count, elapsed = hash_pooled(thread_count, concurrency,
+                                             duration)
+                result['pooled'].append({
+                    'threads': thread_count,
+                    'concurrency': concurrency,
+                    'hashes_per_second': round(count / elapsed, 1),
+                })
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--setting', action='append', dest='settings')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=3)
+    args = parser.parse_args(argv)
+
+    hasher_settings = args.settings or DEFAULT_SETTINGS
+    for value in hasher_settings:
+        try:
+            parse_setting(value)
+        except argparse.ArgumentTypeError as error:
+            parser.error(str(error))
+
+    setup_django()
+    results = run(hasher_settings, args.threads, args.concurrency,
+                  args.duration)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
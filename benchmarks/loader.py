@@ -0,0 +1,87 @@
+"""Benchmark of 'loadmoviedata' throughput against number of workers
+
+Usage:
+    python -m benchmarks.loader --rows 100000 --workers 1 2 4 8
+
+Synthetic catalogue is generated from movies of fixtures/imdb.json with
+unique names. Each run loads it into empty database with
+'loadmoviedata --bulk'. Measure with MySQL to see parallel writers, SQLite
+allows one writer at a time.
+
+Result is printed as JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+from benchmarks import setup_django, benchmark_database
+
+
+def write_catalogue(path, rows, fixture_path):
+    """Writes JSON Lines catalogue of rows movies based on fixture"""
+
+    with open(fixture_path) as file_obj:
+        movie_items = json.load(file_obj)
+
+    with open(path, 'w') as file_obj:
+        for index in range(rows):
+            movie_item = dict(movie_items[index % len(movie_items)])
+            movie_item['name'] = '{0} #{1}'.format(movie_item['name'], index)
+            file_obj.write(json.dumps(movie_item) + '\n')
+
+
+def run(rows, workers_list, batch_size, fixture_path):
+    """Loads catalogue once for each number of workers
+
+    Returns
+    -------
+    list of dict :
+        Rows loaded per second for each number of workers
+    """
+
+    from io import StringIO
+    from django.core.management import call_command
+    from movies.models import Movie
+
+    results = list()
+    with tempfile.TemporaryDirectory() as directory, benchmark_database():
+        path = os.path.join(directory, 'catalogue.jsonl')
+        write_catalogue(path, rows, fixture_path)
+
+        for workers in workers_list:
+            call_command('flush', interactive=False, verbosity=0)
+
+            started_at = time.monotonic()
+            call_command('loadmoviedata', path, bulk=True, workers=workers,
+                         batch_size=batch_size, stdout=StringIO())
+            elapsed = time.monotonic() - started_at
+
+            assert Movie.objects.count() == rows
+            results.append({
+                'workers': workers,
+                'rows': rows,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows / elapsed, 1)
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--fixture', default='fixtures/imdb.json')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = run(args.rows, args.workers, args.batch_size, args.fixture)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
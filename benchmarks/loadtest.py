@@ -0,0 +1,259 @@
+"""Load test of movie search served by gunicorn in each serving mode
+
+Usage:
+    python -m benchmarks.loadtest --modes sync gthread --concurrency 32
+
+Synthetic catalogue is loaded into benchmark database, then for each mode
+(see gunicorn.conf.py) gunicorn is started against it and '/movie/search/'
+is requested by 'concurrency' client threads for 'duration' seconds. Each
+request opens new connection and authenticates with Basic (password
+hashing on every request) or Token authentication.
+
+Searches rotate through '--query' strings. Unless '--cached' is given,
+each request has unique '_' parameter, so response cache of app is missed.
+
+Server processes are pointed at benchmark database with DATABASE_URL, so
+settings must read database from it (django_heroku does). Result is
+printed as JSON: requests/s and latency percentiles per mode.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import argparse
+import itertools
+import subprocess
+import threading
+from http.client import HTTPConnection
+from urllib.parse import quote
+
+from benchmarks import setup_django, benchmark_database, iter_records, \
+    load_catalogue
+
+GUNICORN = [sys.executable, '-c',
+            'from gunicorn.app.wsgiapp import run; run()']
+
+DEFAULT_QUERIES = [
+    'ordering=-imdb_score',
+    'genre=drama&min_imdb_score=7',
+    'min_99popularity=50&max_99popularity=90&ordering=-99popularity',
+    'name=star',
+    'director=steven&page_size=50',
+]
+
+
+def get_database_url(settings_dict):
+    """Returns DATABASE_URL of database settings"""
+
+    engine = settings_dict['ENGINE'].rsplit('.', 1)[-1]
+    if engine == 'sqlite3':
+        return 'sqlite:///{0}'.format(settings_dict['NAME'])
+
+    scheme = {'mysql': 'mysql', 'postgresql': 'postgres',
+              'postgresql_psycopg2': 'postgres'}[engine]
+    return '{0}://{1}:{2}@{3}:{4}/{5}'.format(
+        scheme, quote(settings_dict['USER'], safe=''),
+        quote(settings_dict['PASSWORD'], safe=''),
+        settings_dict['HOST'] or 'localhost', settings_dict['PORT'] or '',
+        settings_dict['NAME'])
+
+
+def get_free_port():
+    """Returns TCP port free on loopback interface"""
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, workers, threads, port, database_url):
+    """Starts gunicorn in mode and waits until it accepts connections"""
+
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=mode,
+               WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               DATABASE_URL=database_url)
+    env.pop('PORT', None)
+    process = subprocess.Popen(
+        GUNICORN + ['-c', 'gunicorn.conf.py', '--bind',
+                    '127.0.0.1:{0}'.format(port), 'fynd_assignment.wsgi'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited with {0}'.format(
+                process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError('gunicorn did not start in 30 seconds')
+
+
+def stop_server(process):
+    """Stops gunicorn gracefully"""
+
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def request(port, path, headers):
+    """Returns status of GET request on new connection"""
+
+    connection = HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def load(port, paths, headers, concurrency, duration):
+    """Requests paths from concurrency threads for duration seconds
+
+    Returns
+    -------
+    (list of float, int, float) :
+        Latencies of successful requests in seconds, number of failed
+        requests and elapsed seconds
+    """
+
+    counter = itertools.count()
+    latencies = list()
+    errors = list()
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < deadline:
+            path = paths(next(counter))
+            started_at = time.monotonic()
+            try:
+                success = request(port, path, headers) == 200
+            except OSError:
+                success = False
+            latency = time.monotonic() - started_at
+            with lock:
+                (latencies if success else errors).append(latency)
+
+    started_at = time.monotonic()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return latencies, len(errors), time.monotonic() - started_at
+
+
+def percentile(values, percent):
+    """Returns percentile of sorted values, nearest rank"""
+
+    if not values:
+        return None
+    rank = max(int(-(-len(values) * percent // 100)), 1)
+    return values[rank - 1]
+
+
+def get_auth_header(auth, username, password):
+    """Returns Authorization header of benchmark user"""
+
+    from users.models import AuthToken
+    from django.contrib.auth.models import User
+
+    user = User.objects.get(username=username)
+    if auth == 'token':
+        return 'Token ' + AuthToken.issue(user)[1]
+    credentials = '{0}:{1}'.format(username, password).encode('utf-8')
+    return 'Basic ' + base64.b64encode(credentials).decode('ascii')
+
+
+def run(modes, workers, threads, concurrency, duration, rows, queries,
+        cached, auth, fixture_path):
+    """Load tests movie search once for each mode
+
+    Returns
+    -------
+    list of dict :
+        Requests per second and latency percentiles for each mode
+    """
+
+    from django.db import connection
+    from django.contrib.auth.models import User
+
+    def paths(index):
+        path = '/movie/search/?' + queries[index % len(queries)]
+        return path if cached else '{0}&_={1}'.format(path, index)
+
+    results = list()
+    with benchmark_database():
+        load_catalogue(iter_records(rows, fixture_path))
+        User.objects.create_user(username='loadtest', password='loadtest')
+        headers = {'Authorization': get_auth_header(auth, 'loadtest',
+                                                    'loadtest')}
+        database_url = get_database_url(connection.settings_dict)
+
+        for mode in modes:
+            port = get_free_port()
+            process = start_server(mode, workers, threads, port,
+                                   database_url)
+            try:
+                # Warm up workers, connections and caches of app
+                load(port, paths, headers, concurrency, min(duration, 2))
+                latencies, errors, elapsed = load(
+                    port, paths, headers, concurrency, duration)
+            finally:
+                stop_server(process)
+
+            latencies.sort()
+            results.append({
+                'mode': mode,
+                'workers': workers,
+                'threads': threads if mode == 'gthread' else 1,
+                'concurrency': concurrency,
+                'requests': len(latencies),
+                'errors': errors,
+                'requests_per_second': round(len(latencies) / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1)
+                if latencies else None,
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1)
+                if latencies else None,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread'],
+                        choices=['sync', 'gthread'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--query', action='append', dest='queries')
+    parser.add_argument('--cached', action='store_true')
+    parser.add_argument('--auth', choices=['basic', 'token'],
+                        default='basic')
+    parser.add_argument('--fixture', default='fixtures/imdb.json')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = run(args.modes, args.workers, args.threads, args.concurrency,
+                  args.duration, args.rows, args.queries or DEFAULT_QUERIES,
+                  args.cached, args.auth, args.fixture)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
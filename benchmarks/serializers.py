@@ -0,0 +1,103 @@
+"""Benchmark of movie read paths: MovieSerializer against row fast path
+
+Usage:
+    python -m benchmarks.serializers --rows 20000 --page-size 100
+
+Synthetic catalogue is generated from movies of fixtures/imdb.json with
+unique names. Each path reads whole catalogue page by page, serializes and
+renders it to JSON, as MovieSearchView does:
+
+    model - instances with prefetched genres, MovieSerializer
+    rows  - 'Movie.objects.as_rows()', MovieRowSerializer
+
+Rendered pages of both paths are checked to be identical. Result is
+printed as JSON.
+"""
+import sys
+import json
+import time
+import argparse
+
+from benchmarks import setup_django, benchmark_database, iter_records, \
+    load_catalogue
+
+
+def read_pages(path, page_size):
+    """Returns rendered pages of catalogue read with path"""
+
+    from rest_framework.renderers import JSONRenderer
+    from movies.models import Movie
+    from movies.serializers import MovieRowSerializer, MovieSerializer
+
+    if path == 'model':
+        queryset = Movie.objects.with_genres()
+        serializer_class = MovieSerializer
+    else:
+        queryset = Movie.objects.as_rows()
+        serializer_class = MovieRowSerializer
+
+    renderer = JSONRenderer()
+    pages = list()
+    last_pk = 0
+    while True:
+        page = list(queryset.filter(pk__gt=last_pk).order_by('pk')[
+            :page_size])
+        if not page:
+            return pages
+        pages.append(renderer.render(
+            serializer_class(page, many=True).data))
+        last = page[-1]
+        last_pk = last['id'] if isinstance(last, dict) else last.pk
+
+
+def run(rows, page_size, repeat, fixture_path):
+    """Reads catalogue with each path, best of repeat runs
+
+    Returns
+    -------
+    list of dict :
+        Rows read per second for each path
+    """
+
+    results = list()
+    with benchmark_database():
+        load_catalogue(iter_records(rows, fixture_path))
+
+        rendered = dict()
+        for path in ('model', 'rows'):
+            timings = list()
+            for _ in range(repeat):
+                started_at = time.monotonic()
+                rendered[path] = read_pages(path, page_size)
+                timings.append(time.monotonic() - started_at)
+
+            elapsed = min(timings)
+            results.append({
+                'path': path,
+                'rows': rows,
+                'page_size': page_size,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows / elapsed, 1)
+            })
+
+        assert rendered['model'] == rendered['rows'], \
+            'Paths rendered different output'
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--fixture', default='fixtures/imdb.json')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = run(args.rows, args.page_size, args.repeat, args.fixture)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -39,10 +41,12 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django_filters',
     'users',
-    'movies'
+    'movies.apps.MoviesConfig'
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.PerformanceMiddleware',
+    'utils.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,10 +79,105 @@ WSGI_APPLICATION = 'fynd_assignment.wsgi.application'
 # Rest framework global settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
+        'users.authentication.BasicAuthentication',
+        'users.authentication.TokenAuthentication',
     )
 }
 
+# Authentication tokens verified recently are cached in each process.
+# Revoked token may be accepted by other processes until it expires from cache
+AUTH_TOKEN_CACHE_SIZE = 1024
+AUTH_TOKEN_CACHE_TTL = 60
+
+# Passwords are verified with hashing pool of users.hashers
+AUTHENTICATION_BACKENDS = ['users.backends.ModelBackend']
+
+# New passwords are hashed with PASSWORD_HASHER: 'pbkdf2_sha256', 'argon2'
+# (requires argon2-cffi) or 'bcrypt_sha256' (requires bcrypt), with work
+# factors below. Hashes of other hashers or work factors are upgraded in
+# background when user logs in.
+# Passwords are hashed by PASSWORD_HASHING_THREADS threads per process.
+# When PASSWORD_HASHING_QUEUE passwords are pending, requests wait at most
+# PASSWORD_HASHING_TIMEOUT seconds for room, then fail with 503 status
+PASSWORD_HASHER = 'pbkdf2_sha256'
+PASSWORD_PBKDF2_ITERATIONS = 36000
+PASSWORD_ARGON2_TIME_COST = 2
+PASSWORD_ARGON2_MEMORY_COST = 512
+PASSWORD_ARGON2_PARALLELISM = 2
+PASSWORD_BCRYPT_ROUNDS = 12
+PASSWORD_HASHING_THREADS = 2
+PASSWORD_HASHING_QUEUE = 64
+PASSWORD_HASHING_TIMEOUT = 10
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2_sha256': 'users.hashers.PBKDF2PasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'bcrypt_sha256': 'users.hashers.BCryptSHA256PasswordHasher',
+}
+
+# Users registered in bulk are validated and inserted in chunks of
+# USER_BULK_CHUNK_SIZE. Bulk registration endpoint hashes passwords with
+# threads above, or with pool of USER_BULK_PROCESSES processes if 2 or
+# more, kept by each web worker (provisionusers command has its own pool).
+# Endpoint takes at most USER_BULK_MAX_ROWS users per request
+USER_BULK_CHUNK_SIZE = 500
+USER_BULK_PROCESSES = 0
+USER_BULK_MAX_ROWS = 1000
+
+# Maximum number of operations in a batch of bulk movie endpoint
+MOVIE_BULK_MAX_ITEMS = 1000
+
+# Movie search and detail responses are cached in each process, for
+# MOVIE_CACHE_TTL seconds or until movie catalogue changes. Other processes
+# see catalogue changes after at most MOVIE_CACHE_VERSION_TTL seconds.
+# Set MOVIE_CACHE_ALIAS to alias of CACHES to share cached responses
+# between processes
+MOVIE_CACHE_SIZE = 512
+MOVIE_CACHE_TTL = 300
+MOVIE_CACHE_VERSION_TTL = 5
+MOVIE_CACHE_ALIAS = None
+
+# Movie search filters are evaluated on in-memory snapshot of catalogue when
+# enabled. Requires NumPy, which is optional. Snapshot is rebuilt from
+# scratch every MOVIE_COLUMNAR_REBUILD_INTERVAL seconds and refreshed with
+# modified movies in between
+MOVIE_COLUMNAR_SEARCH = False
+MOVIE_COLUMNAR_REBUILD_INTERVAL = 300
+
+# Number of movies fetched per query while streaming search exports
+MOVIE_EXPORT_CHUNK_SIZE = 500
+
+# Database connection of each thread is kept open and reused for
+# DATABASE_CONN_MAX_AGE seconds (0 closes it at end of each request, None
+# never closes it).
+# With DATABASE_POOL, connections are instead returned at end of each
+# request to pool of process shared by its threads (utils.db.pool): at
+# most DATABASE_POOL_MAX_SIZE connections per process, closed after
+# DATABASE_POOL_IDLE_TIMEOUT seconds idle and pinged before reuse with
+# DATABASE_POOL_PRE_PING. Request waits at most DATABASE_POOL_TIMEOUT
+# seconds for free connection. Statistics of pool are served at /db/pool/
+DATABASE_CONN_MAX_AGE = 600
+DATABASE_POOL = False
+DATABASE_POOL_MAX_SIZE = 10
+DATABASE_POOL_IDLE_TIMEOUT = 300
+DATABASE_POOL_TIMEOUT = 10
+DATABASE_POOL_PRE_PING = True
+
+# Fraction of requests instrumented by PerformanceMiddleware, with timings
+# sent in Server-Timing header and logged to 'utils.perf' logger.
+# Percentiles of last PERF_WINDOW_SIZE instrumented requests of each view
+# are served to staff at /perf/
+PERF_SAMPLE_RATE = 0.1
+PERF_WINDOW_SIZE = 1000
+
+# Queries of each request are checked against budget of its view
+# (utils.querybudget) by QueryBudgetMiddleware, in debug mode by default.
+# Similar queries run QUERY_BUDGET_REPEAT_THRESHOLD times or more (N+1) and
+# exceeded budgets are logged to 'utils.querybudget' logger, exceeded
+# budgets fail requests with QUERY_BUDGET_STRICT
+QUERY_BUDGET_CHECKS = DEBUG
+QUERY_BUDGET_STRICT = False
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -130,6 +229,37 @@ except ImportError as e:
 
 
 # Update Database options
-DATABASES['default']['OPTIONS'] = {
-    'sql_mode': 'STRICT_TRANS_TABLES'
-}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.mysql':
+    DATABASES['default']['OPTIONS'] = {
+        'sql_mode': 'STRICT_TRANS_TABLES'
+    }
+elif 'postgresql' not in DATABASES['default']['ENGINE']:
+    # SSL required by django_heroku is option of Postgres connections only
+    DATABASES['default'].get('OPTIONS', {}).pop('sslmode', None)
+
+# Persistent or pooled database connections
+DATABASES['default']['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+if DATABASE_POOL:
+    POOLED_ENGINES = {
+        'django.db.backends.mysql': 'utils.db.backends.mysql',
+        'django.db.backends.sqlite3': 'utils.db.backends.sqlite3',
+    }
+    if DATABASES['default']['ENGINE'] not in POOLED_ENGINES:
+        raise ImproperlyConfigured(
+            'DATABASE_POOL is supported with {0} engines only, not {1}. '
+            'Use DATABASE_CONN_MAX_AGE instead.'.format(
+                ', '.join(sorted(POOLED_ENGINES)),
+                DATABASES['default']['ENGINE']))
+    DATABASES['default'].update({
+        'ENGINE': POOLED_ENGINES[DATABASES['default']['ENGINE']],
+        'CONN_MAX_AGE': 0,
+    })
+
+# Hasher of new passwords first, others verify existing hashes, as every
+# default hasher of Django does
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + sorted(
+    hasher for algorithm, hasher in PASSWORD_HASHER_CLASSES.items()
+    if algorithm != PASSWORD_HASHER) + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptPasswordHasher',
+]
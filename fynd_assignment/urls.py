@@ -16,8 +16,12 @@ Including another URLconf
 from django.conf.urls import url, include
 from django.contrib import admin
 
+from utils.views import DatabasePoolStatsView, PerformanceStatsView
+
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
     url(r'^user/', include('users.urls')),
-    url(r'^movie/', include('movies.urls'))
+    url(r'^movie/', include('movies.urls')),
+    url(r'^db/pool/$', DatabasePoolStatsView.as_view()),
+    url(r'^perf/$', PerformanceStatsView.as_view())
 ]
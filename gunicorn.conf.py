@@ -0,0 +1,50 @@
+"""Gunicorn configuration of fynd_assignment
+
+Usage (see Procfile):
+    gunicorn -c gunicorn.conf.py fynd_assignment.wsgi
+
+Serving mode is selected with GUNICORN_WORKER_CLASS environment variable:
+
+    gthread (default) - each worker process serves up to GUNICORN_THREADS
+        requests at once, in threads. Thread waiting on MySQL query or
+        hashing password (PBKDF2 of Basic authentication) releases the GIL,
+        so other requests of the worker go on meanwhile. Concurrency is
+        WEB_CONCURRENCY * GUNICORN_THREADS.
+    sync - each worker process serves one request at a time. Concurrency
+        is WEB_CONCURRENCY.
+
+Django 1.11 has no ASGI support, and mysqlclient is a C library which
+gevent can't patch, so its queries would block every greenlet of the
+worker. Threads are the supported high-concurrency mode.
+
+Database connections are per thread: each thread opens its own connection
+and keeps it for CONN_MAX_AGE seconds (set by django_heroku from
+DATABASE_URL), threads of worker being reused. MySQL must accept
+WEB_CONCURRENCY * GUNICORN_THREADS connections per instance of app.
+In-process caches of app (movies.cache, utils.cache, movies.columnar) are
+shared by threads of worker and guarded by locks.
+
+Environment variables:
+    PORT                  - port to listen on, all interfaces
+    WEB_CONCURRENCY       - number of worker processes (default 2)
+    GUNICORN_WORKER_CLASS - 'gthread' or 'sync' (default 'gthread')
+    GUNICORN_THREADS      - threads per gthread worker (default 8)
+    GUNICORN_TIMEOUT      - seconds before silent worker is restarted
+                            (default 30)
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Gunicorn switches sync workers to gthread when threads > 1
+threads = int(os.environ.get('GUNICORN_THREADS', 8)) \
+    if worker_class == 'gthread' else 1
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+# Idle client connections are kept open by gthread workers only
+keepalive = 5
+
+if 'PORT' in os.environ:
+    bind = '0.0.0.0:{0}'.format(os.environ['PORT'])
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class MoviesConfig(AppConfig):
     name = 'movies'
+
+    def ready(self):
+        """Connects signal handlers keeping modification time of movies
+        current and invalidating cached responses"""
+
+        from . import cache, signals
+        signals.connect_signals()
+        cache.connect_signals()
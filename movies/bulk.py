@@ -0,0 +1,303 @@
+import json
+from collections import Counter, OrderedDict
+
+from django.db import IntegrityError, connection, connections, \
+    transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from .cache import bump_catalogue_version
+from .ingest import batched
+from .models import Movie, Genre
+
+# Fields of Movie written from movie records
+MOVIE_FIELDS = ('name', 'director', 'imdb_score', 'popularity')
+
+
+def resolve_genres(genre_names, known_genres=None):
+    """Creates genres missing in DB with single bulk insert
+
+    Parameters
+    ----------
+    genre_names : iterable of str
+        Names of genres
+    known_genres : set, optional
+        Names of genres known to exist in DB. Updated with resolved names
+
+    Returns
+    -------
+    int :
+        Number of genres created
+    """
+
+    genre_names = set(genre_names)
+    known_genres = set() if known_genres is None else known_genres
+    missing = genre_names - known_genres
+    if not missing:
+        return 0
+
+    missing -= set(Genre.objects.filter(
+        pk__in=missing).values_list('pk', flat=True))
+    if missing:
+        try:
+            with transaction.atomic():
+                Genre.objects.bulk_create(
+                    [Genre(genre_name=name) for name in sorted(missing)])
+        except IntegrityError:
+            # Created concurrently by other writer, create remaining ones
+            for name in missing:
+                Genre.objects.get_or_create(genre_name=name)
+
+    known_genres.update(genre_names)
+    return len(missing)
+
+
+def link_genres(movie_genres, replace=False):
+    """Associates genres to movies with single bulk insert of through rows
+
+    Parameters
+    ----------
+    movie_genres : dict
+        Maps movie id to iterable of genre names
+    replace : bool
+        If True, existing genres of movies are replaced instead of being
+        kept
+
+    Returns
+    -------
+    int :
+        Number of associations created
+
+    Notes
+    -----
+    Modification time of movies whose genres changed is updated.
+    """
+
+    through = Movie.genres.through
+    movie_ids = list(movie_genres)
+    if not movie_ids:
+        return 0
+
+    if replace:
+        through.objects.filter(movie_id__in=movie_ids).delete()
+        existing = set()
+    else:
+        existing = set(through.objects.filter(
+            movie_id__in=movie_ids).values_list('movie_id', 'genre_id'))
+
+    rows = [through(movie_id=movie_id, genre_id=genre_name)
+            for movie_id, genre_names in movie_genres.items()
+            for genre_name in OrderedDict.fromkeys(genre_names)
+            if (movie_id, genre_name) not in existing]
+    through.objects.bulk_create(rows)
+
+    # Bulk insert doesn't send signals, movies are touched here
+    touched = movie_ids if replace else set(row.movie_id for row in rows)
+    if touched:
+        Movie.objects.filter(pk__in=touched).touch()
+    return len(rows)
+
+
+def movie_key(name, director):
+    """Returns (name, director) key of movie, compared as DB compares it
+
+    Notes
+    -----
+    Default collations of MySQL are case-insensitive, so keys differing in
+    case only are of one movie there, and are casefolded.
+    """
+
+    if connection.vendor == 'mysql':
+        return name.casefold(), director.casefold()
+    return name, director
+
+
+def fetch_movies(keys):
+    """Returns dict mapping (name, director) keys to movies found in DB
+
+    Notes
+    -----
+    Keys are matched as DB matches them, see 'movie_key'.
+    """
+
+    names = set(name for name, _ in keys)
+    directors = set(director for _, director in keys)
+    movies = {movie_key(movie.name, movie.director): movie for movie in
+              Movie.objects.filter(name__in=names, director__in=directors)}
+    return {key: movies[movie_key(*key)] for key in keys
+            if movie_key(*key) in movies}
+
+
+def create_movies(movies_data):
+    """Creates movies with single bulk insert and associates their genres
+
+    Parameters
+    ----------
+    movies_data : list of dict
+        Validated data of MovieSerializer. Movies must be unique on
+        (name, director) and must not exist in DB
+
+    Returns
+    -------
+    list of <movies.models.Movie> :
+        Created movies with primary keys, in order of movies_data
+    """
+
+    movies = list()
+    genres = list()
+    for data in movies_data:
+        data = dict(data)
+        data.pop('genre_mode', None)
+        genres.append([genre.pk for genre in data.pop('genres', ())])
+        movies.append(Movie(**data))
+    Movie.objects.bulk_create(movies)
+
+    # Primary keys of bulk created movies are set only on some backends
+    if any(movie.pk is None for movie in movies):
+        created = fetch_movies(set((movie.name, movie.director)
+                                   for movie in movies))
+        for movie in movies:
+            movie.pk = created[(movie.name, movie.director)].pk
+
+    link_genres(OrderedDict((movie.pk, genre_names) for movie, genre_names
+                            in zip(movies, genres) if genre_names))
+    bump_catalogue_version()
+    return movies
+
+
+def update_movies(changes):
+    """Updates movies with one UPDATE query per field and associates genres
+    with bulk inserts
+
+    Parameters
+    ----------
+    changes : list of (<movies.models.Movie>, dict)
+        Movie and validated data of MovieSerializer partial update. Genres
+        are appended to movie, or replace its genres if 'genre_mode' is
+        'replace'
+    """
+
+    field_values = OrderedDict()
+    appended, replaced = OrderedDict(), OrderedDict()
+    for movie, data in changes:
+        data = dict(data)
+        genre_mode = data.pop('genre_mode', 'append')
+        if 'genres' in data:
+            genres = appended if genre_mode == 'append' else replaced
+            genres[movie.pk] = [genre.pk for genre in data.pop('genres')]
+        for field, value in data.items():
+            setattr(movie, field, value)
+            field_values.setdefault(field, OrderedDict())[movie.pk] = value
+
+    modified_at = timezone.now()
+    for field, values in field_values.items():
+        output_field = Movie._meta.get_field(field)
+        Movie.objects.filter(pk__in=list(values)).update(
+            modified_at=modified_at, **{field: Case(
+                *[When(pk=pk, then=Value(value))
+                  for pk, value in values.items()],
+                output_field=output_field)})
+
+    link_genres(appended)
+    link_genres(replaced, replace=True)
+    if changes:
+        bump_catalogue_version()
+
+
+class MovieBulkWriter(object):
+    """Writes batches of movie records with set-based queries
+
+    Notes
+    -----
+    Movie record is a dict with keys 'name', 'director', 'imdb_score',
+    'popularity' and 'genres' (list of genre names).
+
+    Movies are unique on (name, director), compared as DB compares them
+    (see 'movie_key'). Movie already existing in DB, or repeated in input,
+    isn't created again; genres of every occurrence are
+    associated to it, same as 'get_or_create' would do.
+
+    Each batch costs constant number of queries: lookup and insert of
+    genres, lookup and insert of movies and lookup and insert of genre
+    associations.
+
+    Catalogue version isn't bumped for each batch, caller bumps it once all
+    batches are written (see movies.cache).
+    """
+
+    def __init__(self):
+        self.known_genres = set()
+        self.stats = Counter()
+
+    def write(self, records):
+        """Writes batch of movie records in single transaction"""
+
+        with transaction.atomic():
+            self._write(records)
+
+    def _write(self, records):
+        batch = OrderedDict()
+        for record in records:
+            key = movie_key(record['name'], record['director'])
+            if key in batch:
+                batch[key]['genres'].extend(record['genres'])
+            else:
+                batch[key] = dict(record, genres=list(record['genres']))
+        self.stats['records'] += len(records)
+
+        self.stats['genres_created'] += resolve_genres(
+            set(name for record in batch.values()
+                for name in record['genres']),
+            self.known_genres)
+
+        # Records of batch are keyed by 'movie_key', movies are fetched
+        # with (name, director) of their first occurrence
+        movies = {movie_key(*key): movie for key, movie in fetch_movies(set(
+            (record['name'], record['director'])
+            for record in batch.values())).items()}
+        new_movies = [Movie(**{field: record[field] for field in MOVIE_FIELDS})
+                      for key, record in batch.items() if key not in movies]
+        Movie.objects.bulk_create(new_movies)
+        self.stats['movies_created'] += len(new_movies)
+        self.stats['movies_existing'] += len(movies)
+
+        # Primary keys of bulk created movies are set only on some backends
+        if any(movie.pk is None for movie in new_movies):
+            movies.update((movie_key(*key), movie) for key, movie in
+                          fetch_movies(set((movie.name, movie.director)
+                                           for movie in new_movies)).items())
+        else:
+            movies.update((movie_key(movie.name, movie.director), movie)
+                          for movie in new_movies)
+
+        self.stats['genre_links_created'] += link_genres(OrderedDict(
+            (movies[key].pk, record['genres'])
+            for key, record in batch.items()))
+
+
+def write_shard(task):
+    """Writes movie records of shard file in batches, used by worker processes
+
+    Parameters
+    ----------
+    task : (str, int, set)
+        Path of shard file (JSON Lines of movie records), number of records
+        per batch and names of genres known to exist in DB
+
+    Returns
+    -------
+    <collections.Counter> :
+        Statistics of MovieBulkWriter
+    """
+
+    path, batch_size, known_genres = task
+    writer = MovieBulkWriter()
+    writer.known_genres.update(known_genres)
+    try:
+        with open(path, 'r', encoding='utf-8') as file_obj:
+            records = (json.loads(line) for line in file_obj)
+            for batch in batched(records, batch_size):
+                writer.write(batch)
+    finally:
+        connections.close_all()
+    return writer.stats
@@ -0,0 +1,119 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from utils.cache import LRUCache, VersionedCache
+from .models import CatalogueVersion, Genre, Movie
+
+# Catalogue version read from DB, cached per process. Other processes see
+# version bumped by a write after at most MOVIE_CACHE_VERSION_TTL seconds
+_version_cache = LRUCache(
+    maxsize=1, ttl=getattr(settings, 'MOVIE_CACHE_VERSION_TTL', 5))
+
+# Bumps of current thread are deferred while it is not None
+_deferred = threading.local()
+
+
+def get_catalogue_version():
+    """Returns current version of movie catalogue
+
+    Notes
+    -----
+    Version read inside a transaction isn't cached, as it may be bumped by
+    the transaction and must not be seen by other threads before commit.
+    """
+
+    version = _version_cache.get('version')
+    if version is not None:
+        return version
+
+    version = CatalogueVersion.objects.filter(pk=1).values_list(
+        'version', flat=True).first() or 0
+    if not transaction.get_connection().in_atomic_block:
+        _version_cache.set('version', version)
+    return version
+
+
+# Data of movie search and detail responses, for current catalogue version
+response_cache = VersionedCache(
+    get_version=get_catalogue_version,
+    maxsize=getattr(settings, 'MOVIE_CACHE_SIZE', 512),
+    ttl=getattr(settings, 'MOVIE_CACHE_TTL', 300),
+    alias=getattr(settings, 'MOVIE_CACHE_ALIAS', None),
+    prefix='movies')
+
+
+def bump_catalogue_version():
+    """Increments version of movie catalogue, invalidating cached responses
+
+    Notes
+    -----
+    Version is incremented by the UPDATE of current transaction, so other
+    processes see new version only once writes are committed. Catalogue
+    writers are serialized by lock on version row until they commit.
+    """
+
+    if getattr(_deferred, 'pending', None) is not None:
+        _deferred.pending = True
+        return
+
+    updated = CatalogueVersion.objects.filter(pk=1).update(
+        version=F('version') + 1)
+    if not updated:
+        CatalogueVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    _version_cache.clear()
+    transaction.on_commit(_version_cache.clear)
+
+
+@contextmanager
+def deferred_bump():
+    """Coalesces catalogue version bumps of block into single bump on exit
+
+    Notes
+    -----
+    Used by writers of many movies, which would otherwise bump version for
+    every movie saved or deleted.
+    """
+
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+
+    _deferred.pending = False
+    try:
+        yield
+    finally:
+        pending, _deferred.pending = _deferred.pending, None
+        if pending:
+            bump_catalogue_version()
+
+
+def invalidate_catalogue(sender, **kwargs):
+    """Bumps catalogue version once Movie, Genre or their association is
+    written"""
+
+    action = kwargs.get('action')
+    if action is None or action.startswith('post_'):
+        bump_catalogue_version()
+
+
+def connect_signals():
+    """Connects catalogue invalidation to writes of movies and genres
+
+    Notes
+    -----
+    Bulk queries don't send signals, writers using them must call
+    'bump_catalogue_version'.
+    """
+
+    for model in (Movie, Genre):
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_catalogue, sender=model,
+                           dispatch_uid='movies.cache.invalidate_catalogue')
+    m2m_changed.connect(invalidate_catalogue, sender=Movie.genres.through,
+                        dispatch_uid='movies.cache.invalidate_catalogue')
@@ -0,0 +1,502 @@
+import copy
+import time
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from utils.pagination import get_field_value
+from utils.querybudget import unbudgeted
+from utils.search import get_search_terms
+from .cache import get_catalogue_version
+from .models import Movie
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Rows modified this long before latest modification seen are read again on
+# refresh, so rows written by transactions committed late aren't missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+# Range filters of MovieFilter: (parameter, column, True for lower bound)
+RANGE_FILTERS = (
+    ('min_imdb_score', 'imdb_score', True),
+    ('max_imdb_score', 'imdb_score', False),
+    ('min_99popularity', 'popularity', True),
+    ('max_99popularity', 'popularity', False),
+)
+
+
+def to_microseconds(value):
+    """Returns microseconds since epoch of aware datetime"""
+
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+
+
+def select_top(ids, values, limit, descending):
+    """Returns positions of first limit rows ordered by (value, id)
+
+    Parameters
+    ----------
+    ids : <numpy.ndarray>
+        Primary keys of rows
+    values : <numpy.ndarray> or None
+        Values of ordering field, NaN for NULL (smallest value). Rows are
+        ordered by ids only if None
+    limit : int
+        Number of rows to select
+    descending : bool
+        If True, rows are ordered by descending (value, id)
+
+    Notes
+    -----
+    Rows are selected with partial sort (introselect) in linear time, then
+    only selected rows are sorted.
+    """
+
+    keys = ids.astype(np.float64) if values is None else np.where(
+        np.isnan(values), -np.inf, values)
+    ties = ids
+    if descending:
+        keys, ties = -keys, -ids
+
+    candidates = np.arange(len(ids))
+    if limit < len(ids):
+        kth = np.partition(keys, limit - 1)[limit - 1]
+        # Rows with value equal to kth value are ordered by id below
+        candidates = np.flatnonzero(keys <= kth)
+    order = np.lexsort((ties[candidates], keys[candidates]))
+    return candidates[order[:limit]]
+
+
+class InternedColumn(object):
+    """Column of strings stored as codes into array of distinct strings
+
+    Notes
+    -----
+    Predicates are evaluated once per distinct string and mapped to rows
+    through codes, names of directors repeat a lot.
+    """
+
+    def __init__(self, values):
+        distinct = sorted(set(values))
+        self.positions = {value: code for code, value in enumerate(distinct)}
+        self.codes = np.fromiter((self.positions[value] for value in values),
+                                 dtype=np.int32, count=len(values))
+        self.lowered = np.array([value.lower() for value in distinct],
+                                dtype=str)
+
+    def merge(self, keep, other, order):
+        """Returns column of rows of this column kept and rows of other
+        column, in order
+
+        Parameters
+        ----------
+        keep : <numpy.ndarray>
+            Mask of rows of this column kept
+        other : <movies.columnar.InternedColumn>
+            Column of rows appended
+        order : <numpy.ndarray>
+            Positions of merged rows, in new order
+
+        Notes
+        -----
+        Strings of other column not in this one are appended to distinct
+        strings, strings no longer used are kept until snapshot is rebuilt.
+        Only distinct strings of other column are looked up in Python.
+        """
+
+        column = copy.copy(self)
+        column.positions = self.positions.copy()
+        translation = np.empty(len(other.positions), dtype=np.int32)
+        added = list()
+        for value, code in other.positions.items():
+            if value not in column.positions:
+                column.positions[value] = len(column.positions)
+                added.append(value.lower())
+            translation[code] = column.positions[value]
+
+        if added:
+            column.lowered = np.concatenate(
+                [self.lowered, np.array(added, dtype=str)])
+        column.codes = np.concatenate(
+            [self.codes[keep], translation[other.codes]])[order]
+        return column
+
+    def word_prefix(self, term):
+        """Returns (match mask, rank) of rows for search term
+
+        Row matches if any word of string starts with term. Rank is 2 if
+        string starts with term, else 1, same as LIKE fallback of
+        'utils.search.text_search'.
+        """
+
+        starts = np.char.startswith(self.lowered, term)
+        matches = starts | (np.char.find(self.lowered, ' ' + term) >= 0)
+        return matches[self.codes], np.where(starts, 2.0, 1.0)[self.codes]
+
+
+class ColumnarSnapshot(object):
+    """Columnar copy of movie catalogue
+
+    Parameters
+    ----------
+    rows : dict
+        Maps movie id to (name, director, imdb_score, popularity,
+        modified_at, genre names)
+
+    Notes
+    -----
+    Rows are sorted by id. Scores are float arrays where NULL is NaN, so
+    range predicates don't match NULL, as in SQL. Genres are stored as
+    bitmap of movies (rows) and genres (columns).
+
+    Snapshot isn't modified once built, searches of other threads may read
+    it while catalogue changes are applied to a copy (see 'patch').
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.built_at = time.monotonic()
+
+        ids = sorted(rows)
+        values = [rows[pk] for pk in ids]
+        count = len(ids)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.name = InternedColumn([row[0] for row in values])
+        self.director = InternedColumn([row[1] for row in values])
+        self.columns = {
+            'imdb_score': np.array([row[2] for row in values],
+                                   dtype=np.float64),
+            'popularity': np.array([row[3] for row in values],
+                                   dtype=np.float64),
+        }
+        self.modified_at = np.fromiter(
+            (to_microseconds(row[4]) for row in values), dtype=np.int64,
+            count=count)
+
+        self.genre_names = sorted(set(
+            genre for row in values for genre in row[5]))
+        positions = {genre: index
+                     for index, genre in enumerate(self.genre_names)}
+        self.genres = np.zeros((count, len(self.genre_names)), dtype=bool)
+        for index, row in enumerate(values):
+            for genre in row[5]:
+                self.genres[index, positions[genre]] = True
+
+    @property
+    def latest_modification(self):
+        """Returns latest modification time of movies, None if empty"""
+
+        if not len(self.modified_at):
+            return None
+        return EPOCH + timedelta(microseconds=int(self.modified_at.max()))
+
+    def patch(self, rows, deleted, version):
+        """Returns snapshot of version with rows changed and movies deleted
+
+        Parameters
+        ----------
+        rows : dict
+            Rows of movies changed or added, as for ColumnarSnapshot
+        deleted : <numpy.ndarray>
+            Ids of movies deleted
+
+        Notes
+        -----
+        Only changed rows are converted in Python. Arrays of this snapshot
+        are copied without rows changed or deleted, changed rows are
+        appended and arrays are reordered by id with vectorized operations,
+        so refresh doesn't cost full rebuild. Time of build is kept, patched
+        snapshot is rebuilt from scratch when this one would be.
+        """
+
+        changed = ColumnarSnapshot(rows, version)
+        keep = ~np.isin(self.ids, np.concatenate([changed.ids, deleted]))
+        ids = np.concatenate([self.ids[keep], changed.ids])
+        order = np.argsort(ids, kind='mergesort')
+
+        snapshot = copy.copy(self)
+        snapshot.version = version
+        snapshot.ids = ids[order]
+        snapshot.name = self.name.merge(keep, changed.name, order)
+        snapshot.director = self.director.merge(keep, changed.director,
+                                                order)
+        snapshot.columns = {
+            column: np.concatenate(
+                [values[keep], changed.columns[column]])[order]
+            for column, values in self.columns.items()}
+        snapshot.modified_at = np.concatenate(
+            [self.modified_at[keep], changed.modified_at])[order]
+
+        known = set(self.genre_names)
+        snapshot.genre_names = self.genre_names + [
+            genre for genre in changed.genre_names if genre not in known]
+        positions = {genre: index
+                     for index, genre in enumerate(snapshot.genre_names)}
+        kept = np.count_nonzero(keep)
+        snapshot.genres = np.zeros(
+            (kept + len(changed.ids), len(snapshot.genre_names)), dtype=bool)
+        snapshot.genres[:kept, :len(self.genre_names)] = self.genres[keep]
+        snapshot.genres[kept:, [positions[genre] for genre in
+                                changed.genre_names]] = changed.genres
+        snapshot.genres = snapshot.genres[order]
+        return snapshot
+
+
+class ColumnarResult(object):
+    """Movies matched by in-memory search
+
+    Notes
+    -----
+    Exposes 'keyset_page' used by KeysetPagination in place of QuerySet.
+    Movies of page are fetched from 'queryset' by primary key, as model
+    instances or rows depending on queryset.
+    """
+
+    def __init__(self, snapshot, mask, relevance, queryset):
+        self.snapshot = snapshot
+        self.rows = np.flatnonzero(mask)
+        self.relevance = None if relevance is None else relevance[self.rows]
+        self.annotations = {} if relevance is None else {
+            'relevance': self.relevance}
+        self.queryset = queryset
+
+    def count(self):
+        """Returns number of movies found"""
+
+        return len(self.rows)
+
+    def get_values(self, field):
+        """Returns values of ordering field for movies found"""
+
+        if field == 'pk':
+            return self.snapshot.ids[self.rows]
+        if field == 'relevance':
+            return self.relevance
+        return self.snapshot.columns[field][self.rows]
+
+    def keyset_page(self, field, descending, position, limit):
+        """Returns up to limit movies following position in ordering
+
+        Notes
+        -----
+        Ordering and position conditions are same as of
+        'utils.pagination.KeysetPagination': ordered by field, then by
+        primary key, NULL values being smallest. Only movies of page are
+        sorted and fetched.
+        """
+
+        ids = self.snapshot.ids[self.rows]
+        values = self.get_values(field)
+        candidates = np.arange(len(ids))
+        if position is not None:
+            candidates = np.flatnonzero(self.get_keyset_mask(
+                field, ids, values, position, descending))
+
+        order = select_top(ids[candidates], None if field == 'pk' else
+                           values[candidates], limit, descending)
+        order = candidates[order]
+        page_ids = ids[order].tolist()
+        movies = {get_field_value(movie, 'pk'): movie for movie in
+                  self.queryset.filter(pk__in=page_ids).order_by()}
+        if self.relevance is not None:
+            for pk, relevance in zip(page_ids, self.relevance[order].tolist()):
+                movie = movies.get(pk)
+                if isinstance(movie, dict):
+                    movie['relevance'] = relevance
+                elif movie is not None:
+                    movie.relevance = relevance
+        return [movies[pk] for pk in page_ids if pk in movies]
+
+    @staticmethod
+    def get_keyset_mask(field, ids, values, position, descending):
+        """Returns mask of rows following (value, pk) position"""
+
+        value, pk = position
+        if field == 'pk':
+            return ids < pk if descending else ids > pk
+
+        isnull = np.isnan(values)
+        if descending:
+            if value is None:
+                return isnull & (ids < pk)
+            value = float(value)
+            return (values < value) | ((values == value) & (ids < pk)) | \
+                isnull
+
+        if value is None:
+            return (isnull & (ids > pk)) | ~isnull
+        value = float(value)
+        return (values > value) | ((values == value) & (ids > pk))
+
+
+class ColumnarSearch(object):
+    """In-memory search of movie catalogue with vectorized predicates
+
+    Notes
+    -----
+    Snapshot of catalogue is refreshed when catalogue version changes
+    (movies.cache), e.g. by signals of movie writes of this process.
+    Refresh reads only movies modified since latest modification seen,
+    and ids of movies if some were deleted, and patches them into copy of
+    snapshot (see 'ColumnarSnapshot.patch'). Snapshot is rebuilt from
+    scratch every 'rebuild_interval' seconds.
+
+    Full-text search on MySQL isn't reproduced, such searches are left to
+    ORM (see 'supports').
+    """
+
+    def __init__(self, rebuild_interval=300):
+        self.rebuild_interval = rebuild_interval
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Drops snapshot, next search reads whole catalogue"""
+
+        with self._lock:
+            self.snapshot = None
+
+    def supports(self, params):
+        """Returns True if search with filter values can be evaluated in
+        memory"""
+
+        if connection.vendor != 'mysql':
+            return True
+        return not any(params.get(field) for field in ('name', 'director'))
+
+    def get_snapshot(self, version=None):
+        """Returns snapshot of catalogue version, current one if None"""
+
+        if version is None:
+            version = get_catalogue_version()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version and \
+                time.monotonic() - snapshot.built_at < self.rebuild_interval:
+            return snapshot
+
+        # Snapshot is reused by following searches, its queries aren't
+        # charged to budget of search building it
+        with self._lock, unbudgeted():
+            snapshot = self.snapshot
+            if snapshot is None or time.monotonic() - snapshot.built_at >= \
+                    self.rebuild_interval:
+                self.snapshot = ColumnarSnapshot(
+                    self.read_rows(Movie.objects.all()), version)
+            elif snapshot.version != version:
+                self.snapshot = self.refresh(snapshot, version)
+            return self.snapshot
+
+    @staticmethod
+    def read_rows(queryset):
+        """Returns snapshot rows of movies in queryset"""
+
+        rows = {
+            pk: (name, director, imdb_score, popularity, modified_at, [])
+            for pk, name, director, imdb_score, popularity, modified_at in
+            queryset.values_list('pk', 'name', 'director', 'imdb_score',
+                                 'popularity', 'modified_at').iterator()}
+
+        through = Movie.genres.through.objects.all()
+        if queryset.query.where:
+            through = through.filter(movie_id__in=list(rows))
+        for movie_id, genre in through.values_list(
+                'movie_id', 'genre_id').iterator():
+            if movie_id in rows:
+                rows[movie_id][5].append(genre)
+        return rows
+
+    def refresh(self, snapshot, version):
+        """Returns snapshot of version, patched with movies modified since
+        snapshot and without movies deleted since
+
+        Notes
+        -----
+        Ids of all movies are read only if number of movies tells some
+        were deleted.
+        """
+
+        latest = snapshot.latest_modification
+        if latest is None:
+            return ColumnarSnapshot(self.read_rows(Movie.objects.all()),
+                                    version)
+
+        rows = self.read_rows(Movie.objects.filter(
+            modified_at__gte=latest - REFRESH_OVERLAP))
+        added = np.count_nonzero(~np.isin(
+            np.fromiter(rows, dtype=np.int64, count=len(rows)),
+            snapshot.ids))
+        deleted = np.array([], dtype=np.int64)
+        if len(snapshot.ids) + added != Movie.objects.count():
+            existing = np.fromiter(
+                Movie.objects.values_list('pk', flat=True).iterator(),
+                dtype=np.int64)
+            deleted = snapshot.ids[~np.isin(snapshot.ids, existing)]
+        return snapshot.patch(rows, deleted, version)
+
+    def search(self, params, queryset, version=None):
+        """Returns movies matching filter values
+
+        Parameters
+        ----------
+        params : dict
+            Cleaned data of MovieFilter form
+        queryset : <django.db.models.QuerySet>
+            Movies of page are fetched from queryset
+        version : int, optional
+            Catalogue version already read by caller, see 'get_snapshot'
+
+        Returns
+        -------
+        <movies.columnar.ColumnarResult> :
+            Movies found, annotated with 'relevance' if name or director was
+            searched
+        """
+
+        snapshot = self.get_snapshot(version)
+        mask = np.ones(len(snapshot.ids), dtype=bool)
+        relevance = None
+
+        for field in ('name', 'director'):
+            for term in get_search_terms(params.get(field) or ''):
+                matches, rank = getattr(snapshot, field).word_prefix(term)
+                mask &= matches
+                relevance = rank if relevance is None else relevance + rank
+
+        genre = params.get('genre')
+        if genre:
+            columns = [index for index, name in enumerate(
+                snapshot.genre_names) if name.lower() == genre.lower()]
+            mask &= snapshot.genres[:, columns].any(axis=1)
+
+        for param, column, lower_bound in RANGE_FILTERS:
+            value = params.get(param)
+            if value is None:
+                continue
+            values = snapshot.columns[column]
+            mask &= values >= float(value) if lower_bound else \
+                values <= float(value)
+
+        return ColumnarResult(snapshot, mask, relevance, queryset)
+
+
+# Process-wide search engine, used by MovieSearchView when enabled
+columnar_search = ColumnarSearch(
+    rebuild_interval=getattr(settings, 'MOVIE_COLUMNAR_REBUILD_INTERVAL', 300))
+
+
+def get_columnar_search():
+    """Returns in-memory search engine, None if disabled or NumPy isn't
+    installed"""
+
+    if np is None or not getattr(settings, 'MOVIE_COLUMNAR_SEARCH', False):
+        return None
+    return columnar_search
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+
+from django.db.models import Avg, Case, Count, IntegerField, Max, Min, When
+
+from .models import Movie
+
+# Histogram buckets of fields: (response name, field, lowest value, highest
+# value, bucket width)
+HISTOGRAMS = (
+    ('imdb_score', 'imdb_score', 1, 10, 1),
+    ('99popularity', 'popularity', 0, 99, 10),
+)
+
+
+def get_buckets(lowest, highest, width):
+    """Returns (min, max) bounds of histogram buckets
+
+    Notes
+    -----
+    Bucket includes its min and excludes its max, except last bucket which
+    includes highest value.
+    """
+
+    bounds = list(range(lowest, highest, width)) + [highest]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def get_genre_counts(queryset):
+    """Returns number of movies in queryset per genre
+
+    Notes
+    -----
+    Counted with single grouped query on genre associations of movies.
+    """
+
+    through = Movie.genres.through.objects.filter(
+        movie_id__in=queryset.order_by().values('pk'))
+    counts = through.values('genre_id').annotate(
+        count=Count('movie_id')).order_by('-count', 'genre_id')
+    return [OrderedDict([('genre', row['genre_id']), ('count', row['count'])])
+            for row in counts]
+
+
+def get_field_stats(queryset):
+    """Returns number of movies in queryset, and min/max/avg and histogram
+    of each field of HISTOGRAMS
+
+    Notes
+    -----
+    All statistics are computed with single aggregate query, bucket counts
+    with conditional aggregation.
+    """
+
+    aggregates = {'count': Count('pk')}
+    for name, field, lowest, highest, width in HISTOGRAMS:
+        aggregates.update({
+            name + '__min': Min(field),
+            name + '__max': Max(field),
+            name + '__avg': Avg(field),
+            name + '__missing': Count(Case(When(
+                **{field + '__isnull': True, 'then': 1}),
+                output_field=IntegerField())),
+        })
+        buckets = get_buckets(lowest, highest, width)
+        for index, (low, high) in enumerate(buckets):
+            upper = field + ('__lte' if index == len(buckets) - 1 else '__lt')
+            aggregates['{0}__{1}'.format(name, index)] = Count(Case(When(
+                **{field + '__gte': low, upper: high, 'then': 1}),
+                output_field=IntegerField()))
+
+    values = queryset.order_by().aggregate(**aggregates)
+
+    stats = OrderedDict([('count', values['count'])])
+    for name, field, lowest, highest, width in HISTOGRAMS:
+        stats[name] = OrderedDict(
+            [(key, values['{0}__{1}'.format(name, key)])
+             for key in ('min', 'max', 'avg', 'missing')] +
+            [('histogram', [
+                OrderedDict([('min', low), ('max', high), ('count', values[
+                    '{0}__{1}'.format(name, index)])])
+                for index, (low, high) in enumerate(
+                    get_buckets(lowest, highest, width))])])
+    return stats
+
+
+def get_facets(queryset):
+    """Returns genre counts and statistics of movies in queryset
+
+    Returns
+    -------
+    <collections.OrderedDict> :
+        'count' of movies, 'genres' counts and 'imdb_score' and
+        '99popularity' statistics: 'min', 'max', 'avg', number of movies
+        'missing' value and 'histogram' buckets
+
+    Notes
+    -----
+    Computed with two queries, regardless of number of movies.
+    """
+
+    facets = get_field_stats(queryset)
+    facets['genres'] = get_genre_counts(queryset)
+    facets.move_to_end('genres', last=False)
+    facets.move_to_end('count', last=False)
+    return facets
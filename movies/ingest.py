@@ -0,0 +1,247 @@
+import io
+import zlib
+import gzip
+import json
+from itertools import islice
+
+# Number of characters read from fixture at once
+CHUNK_SIZE = 64 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class InvalidRecord(ValueError):
+    """Raised when movie item of fixture can't be loaded"""
+
+
+def open_fixture(path):
+    """Opens fixture for reading text, decompressing gzip file on the fly"""
+
+    with open(path, 'rb') as file_obj:
+        is_gzip = file_obj.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+    if is_gzip:
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_json_items(file_obj, chunk_size=CHUNK_SIZE, raw_lines=False):
+    """Yields items of JSON array or JSON Lines document incrementally
+
+    Parameters
+    ----------
+    file_obj : file object
+        Text stream of fixture. Document is JSON array if it starts with
+        '[', else it's treated as one JSON value per line
+    raw_lines : bool
+        If True, lines of JSON Lines document are yielded without decoding
+
+    Notes
+    -----
+    Only one chunk of document and the item being decoded are held in
+    memory.
+
+    Raises
+    ------
+    ValueError :
+        if document is not valid JSON
+    """
+
+    buffer = file_obj.read(chunk_size)
+    if buffer.lstrip().startswith('['):
+        return _iter_json_array(file_obj, buffer, chunk_size)
+    return _iter_json_lines(file_obj, buffer, chunk_size, raw_lines)
+
+
+def _iter_json_lines(file_obj, buffer, chunk_size, raw_lines):
+    decode = str if raw_lines else json.JSONDecoder().decode
+    while buffer:
+        chunk = file_obj.read(chunk_size)
+        lines = (buffer + chunk).split('\n')
+        buffer = lines.pop() if chunk else ''
+
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield decode(line)
+
+
+def _iter_json_array(file_obj, buffer, chunk_size):
+    decoder = json.JSONDecoder()
+    position = buffer.index('[') + 1
+    expect_item = True
+    empty = True
+    eof = False
+
+    while True:
+        # Skip whitespaces, reading next chunk once buffer is consumed
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError('Unexpected end of JSON array')
+            chunk = file_obj.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        char = buffer[position]
+        if not expect_item or (empty and char == ']'):
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(
+                    'Expecting \',\' delimiter: {0!r}'.format(char))
+            position += 1
+            expect_item = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            # Item may continue in next chunk
+            if eof:
+                raise
+            end = None
+
+        # Number decoded up to end of buffer may be truncated, item is
+        # complete only when followed by delimiter
+        if end is None or not (eof or (end < len(buffer) and (
+                buffer[end].isspace() or buffer[end] in ',]'))):
+            chunk = file_obj.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        yield item
+        position = end
+        expect_item = empty = False
+
+
+def _to_float(movie_item, key, min_value, max_value):
+    value = movie_item.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidRecord('{0!r} must be a number'.format(key))
+    if not min_value <= value <= max_value:
+        raise InvalidRecord('{0!r} must be between {1} and {2}'.format(
+            key, min_value, max_value))
+    return float(value)
+
+
+def parse_movie_item(movie_item):
+    """Validates movie item of fixture and maps it to movie record
+
+    Parameters
+    ----------
+    movie_item : dict or str
+        Movie item, or its JSON encoded string
+
+    Returns
+    -------
+    dict :
+        Movie record with keys 'name', 'director', 'imdb_score',
+        'popularity' and 'genres' (list of stripped genre names)
+
+    Raises
+    ------
+    <movies.ingest.InvalidRecord> :
+        if item isn't valid JSON, misses name or director or has invalid
+        score, popularity or genre list
+    """
+
+    if isinstance(movie_item, str):
+        try:
+            movie_item = json.loads(movie_item)
+        except ValueError as exc:
+            raise InvalidRecord('invalid JSON: {0}'.format(exc))
+
+    if not isinstance(movie_item, dict):
+        raise InvalidRecord('movie item must be an object')
+
+    record = dict()
+    for key, max_length in (('name', 255), ('director', 100)):
+        value = movie_item.get(key)
+        if not isinstance(value, str) or not value:
+            raise InvalidRecord('{0!r} is required'.format(key))
+        if len(value) > max_length:
+            raise InvalidRecord('{0!r} is longer than {1} characters'.format(
+                key, max_length))
+        record[key] = value
+
+    record['imdb_score'] = _to_float(movie_item, 'imdb_score', 1.0, 10.0)
+    record['popularity'] = _to_float(movie_item, '99popularity', 0, 99.0)
+
+    genres = movie_item.get('genre') or []
+    if not isinstance(genres, list) or not all(
+            isinstance(genre, str) for genre in genres):
+        raise InvalidRecord('\'genre\' must be a list of strings')
+    record['genres'] = [genre.strip() for genre in genres if genre.strip()]
+    if any(len(genre) > 20 for genre in record['genres']):
+        raise InvalidRecord('genre is longer than 20 characters')
+
+    return record
+
+
+def iter_movie_records(movie_items, errors, start=0):
+    """Yields movie records of valid movie items
+
+    Parameters
+    ----------
+    movie_items : iterable of dict or str
+        Movie items of fixture
+    errors : list
+        Receives (item index, error message) of invalid movie items
+    start : int
+        Index of first movie item in fixture
+    """
+
+    for index, movie_item in enumerate(movie_items, start):
+        try:
+            yield parse_movie_item(movie_item)
+        except InvalidRecord as exc:
+            errors.append((index, str(exc)))
+
+
+def parse_batch(indexed_batch):
+    """Validates batch of movie items, used by worker processes
+
+    Parameters
+    ----------
+    indexed_batch : (int, list)
+        Index of first movie item in fixture and batch of movie items
+
+    Returns
+    -------
+    (list, list) :
+        Movie records of valid items and (item index, error message) of
+        invalid items
+    """
+
+    start, movie_items = indexed_batch
+    errors = list()
+    records = list(iter_movie_records(movie_items, errors, start))
+    return records, errors
+
+
+def get_shard(record, shards):
+    """Returns shard of movie record, stable across processes and runs
+
+    Notes
+    -----
+    All records of a movie (same name and director) belong to same shard, so
+    shards can be written in parallel without conflicts.
+    """
+
+    key = '{0}\x00{1}'.format(record['name'], record['director'])
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def batched(iterable, size):
+    """Yields lists of up to size items of iterable"""
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,198 @@
+import re
+from collections import Counter, OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpRequest, QueryDict
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from movies.models import Movie
+from utils.filters import MovieFilter
+from utils.pagination import MoviePagination
+
+# Query string of movie search in line of access log
+SEARCH_URL_RE = re.compile(r'/movie/search/\?(\S*)')
+
+# Table and alias of sub-query or join in SQL, e.g. "table" U0
+TABLE_ALIAS_RE = re.compile(
+    r'(?:FROM|JOIN) [`"]?(\w+)[`"]? (?:AS )?([A-Z]\d+)\b')
+
+
+def parse_query_log(lines):
+    """Yields query strings of movie searches in query log
+
+    Notes
+    -----
+    Line is either access log line with '/movie/search/?<query>' URL, or
+    bare query string. Empty lines and lines starting with '#' are skipped.
+    """
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = SEARCH_URL_RE.search(line)
+        if match:
+            yield match.group(1)
+        elif not any(char.isspace() for char in line):
+            yield line.lstrip('?')
+
+
+def explain(queryset):
+    """Returns query plan of queryset and tables it scans fully
+
+    Returns
+    -------
+    (list of str, set of str) :
+        Rows of query plan and names of tables read with full table (or
+        full index) scan. Aliases of tables are resolved to their names
+
+    Raises
+    ------
+    <django.core.management.base.CommandError> :
+        if database vendor isn't supported
+    """
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            plan = [' '.join('{0}={1}'.format(key, row[key]) for key in (
+                'table', 'type', 'key', 'rows', 'Extra') if key in row)
+                for row in rows]
+            scans = set(row['table'] for row in rows
+                        if row['type'] in ('ALL', 'index'))
+        elif connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            scans = set(
+                re.match(r'SCAN (?:TABLE )?(\S+)', detail).group(1)
+                for detail in plan
+                if detail.startswith('SCAN') and 'INDEX' not in detail)
+        elif connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = [row[0] for row in cursor.fetchall()]
+            scans = set(match.group(1) for match in (
+                re.search(r'Seq Scan on (\S+)', line) for line in plan)
+                if match)
+        else:
+            raise CommandError('EXPLAIN is not supported for {0}'.format(
+                connection.vendor))
+
+    aliases = dict((alias, table) for table, alias in
+                   TABLE_ALIAS_RE.findall(sql))
+    return plan, set(aliases.get(table, table) for table in scans)
+
+
+class Command(BaseCommand):
+    """Command reports movie search filter combinations missing an index"""
+
+    help = ('Replays query log of movie searches with EXPLAIN and reports '
+            'filter combinations which scan full tables')
+
+    def add_arguments(self, parser):
+        """Adds positional and optional arguments to Command
+
+        Notes
+        -----
+        Add positional argument:
+            logpath - file path of query log. Each line is access log line
+            with movie search URL, or query string of movie search
+        """
+
+        parser.add_argument('logpath', type=str)
+
+    def handle(self, *args, **options):
+        """Runs EXPLAIN for each search and reports filter combinations
+
+        Notes
+        -----
+        Search is built as MovieSearchView builds it: MovieFilter, ordering
+        and page size of MoviePagination. Searches with same filters and
+        ordering form a combination. Combination misses an index if any of
+        its searches scans a full table.
+
+        Query plans depend on table statistics, so command should be run
+        against database with production sized data. Query plan of first
+        search of each combination is written with verbosity 2.
+        """
+
+        try:
+            with open(options['logpath'], 'r', encoding='utf-8') as log:
+                queries = list(parse_query_log(log))
+        except OSError as exc:
+            raise CommandError('Invalid logpath: {0}'.format(exc))
+
+        counts = Counter()
+        scans = OrderedDict()
+        plans = dict()
+        invalid = 0
+        for query in queries:
+            try:
+                combination, queryset = self.build_search(query)
+            except ValidationError:
+                invalid += 1
+                continue
+
+            plan, scanned = explain(queryset)
+            counts[combination] += 1
+            scans.setdefault(combination, set()).update(scanned)
+            plans.setdefault(combination, plan)
+
+        self.stdout.write(
+            'Replayed {0} searches ({1} invalid) in {2} filter '
+            'combinations'.format(len(queries), invalid, len(counts)))
+
+        missing = 0
+        for combination, count in counts.most_common():
+            if scans[combination]:
+                missing += 1
+                result = 'full scan of {0}'.format(
+                    ', '.join(sorted(scans[combination])))
+            else:
+                result = 'uses indexes'
+            self.stdout.write('{0:>8}  {1}: {2}'.format(
+                count, combination, result))
+            if options['verbosity'] >= 2:
+                for row in plans[combination]:
+                    self.stdout.write('{0:>10}{1}'.format('', row))
+
+        self.stdout.write('{0} of {1} filter combinations miss an '
+                          'index'.format(missing, len(counts)))
+
+    @staticmethod
+    def build_search(query):
+        """Returns filter combination and queryset of movie search
+
+        Raises
+        ------
+        <rest_framework.exceptions.ValidationError> :
+            if query parameters are invalid
+        """
+
+        http_request = HttpRequest()
+        http_request.GET = QueryDict(query)
+        request = Request(http_request)
+
+        filterset = MovieFilter(data=request.query_params,
+                                queryset=Movie.objects.all(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        queryset = filterset.qs
+
+        pagination = MoviePagination()
+        pagination.ordering_fields = pagination.get_ordering_fields(queryset)
+        ordering = pagination.get_ordering(request, queryset)
+        field, descending = pagination.get_ordering_field(ordering)
+        page_size = pagination.get_page_size(request)
+        queryset = pagination.order_queryset(
+            queryset, field, descending)[:page_size + 1]
+
+        filters = sorted(name for name in filterset.filters
+                         if request.query_params.get(name))
+        combination = '{0} ordering={1}'.format(
+            ', '.join(filters) or '(no filters)', ordering)
+        return combination, queryset
@@ -1,9 +1,18 @@
 import json
+import time
+import tempfile
+from collections import Counter, deque
+from multiprocessing import Pool
 from os.path import isfile, join, isabs
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 
+from movies.bulk import MovieBulkWriter, resolve_genres, write_shard
+from movies.cache import bump_catalogue_version, deferred_bump
+from movies.ingest import open_fixture, iter_json_items, \
+    iter_movie_records, batched, parse_batch, get_shard
 from movies.models import Movie, Genre
 
 
@@ -18,15 +27,32 @@ class Command(BaseCommand):
         Notes
         -----
         Add positional argument:
-            filepath - file path of fixture to be loaded on DB
+            filepath - file path of fixture to be loaded on DB. Fixture is
+            JSON array or JSON Lines file, optionally gzip compressed
+
+        Add optional arguments:
+            --bulk - load movies in batches with set-based queries
+            --batch-size - number of movies per batch in bulk mode
+            --workers - number of processes to load movies in bulk mode
         """
 
         # positional arguments
         parser.add_argument('filepath', type=str)
 
+        # optional arguments
+        parser.add_argument('--bulk', action='store_true',
+                            help='Load movies in batches with bulk inserts')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of movies per batch in bulk mode')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of processes to load movies with in '
+                                 'bulk mode')
+
     def handle(self, *args, **options):
         """Defines logic to load movies data in DB"""
 
+        self.verbosity = options['verbosity']
+
         # If file_path is absolute, set fixture_path to file_path
         # else, append file_path to base directory of project and
         # set as fixture_path
@@ -38,26 +64,174 @@ class Command(BaseCommand):
         if not isfile(fixture_path):
             raise Exception('Invalid filepath')
 
-        with open(fixture_path, 'r') as file_obj:
-            data = json.load(file_obj)
-            record_dict = dict()
-
-            for movie_item in data:
-                # Map movie item from data list to record dict
-                # and create Movie record
-                record_dict['name'] = movie_item.get('name')
-                record_dict['popularity'] = movie_item.get('99popularity')
-                record_dict['director'] = movie_item.get('director')
-                record_dict['imdb_score'] = movie_item.get('imdb_score')
-                movie, created = Movie.objects.get_or_create(**record_dict)
-
-                genre_list = movie_item.get('genre')
-                # create genre for each genre in list
-                # and associate to current movie
-                for genre in genre_list:
-                    genre_obj, created = Genre.objects.get_or_create(
-                        genre_name=genre.strip())
-                    movie.genres.add(genre_obj)
-                movie.save()
-
-                self.stdout.write(str(movie))
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+
+        # Bulk writers don't send signals, so catalogue version is bumped
+        # explicitly. Bumps are coalesced into single one once movies are
+        # loaded
+        with deferred_bump():
+            bump_catalogue_version()
+            if options['bulk'] and options['workers'] > 1:
+                self.handle_parallel(fixture_path, options['batch_size'],
+                                     options['workers'])
+                return
+            if options['bulk']:
+                self.handle_bulk(fixture_path, options['batch_size'])
+                return
+
+            with open_fixture(fixture_path) as file_obj:
+                data = iter_json_items(file_obj)
+                record_dict = dict()
+
+                for movie_item in data:
+                    # Map movie item from data list to record dict
+                    # and create Movie record
+                    record_dict['name'] = movie_item.get('name')
+                    record_dict['popularity'] = movie_item.get('99popularity')
+                    record_dict['director'] = movie_item.get('director')
+                    record_dict['imdb_score'] = movie_item.get('imdb_score')
+                    movie, created = Movie.objects.get_or_create(**record_dict)
+
+                    genre_list = movie_item.get('genre')
+                    # create genre for each genre in list
+                    # and associate to current movie
+                    for genre in genre_list:
+                        genre_obj, created = Genre.objects.get_or_create(
+                            genre_name=genre.strip())
+                        movie.genres.add(genre_obj)
+                    movie.save()
+
+                    self.stdout.write(str(movie))
+
+    def handle_bulk(self, fixture_path, batch_size):
+        """Loads movies data in batches with set-based queries
+
+        Notes
+        -----
+        Each batch is written in its own transaction with constant number
+        of queries (see 'movies.bulk.MovieBulkWriter'). Progress is reported
+        per batch with verbosity 2, summary is reported at the end.
+
+        Invalid movie items are skipped and reported.
+        """
+
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        writer = MovieBulkWriter()
+        errors = list()
+        started_at = time.monotonic()
+
+        # Fixture is parsed, validated and written as stream of batches,
+        # so only one batch of movies is held in memory
+        with open_fixture(fixture_path) as file_obj:
+            records = iter_movie_records(
+                iter_json_items(file_obj, raw_lines=True), errors)
+            for batch in batched(records, batch_size):
+                writer.write(batch)
+                if self.verbosity >= 2:
+                    self.stdout.write('Loaded {0} movies'.format(
+                        writer.stats['records']))
+
+        self.write_summary(writer.stats, time.monotonic() - started_at)
+        self.write_errors(errors)
+
+    def handle_parallel(self, fixture_path, batch_size, workers):
+        """Loads movies data with pool of worker processes
+
+        Notes
+        -----
+        1. Batches of fixture are parsed and validated by workers. Valid
+        records are spooled to one temporary file per worker, sharded by
+        movie (name, director), keeping order of fixture.
+        2. All genres are created at once.
+        3. Each worker writes one shard with 'MovieBulkWriter'. Shards have
+        no movies in common, so they are written in parallel without
+        conflicts, and result is same as loading in single process. On
+        SQLite, which allows single writer only, shards are written one
+        after another.
+
+        Pool of workers is fed with few batches at a time, so memory is
+        bounded by batch size and number of workers.
+        """
+
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        errors = list()
+        genres = set()
+        started_at = time.monotonic()
+
+        # Worker processes must open their own DB connections
+        connections.close_all()
+
+        with tempfile.TemporaryDirectory() as directory:
+            shard_paths = [join(directory, 'shard-{0}.jsonl'.format(shard))
+                           for shard in range(workers)]
+            shard_files = [open(path, 'w', encoding='utf-8')
+                           for path in shard_paths]
+
+            def spool(result):
+                records, batch_errors = result
+                errors.extend(batch_errors)
+                for record in records:
+                    genres.update(record['genres'])
+                    shard_files[get_shard(record, workers)].write(
+                        json.dumps(record) + '\n')
+
+            try:
+                with open_fixture(fixture_path) as file_obj, \
+                        Pool(workers) as pool:
+                    batches = batched(
+                        iter_json_items(file_obj, raw_lines=True), batch_size)
+                    pending = deque()
+                    for index, batch in enumerate(batches):
+                        pending.append(pool.apply_async(
+                            parse_batch, ((index * batch_size, batch),)))
+                        if len(pending) >= 2 * workers:
+                            spool(pending.popleft().get())
+                    while pending:
+                        spool(pending.popleft().get())
+            finally:
+                for shard_file in shard_files:
+                    shard_file.close()
+
+            genres_created = resolve_genres(genres)
+            connections.close_all()
+
+            tasks = [(path, batch_size, genres) for path in shard_paths]
+            if connection.vendor == 'sqlite':
+                # SQLite doesn't allow concurrent writers
+                stats = sum(map(write_shard, tasks), Counter())
+            else:
+                with Pool(workers) as pool:
+                    stats = sum(pool.imap_unordered(write_shard, tasks),
+                                Counter())
+            stats['genres_created'] += genres_created
+
+        self.write_summary(stats, time.monotonic() - started_at)
+        self.write_errors(errors)
+
+    def write_summary(self, stats, elapsed):
+        """Writes throughput and counts of loaded records"""
+
+        self.stdout.write(
+            'Loaded {records} movies in {elapsed:.2f}s ({rate:.0f} movies/s): '
+            '{movies_created} created, {movies_existing} existing, '
+            '{genres_created} genres created, '
+            '{genre_links_created} genre associations created'.format(
+                elapsed=elapsed, rate=stats['records'] / max(elapsed, 1e-9),
+                **{key: stats[key] for key in (
+                    'records', 'movies_created', 'movies_existing',
+                    'genres_created', 'genre_links_created')}))
+
+    def write_errors(self, errors, limit=20):
+        """Writes invalid movie items skipped while loading"""
+
+        if not errors:
+            return
+
+        self.stderr.write('Skipped {0} invalid movies'.format(len(errors)))
+        for index, message in errors[:limit]:
+            self.stderr.write('  item {0}: {1}'.format(index, message))
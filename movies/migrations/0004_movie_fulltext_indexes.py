@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# FULLTEXT indexes used by full-text search of movies (utils.search)
+FULLTEXT_INDEXES = (
+    ('movies_movie_name_ft', 'name'),
+    ('movies_movie_director_ft', 'director'),
+)
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    """Creates FULLTEXT indexes on MySQL. Other databases don't support them
+    and fall back to LIKE conditions"""
+
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    quote_name = schema_editor.quote_name
+    table = apps.get_model('movies', 'Movie')._meta.db_table
+    for index_name, column in FULLTEXT_INDEXES:
+        schema_editor.execute('CREATE FULLTEXT INDEX {0} ON {1} ({2})'.format(
+            quote_name(index_name), quote_name(table), quote_name(column)))
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    """Drops FULLTEXT indexes on MySQL"""
+
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    quote_name = schema_editor.quote_name
+    table = apps.get_model('movies', 'Movie')._meta.db_table
+    for index_name, column in FULLTEXT_INDEXES:
+        schema_editor.execute('DROP INDEX {0} ON {1}'.format(
+            quote_name(index_name), quote_name(table)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_auto_20190108_1802'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 19:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 19:54
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Index of genre -> movie direction of genre association, used by genre
+# filter sub-query. Unique constraint covers movie -> genre direction only
+GENRE_MOVIE_INDEX = 'movies_movie_genres_genre_movie_idx'
+
+
+def create_genre_movie_index(apps, schema_editor):
+    """Creates (genre_id, movie_id) index of auto-created through table"""
+
+    quote_name = schema_editor.quote_name
+    through = apps.get_model('movies', 'Movie').genres.through
+    schema_editor.execute('CREATE INDEX {0} ON {1} ({2}, {3})'.format(
+        quote_name(GENRE_MOVIE_INDEX), quote_name(through._meta.db_table),
+        quote_name('genre_id'), quote_name('movie_id')))
+
+
+def drop_genre_movie_index(apps, schema_editor):
+    """Drops (genre_id, movie_id) index of through table"""
+
+    quote_name = schema_editor.quote_name
+    through = apps.get_model('movies', 'Movie').genres.through
+    if schema_editor.connection.vendor == 'mysql':
+        sql = 'DROP INDEX {0} ON {1}'.format(
+            quote_name(GENRE_MOVIE_INDEX), quote_name(through._meta.db_table))
+    else:
+        sql = 'DROP INDEX {0}'.format(quote_name(GENRE_MOVIE_INDEX))
+    schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movie_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['imdb_score', 'popularity', 'id'], name='movie_score_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['popularity', 'imdb_score', 'id'], name='movie_popularity_score_idx'),
+        ),
+        migrations.RunPython(create_genre_movie_index,
+                             drop_genre_movie_index),
+    ]
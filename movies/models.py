@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Prefetch
+from django.db.models.query import ValuesIterable
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 
@@ -13,8 +16,85 @@ class Genre(models.Model):
         return self.genre_name
 
 
+# Fields of movie rows (see 'MovieQuerySet.as_rows')
+MOVIE_ROW_FIELDS = ('id', 'name', 'director', 'imdb_score', 'popularity')
+
+
+class MovieRowIterable(ValuesIterable):
+    """Iterable yielding dict of fields per movie, with its genre names
+
+    Notes
+    -----
+    Genre names of all fetched movies are read with single query on their
+    associations, in same order as 'MovieQuerySet.with_genres' prefetches
+    them.
+    """
+
+    def __iter__(self):
+        rows = list(super(MovieRowIterable, self).__iter__())
+        genres = {row['id']: [] for row in rows}
+        if genres:
+            associations = Movie.genres.through.objects.using(
+                self.queryset.db).filter(movie_id__in=list(genres)).order_by(
+                'movie_id', 'genre_id').values_list('movie_id', 'genre_id')
+            for movie_id, genre in associations:
+                genres[movie_id].append(genre)
+
+        for row in rows:
+            row['genres'] = genres[row['id']]
+            yield row
+
+
+class MovieQuerySet(models.QuerySet):
+    """Custom QuerySet for Movie"""
+
+    def with_genres(self):
+        """Prefetch genres of movies
+
+        Notes
+        -----
+        Genres of all movies in queryset are fetched with single query
+        instead of one query per movie while serializing 'genre' field.
+        Genres of movie are ordered by name.
+        """
+
+        return self.prefetch_related(
+            Prefetch('genres', queryset=Genre.objects.order_by('pk')))
+
+    def as_rows(self):
+        """Returns movies as dicts of MOVIE_ROW_FIELDS and 'genres' list
+
+        Notes
+        -----
+        Read path without model instances, see
+        'movies.serializers.MovieRowSerializer'. Genres are fetched with
+        single query per evaluation. Annotations added afterwards (e.g.
+        'relevance' of text search) are included in rows.
+        """
+
+        queryset = self.values(*MOVIE_ROW_FIELDS)
+        queryset._iterable_class = MovieRowIterable
+        return queryset
+
+    def touch(self):
+        """Sets modification time of movies in queryset to current time
+
+        Notes
+        -----
+        Used when genres of movies change, which doesn't save movies.
+        """
+
+        return self.update(modified_at=timezone.now())
+
+
 class Movie(models.Model):
-    """Model to store movie data"""
+    """Model to store movie data
+
+    Notes
+    -----
+    'modified_at' is updated on every write of movie, including changes of
+    its genres. It is the revision of movie used for conditional requests.
+    """
 
     name = models.CharField(max_length=255)
     director = models.CharField(max_length=100)
@@ -25,11 +105,45 @@ class Movie(models.Model):
                                    validators=[MaxValueValidator(99.0),
                                                MinValueValidator(0)])
     genres = models.ManyToManyField(Genre, related_name='movies')
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = MovieQuerySet.as_manager()
 
     class Meta:
         unique_together = ('name', 'director')
+        # Range filters of imdb score and popularity, combined with each
+        # other
+        indexes = [
+            models.Index(fields=['imdb_score', 'popularity', 'id'],
+                         name='movie_score_popularity_idx'),
+            models.Index(fields=['popularity', 'imdb_score', 'id'],
+                         name='movie_popularity_score_idx'),
+            # Keyset pages and top-K of movies ordered by imdb score or
+            # popularity, ties broken by id
+            models.Index(fields=['imdb_score', 'id'],
+                         name='movie_score_id_idx'),
+            models.Index(fields=['popularity', 'id'],
+                         name='movie_popularity_id_idx'),
+        ]
 
     def __str__(self):
         """Define human-readable representation of Movie model"""
 
         return self.name
+
+
+class CatalogueVersion(models.Model):
+    """Version of movie catalogue, single row table
+
+    Notes
+    -----
+    Version is incremented by every write of movies or genres. Responses
+    cached for previous version are no longer served (see movies.cache).
+    """
+
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """Define human-readable representation of CatalogueVersion model"""
+
+        return str(self.version)
@@ -1,10 +1,15 @@
+from collections import OrderedDict
+
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 
 from .models import Movie, Genre
 from utils.custom_fields import GetOrCreatePrimaryKeyRelatedField
+from utils.perf import TimedListSerializer, TimedSerializerMixin
 
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serialize / deserialize Movie data
 
     Notes
@@ -12,24 +17,37 @@ class MovieSerializer(serializers.ModelSerializer):
     Customizations :
     1. Custom PrimaryRelatedField is used for genre. it will create
     the instance of genre that are not found in DB. Also trim whitespaces
-    from genre strings
+    from genre strings. Whole genre list is resolved with one lookup and
+    one bulk insert
 
     2. Map '99popularity' field is request payload to 'popularity' before
     saving to DB
+
+    3. Write only 'genre_mode' field defines if genres in update request are
+    appended to genres of movie ('append', default) or replace them
+    ('replace')
     """
 
+    GENRE_APPEND = 'append'
+    GENRE_REPLACE = 'replace'
+
     genre = GetOrCreatePrimaryKeyRelatedField(
         queryset=Genre.objects.all(), many=True,
         source='genres', required=False, model=Genre,
         pk_field=serializers.CharField(max_length=20, trim_whitespace=True)
     )
+    genre_mode = serializers.ChoiceField(
+        choices=(GENRE_APPEND, GENRE_REPLACE), default=GENRE_APPEND,
+        write_only=True
+    )
 
     class Meta:
         """Meta class fot MovieSerializer"""
 
         model = Movie
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'name', 'director', 'imdb_score', '99popularity',
-                  'genre')
+                  'genre', 'genre_mode')
         read_only_fields = ('id',)
         extra_kwargs = {
             '99popularity': {'source': 'popularity'}
@@ -41,30 +59,138 @@ class MovieSerializer(serializers.ModelSerializer):
         Notes
         -----
         Pop genre list from validated data before creating Movie instance.
-        Associate list of genre objects to movie obj
+        Associate list of genre objects to movie obj with single bulk insert
         """
 
         # Create movie instance after popping genre list from dict
+        validated_data.pop('genre_mode', None)
         genre_list = validated_data.pop('genres', list())
         movie_obj = Movie.objects.create(**validated_data)
 
         # Associates list of genre objects to movie obj
-        for genre in genre_list:
-            movie_obj.genres.add(genre)
-        movie_obj.save()
+        if genre_list:
+            movie_obj.genres.add(*genre_list)
 
         return movie_obj
 
     def update(self, instance, validated_data):
-        """Override 'update' method to enable writing to M2M related field"""
+        """Override 'update' method to enable writing to M2M related field
 
+        Notes
+        -----
+        Only fields whose value changed, and modification time, are saved.
+        Genres are associated with single bulk insert, existing genres are
+        kept or replaced according to 'genre_mode'.
+        """
+
+        genre_mode = validated_data.pop('genre_mode', self.GENRE_APPEND)
+        genre_list = validated_data.pop('genres', None)
+
+        update_fields = list()
         for attr, value in validated_data.items():
-            # If attribute 'genres' in dict items, associate genres to instance
-            if attr == 'genres':
-                for genre in value:
-                    instance.genres.add(genre)
-            else:
+            if getattr(instance, attr) != value:
                 setattr(instance, attr, value)
-        instance.save()
+                update_fields.append(attr)
+        if update_fields:
+            instance.save(update_fields=update_fields + ['modified_at'])
+
+        # If genres in dict, associate genres to instance
+        if genre_list is not None:
+            if genre_mode == self.GENRE_REPLACE:
+                instance.genres.set(genre_list)
+            elif genre_list:
+                instance.genres.add(*genre_list)
 
         return instance
+
+
+class MovieBulkItemSerializer(MovieSerializer):
+    """Serializer of movie created or updated in batch
+
+    Notes
+    -----
+    Same as MovieSerializer, without per movie check that (name, director)
+    is unique: it costs one query per movie. MovieBulkView checks whole
+    batch with single query instead.
+    """
+
+    class Meta(MovieSerializer.Meta):
+        """Meta class for MovieBulkItemSerializer"""
+
+        validators = []
+
+
+class MovieRowSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """Read only serializer of movie rows, fast path of MovieSerializer
+
+    Notes
+    -----
+    Serializes rows of 'Movie.objects.as_rows()' to same output as
+    MovieSerializer, without model instances and per field serializer
+    calls. Values of rows are JSON native types, so renderer encodes them
+    with C accelerated encoder of json module.
+    """
+
+    class Meta:
+        """Meta class for MovieRowSerializer"""
+
+        list_serializer_class = TimedListSerializer
+
+    def to_representation(self, row):
+        """Returns output of MovieSerializer for movie row"""
+
+        return OrderedDict((
+            ('id', row['id']),
+            ('name', row['name']),
+            ('director', row['director']),
+            ('imdb_score', row['imdb_score']),
+            ('99popularity', row['popularity']),
+            ('genre', row['genres']),
+        ))
+
+
+class MovieBulkSerializer(serializers.Serializer):
+    """Serializer for batch of Movie operations
+
+    Fields
+    ------
+
+        create -  List of movies to create, as for MovieSerializer
+        update -  List of partial updates of movies. Each update has 'id'
+                  of movie and fields to update, as for MovieSerializer
+        delete -  List of ids of movies to delete
+
+    Notes
+    -----
+    Only structure of batch is validated here, operations are validated
+    with MovieSerializer. Number of operations is limited by
+    MOVIE_BULK_MAX_ITEMS setting.
+    """
+
+    create = serializers.ListField(child=serializers.DictField(),
+                                   required=False)
+    update = serializers.ListField(child=serializers.DictField(),
+                                   required=False)
+    delete = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False)
+
+    def validate(self, attrs):
+        """Validates number of operations in batch
+
+        Raises
+        ------
+        <rest_framework.exception.Validation> :
+            if batch is empty or has more than MOVIE_BULK_MAX_ITEMS operations
+        """
+
+        count = sum(len(attrs.get(operation, ()))
+                    for operation in ('create', 'update', 'delete'))
+        if not count:
+            raise ValidationError('No operations provided.')
+
+        max_items = settings.MOVIE_BULK_MAX_ITEMS
+        if count > max_items:
+            raise ValidationError(
+                'Ensure batch has no more than {0} operations.'.format(
+                    max_items))
+        return attrs
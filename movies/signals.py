@@ -0,0 +1,34 @@
+from django.db.models.signals import m2m_changed, pre_delete
+
+from .models import Genre, Movie
+
+
+def touch_movies_of_genres(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Updates modification time of movies whose genres changed"""
+
+    if action in ('post_add', 'post_remove') and pk_set:
+        movies = Movie.objects.filter(pk__in=pk_set) if reverse else \
+            Movie.objects.filter(pk=instance.pk)
+    elif action == 'pre_clear' and reverse:
+        movies = Movie.objects.filter(genres=instance)
+    elif action == 'post_clear' and not reverse:
+        movies = Movie.objects.filter(pk=instance.pk)
+    else:
+        return
+    movies.touch()
+
+
+def touch_movies_of_genre(sender, instance, **kwargs):
+    """Updates modification time of movies of genre being deleted"""
+
+    Movie.objects.filter(genres=instance).touch()
+
+
+def connect_signals():
+    """Keeps modification time of movies current on changes of genres"""
+
+    m2m_changed.connect(touch_movies_of_genres, sender=Movie.genres.through,
+                        dispatch_uid='movies.signals.touch_movies_of_genres')
+    pre_delete.connect(touch_movies_of_genre, sender=Genre,
+                       dispatch_uid='movies.signals.touch_movies_of_genre')
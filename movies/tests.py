@@ -1,16 +1,50 @@
+import os
+import csv
 import json
+import gzip
 import base64
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import mock, skipIf
+from io import StringIO
 from urllib.parse import urlencode
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from django.test import TestCase
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 
+from utils.custom_fields import GetOrCreatePrimaryKeyRelatedField
+from utils.db.backends.sqlite3.base import DatabaseWrapper as \
+    PooledSQLiteWrapper
+from utils.db.pool import ConnectionPool, PoolTimeout
+from utils.middleware import performance_stats
+from utils.pagination import MoviePagination
+from utils.querybudget import QueryBudgetExceeded, normalize_sql
+from utils.testing import QueryBudgetTestMixin
+
+from .bulk import MovieBulkWriter
+from .cache import bump_catalogue_version, get_catalogue_version, \
+    response_cache
+from .columnar import ColumnarSnapshot, columnar_search, np
+from .ingest import iter_json_items
 from .models import Movie, Genre
+from .serializers import MovieRowSerializer, MovieSerializer
+from .views import MovieCacheStatsView, MovieDetailsView, MovieSearchView
 
 
-class MovieTestCase(TestCase):
+class MovieTestCase(QueryBudgetTestMixin, TestCase):
     """Test cases for 'users' app"""
 
     def setUp(self):
@@ -47,6 +81,9 @@ class MovieTestCase(TestCase):
         self.sample_movie = Movie.objects.create(name='Sample Movie Name',
                                                  director='Anon')
 
+        # Responses cached by previous tests were rolled back
+        response_cache.clear()
+
     def test_movie_create(self):
         """Test APi to create movie instance"""
 
@@ -93,6 +130,47 @@ class MovieTestCase(TestCase):
 
             self.assertIn(genre_qs[0], movie_genres)
 
+    def test_movie_create_genre_queries(self):
+        """Test genres of movie are resolved with batched queries"""
+
+        headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        genre_table = connection.ops.quote_name(Genre._meta.db_table)
+        genre_queries = list()
+
+        for index in range(3):
+            create_data = {
+                'name': 'Genre Movie {0}'.format(index),
+                'director': 'Anon',
+                'genre': ['Drama', ' Crime', 'Noir', 'Drama']
+            }
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    '/movie/', json.dumps(create_data),
+                    content_type=self.content_type, **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            self.assertEqual(sorted(response.data['genre']),
+                             ['Crime', 'Drama', 'Noir'])
+
+            # Genres of created movie are read with join for response
+            genre_queries.append([query['sql'].split()[0]
+                                  for query in context.captured_queries
+                                  if genre_table in query['sql'] and
+                                  'JOIN' not in query['sql']])
+
+        # Single lookup of genres, and single insert of new ones
+        self.assertEqual(genre_queries,
+                         [['SELECT', 'INSERT'], ['SELECT'], ['SELECT']])
+        self.assertEqual(Genre.objects.count(), 3)
+
+    def test_movie_create_genre_incorrect_type(self):
+        """Test type of invalid item of primary keys is reported"""
+
+        field = GetOrCreatePrimaryKeyRelatedField(
+            queryset=Movie.objects.all(), model=Movie)
+        with self.assertRaises(ValidationError) as context:
+            field.get_or_create_many([self.sample_movie.pk, 'movie'])
+        self.assertIn('received str', str(context.exception.detail[0]))
+
     def test_movie_update(self):
         """Test API to update movie instance"""
 
@@ -146,17 +224,197 @@ class MovieTestCase(TestCase):
 
             self.assertIn(genre_qs[0], movie_genres)
 
+    def test_movie_update_genre_mode(self):
+        """Test genres are appended or replaced and only changed fields are
+        saved"""
+
+        url = '/movie/{0}/'.format(self.sample_movie.id)
+        headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        movie_table = connection.ops.quote_name(Movie._meta.db_table)
+
+        # Modification time is also touched when genres change
+        touch_query = 'UPDATE {0} SET {1} ='.format(
+            movie_table, connection.ops.quote_name('modified_at'))
+
+        def update(update_data):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.put(url, json.dumps(update_data),
+                                           content_type=self.content_type,
+                                           **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            self.assertNotIn('genre_mode', response.data)
+            return sorted(response.data['genre']), [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('UPDATE ' + movie_table) and
+                not query['sql'].startswith(touch_query)]
+
+        genres, updates = update({'genre': ['Drama', 'Crime'],
+                                  'imdb_score': 7.0})
+        self.assertEqual(genres, ['Crime', 'Drama'])
+        self.assertEqual(len(updates), 1)
+        self.assertIn('imdb_score', updates[0])
+        self.assertNotIn('director', updates[0])
+
+        genres, updates = update({'genre': ['Noir'], 'imdb_score': 7.0})
+        self.assertEqual(genres, ['Crime', 'Drama', 'Noir'])
+        self.assertEqual(updates, [])
+
+        genres, updates = update({'genre': ['Noir', 'War'],
+                                  'genre_mode': 'replace'})
+        self.assertEqual(genres, ['Noir', 'War'])
+
+        response = self.client.put(url, json.dumps({'genre_mode': 'merge'}),
+                                   content_type=self.content_type, **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_movie_bulk(self):
+        """Test API to create, update and delete movies in batch"""
+
+        url = '/movie/bulk/'
+        other_movie = Movie.objects.create(name='Other Movie', director='Anon')
+        bulk_data = {
+            'create': [
+                {'name': 'Bulk Movie', 'director': 'Anon', 'imdb_score': 7.2,
+                 '99popularity': 72.0, 'genre': ['Drama', ' Crime']},
+                {'name': 'Bulk Movie', 'director': 'Someone'}
+            ],
+            'update': [
+                {'id': self.sample_movie.id, 'imdb_score': 6.4,
+                 'genre': ['Comedy']}
+            ],
+            'delete': [other_movie.id, 99999]
+        }
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        response = self.client.post(url, json.dumps(bulk_data),
+                                    content_type=self.content_type, **headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Invalid operations are reported and nothing is applied
+        headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        invalid_data = dict(bulk_data, create=bulk_data['create'] + [
+            {'name': 'Bulk Movie', 'director': 'Anon'},
+            {'director': 'Anon'}
+        ], update=bulk_data['update'] + [{'id': 99999}])
+        response = self.client.post(url, json.dumps(invalid_data),
+                                    content_type=self.content_type, **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data['create'][3])
+        self.assertEqual(response.data['update'][1]['id'],
+                         ['Movie not found.'])
+        self.assertFalse(Movie.objects.filter(name='Bulk Movie').exists())
+        self.assertFalse(Genre.objects.exists())
+
+        invalid_data = dict(bulk_data, create=bulk_data['create'] + [
+            {'name': 'Bulk Movie', 'director': 'Anon'}])
+        response = self.client.post(url, json.dumps(invalid_data),
+                                    content_type=self.content_type, **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['create'][:2], [{}, {}])
+        self.assertIn('non_field_errors', response.data['create'][2])
+
+        # Movies must be unique once creates and updates are applied
+        for invalid_data in (
+                {'create': [{'name': 'Bulk Movie', 'director': 'Anon'}],
+                 'update': [{'id': other_movie.id, 'name': 'Bulk Movie'}]},
+                {'update': [{'id': other_movie.id,
+                             'name': 'Sample Movie Name'}]},
+                {'update': [{'id': other_movie.id,
+                             'name': 'Sample Movie Name'},
+                            {'id': self.sample_movie.id,
+                             'name': 'Other Movie'}]}):
+            response = self.client.post(url, json.dumps(invalid_data),
+                                        content_type=self.content_type,
+                                        **headers)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            errors = response.data['create'] + response.data['update']
+            self.assertTrue(any('non_field_errors' in error
+                                for error in errors))
+        self.assertEqual(Movie.objects.get(id=other_movie.id).name,
+                         'Other Movie')
+
+        response = self.client.post(url, json.dumps(bulk_data),
+                                    content_type=self.content_type, **headers)
+        self.assertTrue(status.is_success(response.status_code))
+        response_data = response.data
+        self.assertEqual([dct['status'] for dct in response_data['create']],
+                         [201, 201])
+        self.assertEqual(response_data['delete'], [
+            {'id': other_movie.id, 'status': 204},
+            {'id': 99999, 'status': 404}
+        ])
+
+        movie = Movie.objects.get(id=response_data['create'][0]['id'])
+        self.assertEqual((movie.name, movie.director, movie.popularity),
+                         ('Bulk Movie', 'Anon', 72.0))
+        self.assertEqual(sorted(genre.pk for genre in movie.genres.all()),
+                         ['Crime', 'Drama'])
+
+        movie = Movie.objects.get(id=self.sample_movie.id)
+        self.assertEqual(movie.imdb_score, 6.4)
+        self.assertEqual([genre.pk for genre in movie.genres.all()],
+                         ['Comedy'])
+        self.assertFalse(Movie.objects.filter(id=other_movie.id).exists())
+
+    def test_movie_bulk_limit(self):
+        """Test bulk API enforces maximum number of operations"""
+
+        url = '/movie/bulk/'
+        headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        for bulk_data in ({}, {'delete': list(range(1, 10))}):
+            with self.settings(MOVIE_BULK_MAX_ITEMS=5):
+                response = self.client.post(url, json.dumps(bulk_data),
+                                            content_type=self.content_type,
+                                            **headers)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            self.assertIn('non_field_errors', response.data)
+
     def test_movie_get(self):
         """Test API to read movie instance"""
 
         url = '/movie/{0}/'.format(self.sample_movie.id)
         headers = {'HTTP_AUTHORIZATION': self.auth_header}
 
-        response = self.client.get(url, **headers)
+        with self.assertQueryBudget(MovieDetailsView):
+            response = self.client.get(url, **headers)
         self.assertTrue(status.is_success(response.status_code))
         response_data = response.data
         self.assertEqual(self.sample_movie.name, response_data['name'])
 
+    def test_movie_row_serializer(self):
+        """Test fast path serializer renders same JSON as MovieSerializer"""
+
+        genres = [Genre.objects.create(genre_name=genre_name)
+                  for genre_name in ('Western', 'Drama', 'Action')]
+        movie = Movie.objects.create(name='R\u00f6w "Movie"',
+                                     director='Rower', imdb_score=8.0,
+                                     popularity=77.5)
+        movie.genres.add(*genres)
+
+        renderer = JSONRenderer()
+        queryset = Movie.objects.order_by('pk')
+        expected = renderer.render(MovieSerializer(
+            queryset.with_genres(), many=True).data)
+        with self.assertNumQueries(2):
+            # Rows and genres of rows
+            rows = list(queryset.as_rows())
+        self.assertEqual(
+            renderer.render(MovieRowSerializer(rows, many=True).data),
+            expected)
+        self.assertEqual(rows[-1]['genres'], ['Action', 'Drama', 'Western'])
+
+        url = '/movie/{0}/'.format(movie.id)
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.content, renderer.render(
+            MovieSerializer(Movie.objects.with_genres().get(
+                pk=movie.pk)).data))
+
+        response = self.client.get('/movie/0/', **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_movie_delete(self):
         """Test API to delete movie instance"""
 
@@ -231,7 +489,7 @@ class MovieTestCase(TestCase):
 
         response = self.client.get(url, **headers)
         self.assertTrue(status.is_success(response.status_code))
-        response_data = response.data
+        response_data = response.data['results']
         self.assertEqual(len(response_data), 2)
 
         response_movie_names = [dct['name'] for dct in response_data]
@@ -243,7 +501,7 @@ class MovieTestCase(TestCase):
 
         response = self.client.get(url, **headers)
         self.assertTrue(status.is_success(response.status_code))
-        response_data = response.data
+        response_data = response.data['results']
         self.assertEqual(len(response_data), 2)
 
         response_movie_names = [dct['name'] for dct in response_data]
@@ -255,7 +513,7 @@ class MovieTestCase(TestCase):
 
         response = self.client.get(url, **headers)
         self.assertTrue(status.is_success(response.status_code))
-        response_data = response.data
+        response_data = response.data['results']
         self.assertEqual(len(response_data), 2)
 
         response_movie_names = [dct['name'] for dct in response_data]
@@ -267,9 +525,902 @@ class MovieTestCase(TestCase):
 
         response = self.client.get(url, **headers)
         self.assertTrue(status.is_success(response.status_code))
-        response_data = response.data
+        response_data = response.data['results']
         self.assertEqual(len(response_data), 2)
 
         response_movie_names = [dct['name'] for dct in response_data]
         self.assertEqual(sorted(['Ghost Busters', 'Tarzan the Ape Man']),
                          sorted(response_movie_names))
+
+    def test_movie_search_query_count(self):
+        """Test number of queries to search movies doesn't grow with result"""
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        url = '/movie/search/?{}'.format(urlencode({'genre': 'drama'}))
+        genres = [Genre.objects.create(genre_name=genre_name)
+                  for genre_name in ('Drama', 'drama', 'Crime')]
+
+        movie_count = 0
+        for count in (1, 10):
+            for index in range(count):
+                movie = Movie.objects.create(
+                    name='Movie {0}-{1}'.format(count, index),
+                    director='Director {0}'.format(index))
+                movie.genres.add(*genres)
+            movie_count += count
+
+            # Authentication, catalogue version, movie search and genre
+            # prefetch. Version isn't cached inside transaction of test case
+            with self.assertNumQueries(4):
+                response = self.client.get(url, **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+            # Authentication and catalogue version
+            with self.assertNumQueries(2):
+                cached_response = self.client.get(url, **headers)
+            self.assertEqual(cached_response['X-Cache'], 'HIT')
+            self.assertEqual(cached_response.data, response.data)
+
+            # Authentication and catalogue version, revision of result
+            with self.assertNumQueries(2):
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+            self.assertEqual(not_modified.status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+
+            response_data = response.data['results']
+            self.assertEqual(len(response_data), movie_count)
+            for movie_data in response_data:
+                self.assertEqual(sorted(movie_data['genre']),
+                                 ['Crime', 'Drama', 'drama'])
+
+    def test_movie_search_filter_queryset(self):
+        """Test search filters each queryset it's given"""
+
+        other_movie = Movie.objects.create(name='Other Movie', director='Anon')
+        request = Request(APIRequestFactory().get('/movie/search/',
+                                                  {'director': 'anon'}))
+        view = MovieSearchView(request=request, args=(), kwargs={},
+                               format_kwarg=None)
+        queryset = Movie.objects.as_rows().order_by('pk')
+        for columnar in (False, True):
+            with override_settings(MOVIE_COLUMNAR_SEARCH=columnar):
+                movies = view.filter_queryset(queryset)
+                narrowed = view.filter_queryset(queryset.filter(
+                    pk=other_movie.pk))
+                self.assertEqual(movies.count(), 2)
+                self.assertEqual(narrowed.count(), 1)
+
+    def test_movie_response_cache(self):
+        """Test responses are cached until movie catalogue changes"""
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        admin_headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        detail_url = '/movie/{0}/'.format(self.sample_movie.id)
+        search_url = '/movie/search/?director=anon&name=sample'
+        version = get_catalogue_version()
+
+        def get(url):
+            response = self.client.get(url, **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            return response['X-Cache'], response.data
+
+        self.assertEqual(get(detail_url)[0], 'MISS')
+        self.assertEqual(get(detail_url)[0], 'HIT')
+        self.assertEqual(get(search_url)[0], 'MISS')
+
+        # Equivalent query parameters share entry
+        cache_status, data = get('/movie/search/?name=sample&director=anon')
+        self.assertEqual(cache_status, 'HIT')
+        self.assertEqual(data['results'][0]['imdb_score'], None)
+
+        # Writes through serializer, bulk endpoint and ORM invalidate
+        response = self.client.put(detail_url, json.dumps({'imdb_score': 8}),
+                                   content_type=self.content_type,
+                                   **admin_headers)
+        self.assertTrue(status.is_success(response.status_code))
+        cache_status, data = get(search_url)
+        self.assertEqual(cache_status, 'MISS')
+        self.assertEqual(data['results'][0]['imdb_score'], 8)
+
+        bulk_data = {'update': [{'id': self.sample_movie.id,
+                                 'genre': ['Drama']}]}
+        response = self.client.post('/movie/bulk/', json.dumps(bulk_data),
+                                    content_type=self.content_type,
+                                    **admin_headers)
+        self.assertTrue(status.is_success(response.status_code))
+        cache_status, data = get(detail_url)
+        self.assertEqual(cache_status, 'MISS')
+        self.assertEqual(data['genre'], ['Drama'])
+
+        Movie.objects.filter(id=self.sample_movie.id).first().delete()
+        response = self.client.get(detail_url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(get(search_url)[1]['results'], [])
+
+        response = self.client.get('/movie/cache/', **headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/movie/cache/', **admin_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], version + 3)
+        self.assertEqual((response.data['local']['hits'],
+                          response.data['local']['misses']), (2, 6))
+        self.assertIsNone(response.data['shared'])
+
+    def test_movie_conditional_requests(self):
+        """Test movie reads are answered with 304 if movie isn't modified"""
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        admin_headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        detail_url = '/movie/{0}/'.format(self.sample_movie.id)
+        search_url = '/movie/search/?director=anon'
+        other_movie = Movie.objects.create(name='Other Movie', director='Anon')
+
+        def get(url, etag=None, **kwargs):
+            if etag:
+                kwargs['HTTP_IF_NONE_MATCH'] = etag
+            response = self.client.get(url, **dict(headers, **kwargs))
+            if response.status_code == status.HTTP_304_NOT_MODIFIED:
+                self.assertEqual(response.content, b'')
+                return None
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response['ETag']
+
+        detail_etag, search_etag = get(detail_url), get(search_url)
+        self.assertTrue(detail_etag.startswith('"'))
+        self.assertNotEqual(detail_etag, search_etag)
+        self.assertIsNone(get(detail_url, detail_etag))
+        self.assertIsNone(get(search_url, search_etag))
+        self.assertIsNotNone(get(search_url + '&page_size=1', search_etag))
+
+        # Revision of search is catalogue version, movies aren't queried
+        movie_table = connection.ops.quote_name(Movie._meta.db_table)
+        with CaptureQueriesContext(connection) as context:
+            self.assertIsNone(get(search_url, search_etag))
+        self.assertFalse([query for query in context.captured_queries
+                          if movie_table in query['sql']])
+
+        response = self.client.get(detail_url, **headers)
+        self.assertIsNone(get(detail_url, HTTP_IF_MODIFIED_SINCE=response[
+            'Last-Modified']))
+
+        # Searches are conditional on ETag only, as movies leaving result
+        # don't change latest modification time
+        response = self.client.get(search_url, **headers)
+        self.assertNotIn('Last-Modified', response)
+        future = 'Thu, 01 Jan 2099 00:00:00 GMT'
+        self.assertIsNotNone(get(search_url, HTTP_IF_MODIFIED_SINCE=future))
+
+        # Genres of movie changed
+        self.client.put(detail_url, json.dumps({'genre': ['Drama']}),
+                        content_type=self.content_type, **admin_headers)
+        new_detail_etag = get(detail_url, detail_etag)
+        self.assertIsNotNone(new_detail_etag)
+        new_search_etag = get(search_url, search_etag)
+        self.assertIsNotNone(new_search_etag)
+
+        # Other movie changed doesn't modify detail of movie
+        bulk_data = {'update': [{'id': other_movie.id, 'imdb_score': 5}]}
+        self.client.post('/movie/bulk/', json.dumps(bulk_data),
+                         content_type=self.content_type, **admin_headers)
+        self.assertIsNone(get(detail_url, new_detail_etag))
+        new_search_etag = get(search_url, new_search_etag)
+        self.assertIsNotNone(new_search_etag)
+
+        # Movie removed from search result
+        other_movie.delete()
+        self.assertIsNotNone(get(search_url, new_search_etag))
+
+    def test_movie_search_pagination(self):
+        """Test cursor pagination of movie search"""
+
+        scores = [7.5, None, 8.1, 7.5, 6.0, 7.5, None]
+        for index, score in enumerate(scores):
+            Movie.objects.create(name='Paged Movie {0}'.format(index),
+                                 director='Pager', imdb_score=score)
+        movies = Movie.objects.filter(director='Pager')
+        expected_ids = [movie.id for movie in sorted(
+            movies, key=lambda movie: (movie.imdb_score or 0, movie.id),
+            reverse=True)]
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        params = {'director': 'pager', 'ordering': '-imdb_score',
+                  'page_size': 2}
+        url = '/movie/search/?{}'.format(urlencode(params))
+
+        # Walk forward through all pages
+        pages = list()
+        while url:
+            response = self.client.get(url, **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            pages.append([dct['id'] for dct in response.data['results']])
+            previous_url = response.data['previous']
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), expected_ids)
+
+        # Walk backward from last page
+        while previous_url:
+            response = self.client.get(previous_url, **headers)
+            pages.pop()
+            self.assertEqual([dct['id'] for dct in response.data['results']],
+                             pages[-1])
+            previous_url = response.data['previous']
+        self.assertEqual(len(pages), 1)
+        self.assertIsNone(response.data['previous'])
+
+        # Cursor is not valid for different filters
+        response = self.client.get(response.data['next'] + '&name=movie',
+                                   **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        params = {'ordering': 'name'}
+        url = '/movie/search/?{}'.format(urlencode(params))
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        request = Request(APIRequestFactory().get(url, {'page_size': 1000}))
+        self.assertEqual(MoviePagination().get_page_size(request),
+                         MoviePagination.max_page_size)
+
+    def test_movie_search_top(self):
+        """Test top-K movies of search are returned with limit"""
+
+        for index, popularity in enumerate([40, 80, None, 80, 95, 12]):
+            Movie.objects.create(name='Top Movie {0}'.format(index),
+                                 director='Ranker', popularity=popularity)
+        expected_ids = [movie.id for movie in sorted(
+            Movie.objects.filter(director='Ranker'),
+            key=lambda movie: (movie.popularity or -1, movie.id),
+            reverse=True)]
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        params = {'director': 'ranker', 'ordering': '-99popularity'}
+        for limit in (1, 3, 10):
+            url = '/movie/search/?{}'.format(urlencode(
+                dict(params, limit=limit)))
+            response = self.client.get(url, **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            self.assertEqual(
+                [dct['id'] for dct in response.data['results']],
+                expected_ids[:limit])
+            self.assertIsNone(response.data['next'])
+            self.assertIsNone(response.data['previous'])
+
+        response = self.client.get('/movie/search/?limit=0', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/movie/search/?page_size=1', **headers)
+        response = self.client.get(response.data['next'] + '&limit=1',
+                                   **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('limit', response.data)
+
+    def test_movie_search_facets(self):
+        """Test genre counts and score statistics of movie search"""
+
+        drama, crime = [Genre.objects.create(genre_name=genre_name)
+                        for genre_name in ('Drama', 'Crime')]
+        for index, (score, popularity, genres) in enumerate((
+                (7.5, 80.0, [drama, crime]), (10.0, 99.0, [drama]),
+                (1.0, 0.0, []), (None, 9.9, [crime]), (7.9, None, [drama]))):
+            movie = Movie.objects.create(
+                name='Facet Movie {0}'.format(index), director='Faceter',
+                imdb_score=score, popularity=popularity)
+            movie.genres.add(*genres)
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        url = '/movie/search/facets/?director=faceter'
+        with self.assertNumQueries(4):
+            # Authentication, catalogue version, statistics and genre counts
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        facets = response.data
+        self.assertEqual(facets['count'], 5)
+        self.assertEqual(facets['genres'], [{'genre': 'Drama', 'count': 3},
+                                            {'genre': 'Crime', 'count': 2}])
+
+        imdb_score = facets['imdb_score']
+        self.assertEqual((imdb_score['min'], imdb_score['max'],
+                          imdb_score['missing']), (1.0, 10.0, 1))
+        self.assertAlmostEqual(imdb_score['avg'], 6.6)
+        self.assertEqual(
+            [(bucket['min'], bucket['count'])
+             for bucket in imdb_score['histogram'] if bucket['count']],
+            [(1, 1), (7, 2), (9, 1)])
+
+        popularity = facets['99popularity']
+        self.assertEqual(len(popularity['histogram']), 10)
+        self.assertEqual(popularity['histogram'][-1],
+                         {'min': 90, 'max': 99, 'count': 1})
+        self.assertEqual(sum(bucket['count'] for bucket
+                             in popularity['histogram']), 4)
+
+        response = self.client.get(url + '&genre=crime&min_imdb_score=5',
+                                   **headers)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['genres'],
+                         [{'genre': 'Crime', 'count': 1},
+                          {'genre': 'Drama', 'count': 1}])
+
+        response = self.client.get(url + '&min_imdb_score=abc', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MOVIE_EXPORT_CHUNK_SIZE=2)
+    def test_movie_search_export(self):
+        """Test streaming export of movie search as CSV and NDJSON"""
+
+        drama = Genre.objects.create(genre_name='Drama')
+        for index, score in enumerate((7.5, 9.0, None, 8.1, 6.0)):
+            movie = Movie.objects.create(
+                name='Export, Movie {0}'.format(index), director='Exporter',
+                imdb_score=score)
+            movie.genres.add(drama)
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        url = '/movie/search/export/?director=exporter&ordering=-imdb_score'
+        response = self.client.get(url, HTTP_ACCEPT='text/csv', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="movies.csv"')
+        with self.assertNumQueries(6):
+            # Movies and their genres, per chunk of 2 movies
+            content = b''.join(response.streaming_content).decode('utf-8')
+
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], ['id', 'name', 'director', 'imdb_score',
+                                   '99popularity', 'genre'])
+        self.assertEqual([row[3] for row in rows[1:]],
+                         ['9.0', '8.1', '7.5', '6.0', ''])
+        self.assertEqual(rows[1][1], 'Export, Movie 1')
+        self.assertEqual(set(row[5] for row in rows[1:]), {'Drama'})
+
+        response = self.client.get(url + '&format=ndjson', **headers)
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        movies = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([movie['imdb_score'] for movie in movies],
+                         [9.0, 8.1, 7.5, 6.0, None])
+        self.assertEqual(movies[0]['genre'], ['Drama'])
+
+        response = self.client.get(
+            '/movie/search/export/?director=nobody&format=csv', **headers)
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'id,name,director,imdb_score,99popularity,genre'
+                         b'\r\n')
+
+        response = self.client.get(url + '&min_imdb_score=abc&format=csv',
+                                   **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_performance_instrumentation(self):
+        """Test timings of sampled requests in headers and statistics"""
+
+        performance_stats.clear()
+        url = '/movie/search/?ordering=-imdb_score'
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        query_count = len(queries)
+
+        timings = dict(entry.split(';', 1) for entry
+                       in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings),
+                         {'total', 'auth', 'db', 'serialize', 'render'})
+        self.assertTrue(timings['db'].endswith(
+            ';desc="{0} queries"'.format(query_count)))
+
+        response = self.client.get('/perf/', **headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin_headers = {'HTTP_AUTHORIZATION': self.admin_auth_header}
+        response = self.client.get('/perf/', **admin_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['MovieSearchView']
+        self.assertEqual((stats['count'], stats['window']), (1, 1))
+        self.assertEqual(stats['db_queries']['p99'], query_count)
+        self.assertGreater(stats['total_ms']['p50'], 0)
+
+        with override_settings(PERF_SAMPLE_RATE=0):
+            response = self.client.get(url, **headers)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_query_budget(self):
+        """Test requests are checked against query budgets of views"""
+
+        genres = [Genre.objects.create(genre_name=name)
+                  for name in ('Drama', 'Crime')]
+        for index in range(3):
+            movie = Movie.objects.create(name='Budget Movie {0}'.format(index),
+                                         director='Budgeter')
+            movie.genres.add(*genres)
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        url = '/movie/search/?director=budgeter'
+        with self.assertQueryBudget(MovieSearchView):
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Query-Budget'], '4')
+        self.assertLessEqual(int(response['X-Query-Count']), 4)
+
+        # Genres read per movie, without prefetch, are reported with
+        # serializer field reading them
+        with self.assertRaises(AssertionError) as failure:
+            with self.assertQueryBudget(2):
+                MovieSerializer(Movie.objects.filter(director='Budgeter'),
+                                many=True).data
+        self.assertIn('4 queries, budget is 2', str(failure.exception))
+        self.assertIn('repeated 3 times by MovieSerializer.genre',
+                      str(failure.exception))
+
+        with self.assertRaises(AssertionError) as failure:
+            with self.assertQueryBudget(MovieCacheStatsView, 'POST'):
+                pass
+        self.assertIn('MovieCacheStatsView has no query budget for POST',
+                      str(failure.exception))
+
+        MovieSearchView.query_budget = {'GET': 1}
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(url + '&page_size=2', **headers)
+        finally:
+            del MovieSearchView.query_budget
+
+        self.assertEqual(
+            normalize_sql('SELECT *  FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            normalize_sql('SELECT * FROM t WHERE id IN (%s) LIMIT 1'))
+
+    def test_movie_text_search(self):
+        """Test full-text search of movies by name and director"""
+
+        for name, director in (('The General', 'Clyde Bruckman'),
+                               ('Tarzan the Ape Man', 'W.S. Van Dyke'),
+                               ('Generation Kill', 'Susanna White')):
+            Movie.objects.create(name=name, director=director)
+
+        headers = {'HTTP_AUTHORIZATION': self.auth_header}
+        base_url = '/movie/search/'
+
+        def search(**params):
+            url = base_url + '?{}'.format(urlencode(params))
+            response = self.client.get(url, **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            return [dct['name'] for dct in response.data['results']]
+
+        # Words are matched as prefixes, movies starting with word ranked first
+        self.assertEqual(search(name='gen'),
+                         ['Generation Kill', 'The General'])
+        self.assertEqual(search(name='the'),
+                         ['The General', 'Tarzan the Ape Man'])
+
+        # Every word must match, in any order
+        self.assertEqual(search(name='ape tar'), ['Tarzan the Ape Man'])
+        self.assertEqual(search(name='ape general'), [])
+
+        # Substrings in middle of words don't match
+        self.assertEqual(search(name='eneral'), [])
+
+        self.assertEqual(search(name='gen', director='white'),
+                         ['Generation Kill'])
+        self.assertEqual(search(name='gen', ordering='id'),
+                         ['The General', 'Generation Kill'])
+
+        # Pages of relevance ordered movies
+        url = base_url + '?{}'.format(urlencode({'name': 'gen',
+                                                 'page_size': 1}))
+        names = list()
+        while url:
+            response = self.client.get(url, **headers)
+            names.extend(dct['name'] for dct in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(names, ['Generation Kill', 'The General'])
+
+
+class LoadMovieDataTestCase(TestCase):
+    """Test cases for 'loadmoviedata' command"""
+
+    fixture_path = 'fixtures/imdb.json'
+
+    @staticmethod
+    def get_catalogue():
+        """Returns movies data in DB as comparable set"""
+
+        return set(
+            (movie.name, movie.director, movie.imdb_score, movie.popularity,
+             tuple(sorted(genre.pk for genre in movie.genres.all())))
+            for movie in Movie.objects.with_genres())
+
+    def test_load_bulk(self):
+        """Test bulk mode loads same data as default mode"""
+
+        call_command('loadmoviedata', self.fixture_path, stdout=StringIO())
+        catalogue = self.get_catalogue()
+        genres = set(Genre.objects.values_list('pk', flat=True))
+        self.assertTrue(catalogue)
+
+        Movie.objects.all().delete()
+        Genre.objects.all().delete()
+
+        stdout = StringIO()
+        call_command('loadmoviedata', self.fixture_path, bulk=True,
+                     batch_size=50, stdout=stdout)
+        self.assertEqual(self.get_catalogue(), catalogue)
+        self.assertEqual(set(Genre.objects.values_list('pk', flat=True)),
+                         genres)
+        self.assertIn('{0} created'.format(len(catalogue)), stdout.getvalue())
+
+        # Loading again doesn't duplicate movies
+        call_command('loadmoviedata', self.fixture_path, bulk=True,
+                     stdout=StringIO())
+        self.assertEqual(self.get_catalogue(), catalogue)
+
+    def test_bulk_writer_collation(self):
+        """Test movies differing in case only are one movie on MySQL"""
+
+        records = [
+            {'name': 'Case Movie', 'director': 'Anon', 'imdb_score': 7.0,
+             'popularity': 70.0, 'genres': ['Drama']},
+            {'name': 'case movie', 'director': 'ANON', 'imdb_score': 7.0,
+             'popularity': 70.0, 'genres': ['Crime']}
+        ]
+        writer = MovieBulkWriter()
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            writer.write(records)
+        self.assertEqual(writer.stats['movies_created'], 1)
+        self.assertEqual(self.get_catalogue(), {
+            ('Case Movie', 'Anon', 7.0, 70.0, ('Crime', 'Drama'))})
+
+        # Other backends compare keys as they are
+        writer = MovieBulkWriter()
+        writer.write(records)
+        self.assertEqual(writer.stats['movies_created'], 1)
+        self.assertEqual(writer.stats['movies_existing'], 1)
+
+    def test_load_parallel(self):
+        """Test loading with worker processes gives same data as single
+        process"""
+
+        call_command('loadmoviedata', self.fixture_path, bulk=True,
+                     stdout=StringIO())
+        catalogue = self.get_catalogue()
+        Movie.objects.all().delete()
+        Genre.objects.all().delete()
+
+        call_command('loadmoviedata', self.fixture_path, bulk=True,
+                     workers=3, batch_size=20, stdout=StringIO())
+        self.assertEqual(self.get_catalogue(), catalogue)
+
+    def test_load_json_lines(self):
+        """Test loading gzip compressed JSON Lines fixture"""
+
+        call_command('loadmoviedata', self.fixture_path, bulk=True,
+                     stdout=StringIO())
+        catalogue = self.get_catalogue()
+        Movie.objects.all().delete()
+
+        with open(self.fixture_path) as file_obj:
+            movie_items = json.load(file_obj)
+        movie_items.append({'name': 'Invalid', 'director': 'Anon',
+                            'imdb_score': 11})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'movies.jsonl.gz')
+            with gzip.open(path, 'wt') as file_obj:
+                for movie_item in movie_items:
+                    file_obj.write(json.dumps(movie_item) + '\n')
+
+            stderr = StringIO()
+            call_command('loadmoviedata', path, bulk=True, batch_size=7,
+                         stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(self.get_catalogue(), catalogue)
+        self.assertIn('Skipped 1 invalid movies', stderr.getvalue())
+
+    def test_iter_json_items(self):
+        """Test incremental parsing of JSON array in small chunks"""
+
+        with open(self.fixture_path) as file_obj:
+            movie_items = json.load(file_obj)
+
+        for document in (json.dumps(movie_items), json.dumps(movie_items,
+                                                             indent=4)):
+            parsed = list(iter_json_items(StringIO(document), chunk_size=7))
+            self.assertEqual(parsed, movie_items)
+
+        self.assertEqual(list(iter_json_items(StringIO(' [ ] '))), [])
+        self.assertEqual(list(iter_json_items(StringIO('[1, 2.5,\n3]'),
+                                              chunk_size=1)), [1, 2.5, 3])
+        for document in ('[1, 2', '[1 2]', '[{"a": 1},]'):
+            with self.assertRaises(ValueError):
+                list(iter_json_items(StringIO(document), chunk_size=2))
+
+
+class ExplainSearchTestCase(TestCase):
+    """Test cases for 'explainsearch' command"""
+
+    def test_explain_search(self):
+        """Test filter combinations of query log are reported with index
+        usage"""
+
+        query_log = '\n'.join([
+            '# movie searches',
+            '127.0.0.1 - - "GET /movie/search/?min_imdb_score=5&'
+            'max_imdb_score=8 HTTP/1.1" 200',
+            'max_imdb_score=9&min_imdb_score=2',
+            '?name=star',
+            'min_imdb_score=abc',
+            '"GET /movie/ HTTP/1.1" 200'
+        ])
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log_file:
+            log_file.write(query_log)
+            log_file.flush()
+            out = StringIO()
+            call_command('explainsearch', log_file.name, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'Replayed 4 searches (1 invalid) in 2 '
+                                   'filter combinations')
+        self.assertEqual(lines[1].split(), [
+            '2', 'max_imdb_score,', 'min_imdb_score', 'ordering=-id:',
+            'uses', 'indexes'])
+        self.assertTrue(lines[2].endswith(
+            'name ordering=-relevance: full scan of movies_movie'))
+        self.assertEqual(lines[3], '1 of 2 filter combinations miss an index')
+
+
+@skipIf(np is None, 'NumPy is not installed')
+class ColumnarSearchTestCase(QueryBudgetTestMixin, TestCase):
+    """Test cases for in-memory search of movies"""
+
+    words = ('star', 'wars', 'the', 'return', 'night', 'starlight', 'ring',
+             'war', 'king', 'a')
+    genre_names = ('Drama', 'drama', 'Crime', 'War', 'Comedy', 'Noir')
+    directors = ('George Lucas', 'Peter Jackson', 'Kingsley Ward',
+                 'Anon', 'Ringo Starr')
+
+    def setUp(self):
+        """Creates random catalogue of movies"""
+
+        self.client = APIClient()
+        user = User.objects.create_user(username='app_tester',
+                                        password='abcd1234')
+        self.client.force_authenticate(user)
+
+        rand = random.Random(7)
+        genres = [Genre.objects.create(genre_name=genre_name)
+                  for genre_name in self.genre_names]
+        for index in range(150):
+            name = ' '.join(rand.choice(self.words).title()
+                            for _ in range(rand.randint(1, 4)))
+            movie = Movie.objects.create(
+                name='{0} {1}'.format(name, index),
+                director=rand.choice(self.directors),
+                imdb_score=rand.choice([None, rand.randint(10, 100) / 10]),
+                popularity=rand.choice([None, float(rand.randint(0, 99))]))
+            movie.genres.add(*rand.sample(genres, rand.randint(0, 3)))
+        self.rand = rand
+
+        response_cache.clear()
+        columnar_search.clear()
+
+    def search(self, url, columnar):
+        """Returns data of search response, with or without in-memory
+        search"""
+
+        response_cache.clear()
+        with override_settings(MOVIE_COLUMNAR_SEARCH=columnar):
+            response = self.client.get(url)
+        return response.status_code, response.data
+
+    def get_random_query(self):
+        """Returns random query parameters of movie search"""
+
+        rand = self.rand
+        params = dict()
+        if rand.random() < 0.3:
+            params['name'] = ' '.join(rand.sample(self.words, 2))[:6]
+        if rand.random() < 0.2:
+            params['director'] = rand.choice(['pe', 'king', 'ring', 'an'])
+        if rand.random() < 0.4:
+            params['genre'] = rand.choice(['drama', 'WAR', 'noir', 'horror'])
+        for param, bounds in (('min_imdb_score', (1, 10)),
+                              ('max_imdb_score', (1, 10)),
+                              ('min_99popularity', (0, 99)),
+                              ('max_99popularity', (0, 99))):
+            if rand.random() < 0.3:
+                params[param] = rand.randint(*bounds)
+        params['ordering'] = rand.choice(
+            ['id', '-id', 'imdb_score', '-imdb_score', '99popularity',
+             '-99popularity'] + (['relevance', '-relevance'] * 2
+                                 if 'name' in params else []))
+        params['page_size'] = rand.choice([5, 20])
+        if rand.random() < 0.2:
+            params['limit'] = rand.choice([1, 3, 10])
+        return params
+
+    def test_columnar_search_matches_orm(self):
+        """Test in-memory search returns same pages as ORM search"""
+
+        for _ in range(60):
+            url = '/movie/search/?' + urlencode(self.get_random_query())
+            visited = 0
+            while url:
+                orm_status, orm_data = self.search(url, columnar=False)
+                status_code, data = self.search(url, columnar=True)
+                self.assertEqual((status_code, data), (orm_status, orm_data),
+                                 url)
+                if status_code != status.HTTP_200_OK:
+                    break
+
+                # Walk back one page from second page
+                visited += 1
+                if visited == 2 and data['previous']:
+                    self.assertEqual(
+                        self.search(data['previous'], columnar=True),
+                        self.search(data['previous'], columnar=False))
+                url = data['next']
+
+        status_code, data = self.search('/movie/search/?min_imdb_score=abc',
+                                        columnar=True)
+        self.assertEqual(status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_imdb_score', data)
+
+    def test_columnar_search_refresh(self):
+        """Test snapshot of in-memory search follows writes of movies"""
+
+        url = '/movie/search/?genre=western&page_size=100'
+        self.assertEqual(self.search(url, columnar=True)[1]['results'], [])
+
+        movie = Movie.objects.create(name='Rio Bravo', director='Hawks')
+        movie.genres.add(Genre.objects.create(genre_name='Western'))
+        other_movie = Movie.objects.order_by('pk').first()
+        other_movie.genres.add('Western')
+        self.assertEqual(self.search(url, columnar=True),
+                         self.search(url, columnar=False))
+        self.assertEqual(
+            len(self.search(url, columnar=True)[1]['results']), 2)
+
+        other_movie.delete()
+        results = self.search(url, columnar=True)[1]['results']
+        self.assertEqual([movie_data['id'] for movie_data in results],
+                         [movie.pk])
+
+        # Update without signals is seen once catalogue version is bumped
+        url = '/movie/search/?genre=western&min_imdb_score=9'
+        self.assertEqual(self.search(url, columnar=True)[1]['results'], [])
+        Movie.objects.filter(pk=movie.pk).update(imdb_score=9.5)
+        self.assertEqual(self.search(url, columnar=True)[1]['results'], [])
+        bump_catalogue_version()
+        results = self.search(url, columnar=True)[1]['results']
+        self.assertEqual([movie_data['id'] for movie_data in results],
+                         [movie.pk])
+
+        # Snapshot patched by refreshes matches snapshot rebuilt from
+        # scratch
+        Movie.objects.filter(pk=movie.pk).update(director='Howard Hawks')
+        bump_catalogue_version()
+        patched = columnar_search.get_snapshot()
+        rebuilt = ColumnarSnapshot(
+            columnar_search.read_rows(Movie.objects.all()), patched.version)
+        self.assertLess(patched.built_at, rebuilt.built_at)
+
+        def get_genres(snapshot):
+            return [sorted(genre for genre, flag in
+                           zip(snapshot.genre_names, row) if flag)
+                    for row in snapshot.genres.tolist()]
+
+        self.assertEqual(patched.ids.tolist(), rebuilt.ids.tolist())
+        for field in ('name', 'director'):
+            patched_column = getattr(patched, field)
+            rebuilt_column = getattr(rebuilt, field)
+            self.assertEqual(
+                patched_column.lowered[patched_column.codes].tolist(),
+                rebuilt_column.lowered[rebuilt_column.codes].tolist())
+        for column, values in rebuilt.columns.items():
+            np.testing.assert_array_equal(patched.columns[column], values)
+        np.testing.assert_array_equal(patched.modified_at,
+                                      rebuilt.modified_at)
+        self.assertEqual(get_genres(patched), get_genres(rebuilt))
+
+
+class DatabasePoolTestCase(TestCase):
+    """Test cases for pool of database connections"""
+
+    def test_pool_checkout(self):
+        """Test connections are reused, bounded and health checked"""
+
+        pool = ConnectionPool(max_size=2, idle_timeout=60, timeout=0.1)
+
+        def connect():
+            return sqlite3.connect(':memory:', check_same_thread=False)
+
+        first, second = pool.checkout(connect), pool.checkout(connect)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(connect)
+
+        pool.checkin(first)
+        self.assertIs(pool.checkout(connect), first)
+        pool.checkin(first)
+
+        # Checkout of full pool waits for connection to be released
+        pool.timeout = 5
+        self.assertIs(pool.checkout(connect), first)
+        threading.Timer(0.05, pool.checkin, [first]).start()
+        self.assertIs(pool.checkout(connect), first)
+        self.assertGreaterEqual(pool.get_stats()['wait_max'], 0.05)
+        pool.checkin(first)
+
+        # Broken connection is replaced on checkout
+        first.close()
+        replacement = pool.checkout(connect)
+        self.assertIsNot(replacement, first)
+        pool.checkin(replacement)
+        pool.checkin(second)
+
+        stats = pool.get_stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['in_use']),
+                         (2, 2, 0))
+        self.assertEqual(
+            (stats['checkouts'], stats['created'], stats['ping_failures'],
+             stats['discarded'], stats['timeouts']), (6, 3, 1, 1, 1))
+
+        # Idle connections expire
+        pool.idle_timeout = 0
+        pool.checkout(connect)
+        self.assertEqual(pool.get_stats()['closed_idle'], 2)
+
+    def test_pooled_backend(self):
+        """Test pooled backend returns connection to pool on close"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(
+                connection.settings_dict,
+                NAME=os.path.join(directory, 'pool.sqlite3'),
+                POOL={'MAX_SIZE': 1, 'IDLE_TIMEOUT': 60})
+            wrapper = PooledSQLiteWrapper(settings_dict, alias='pool_test')
+            pool = wrapper.get_pool()
+
+            with wrapper.cursor() as cursor:
+                cursor.execute('CREATE TABLE pooled (id INTEGER)')
+            raw_connection = wrapper.connection
+            wrapper.close()
+            self.assertEqual(pool.get_stats()['idle'], 1)
+
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM pooled')
+            self.assertIs(wrapper.connection, raw_connection)
+            wrapper.close()
+            pool.clear()
+
+        user = User.objects.create_user(username='pool_admin',
+                                        password='xyz01234', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/db/pool/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['pool_test']['created'], 1)
+        self.assertEqual(response.data['pool_test']['checkouts'], 2)
+
+    def test_sqlite_database_url(self):
+        """Test project settings connect to SQLite DATABASE_URL, as used by
+        'benchmarks.suite --database-url'"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            environ = dict(
+                os.environ, DJANGO_SETTINGS_MODULE='fynd_assignment.settings',
+                DATABASE_URL='sqlite:///' + os.path.join(directory,
+                                                         'url.sqlite3'))
+            output = subprocess.check_output([
+                sys.executable, '-c',
+                'import django; django.setup(); '
+                'from django.db import connection; '
+                'connection.ensure_connection(); '
+                'print(connection.vendor)'
+            ], env=environ, cwd=settings.BASE_DIR, universal_newlines=True)
+        self.assertEqual(output.strip(), 'sqlite')
@@ -5,5 +5,9 @@ from . import views
 urlpatterns = [
     url(r'^$', views.MovieCreateView.as_view()),
     url(r'^(?P<movie_id>\d+)/$', views.MovieDetailsView.as_view()),
-    url(r'^search/$', views.MovieSearchView.as_view())
+    url(r'^search/$', views.MovieSearchView.as_view()),
+    url(r'^search/facets/$', views.MovieFacetsView.as_view()),
+    url(r'^search/export/$', views.MovieExportView.as_view()),
+    url(r'^bulk/$', views.MovieBulkView.as_view()),
+    url(r'^cache/$', views.MovieCacheStatsView.as_view())
 ]
@@ -1,17 +1,39 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
-from rest_framework.generics import CreateAPIView, ListAPIView, \
-    RetrieveDestroyAPIView
+from rest_framework.views import APIView
+from rest_framework.generics import CreateAPIView, GenericAPIView, \
+    ListAPIView, RetrieveAPIView, RetrieveDestroyAPIView
 
 from django_filters import rest_framework as filters
+from django_filters.utils import translate_validation
 
 from utils.filters import MovieFilter
+from utils.pagination import MoviePagination
 from utils.permissions import ReadOnlyAuthenticated
-from utils.mixins import PartialUpdateMixin
+from utils.querybudget import query_budget
+from utils.renderers import CSVRenderer, NDJSONRenderer
+from utils.mixins import CachedResponseMixin, ConditionalResponseMixin, \
+    PartialUpdateMixin
 
+from .bulk import create_movies, fetch_movies, movie_key, update_movies
+from .cache import deferred_bump, get_catalogue_version, response_cache
+from .columnar import get_columnar_search
+from .facets import get_facets
 from .models import Movie
-from .serializers import MovieSerializer
+from .serializers import MovieSerializer, MovieBulkSerializer, \
+    MovieBulkItemSerializer, MovieRowSerializer
+
+# Error of movie whose (name, director) isn't unique once batch is applied
+UNIQUE_MOVIE_ERROR = 'The fields name, director must make a unique set.'
 
 
+@query_budget(POST=13)
 class MovieCreateView(CreateAPIView):
     """View to create Movie instance
 
@@ -24,22 +46,55 @@ class MovieCreateView(CreateAPIView):
     permission_classes = (IsAdminUser,)
 
 
-class MovieDetailsView(RetrieveDestroyAPIView, PartialUpdateMixin):
+@query_budget(GET=5, PUT=18, PATCH=18, DELETE=6)
+class MovieDetailsView(ConditionalResponseMixin, CachedResponseMixin,
+                       RetrieveDestroyAPIView, PartialUpdateMixin):
     """View to implement update, read and delete operation on Movie instance
 
     Notes
     -----
     Only Admin user can modify movie instance. All authenticated user
      has read access.
+
+    Responses of reads are cached until movie catalogue changes. Reads are
+    conditional on modification time of movie. Movie is read as row and
+    serialized with MovieRowSerializer.
     """
 
-    queryset = Movie.objects.all()
+    response_cache = response_cache
+
+    queryset = Movie.objects.with_genres()
     serializer_class = MovieSerializer
     lookup_url_kwarg = 'movie_id'
     permission_classes = (IsAdminUser | ReadOnlyAuthenticated,)
 
+    def get_revision(self, request):
+        """Returns modification time of movie, looked up by primary key"""
+
+        modified_at = Movie.objects.filter(
+            pk=self.kwargs[self.lookup_url_kwarg]).values_list(
+            'modified_at', flat=True).first()
+        return None if modified_at is None else (modified_at, modified_at)
 
-class MovieSearchView(ListAPIView):
+    def retrieve(self, request, *args, **kwargs):
+        """Returns movie serialized from its row
+
+        Raises
+        ------
+        <django.http.Http404> :
+            if movie doesn't exist
+        """
+
+        row = Movie.objects.as_rows().filter(
+            pk=self.kwargs[self.lookup_url_kwarg]).first()
+        if row is None:
+            raise Http404('No Movie matches the given query.')
+        return Response(MovieRowSerializer(row).data)
+
+
+@query_budget(GET=4)
+class MovieSearchView(ConditionalResponseMixin, CachedResponseMixin,
+                      ListAPIView):
     """View to search list of movies
 
     Notes
@@ -50,10 +105,343 @@ class MovieSearchView(ListAPIView):
     Movies can be search based on:
             name, director, genre,
             max_imdb_score, min_imdb_score, max_99popularity, min_99popularity
+
+    Genres of searched movies are prefetched, so number of queries doesn't
+    grow with number of movies in result.
+
+    Results are paginated with cursor. Pass 'ordering' (id, imdb_score,
+    99popularity, prefixed with '-' for descending) and 'page_size' in query
+    parameters. Follow 'next' and 'previous' links of response to navigate.
+
+    With MOVIE_COLUMNAR_SEARCH setting, filters are evaluated on in-memory
+    snapshot of catalogue (movies.columnar) instead of database, on
+    snapshot of catalogue version read for response cache.
+
+    Responses are cached until movie catalogue changes. Searches are
+    conditional on ETag of request and catalogue version, so they are
+    answered without querying movies.
+
+    Movies are read as rows with their genres and serialized with
+    MovieRowSerializer, same output as MovieSerializer.
+    """
+
+    response_cache = response_cache
+
+    serializer_class = MovieRowSerializer
+    permission_classes = (IsAuthenticated,)
+    queryset = Movie.objects.as_rows()
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = MovieFilter
+    pagination_class = MoviePagination
+
+    def get_revision(self, request):
+        """Returns catalogue version read for response cache as revision,
+        without modification time
+
+        Notes
+        -----
+        Any write to catalogue changes revision, as it invalidates cached
+        responses. Version is cached in process, so revision costs no query
+        over movies found. Searches have no Last-Modified and
+        'If-Modified-Since' isn't honoured, as no modification time changes
+        when movie leaves result. Searches aren't conditional if responses
+        aren't cached.
+        """
+
+        version = self.get_cache_version()
+        return None if version is None else (None, version)
+
+    def filter_queryset(self, queryset):
+        """Filters movies with in-memory search if it's enabled
+
+        Notes
+        -----
+        Filter values are validated by MovieFilter either way. Returns
+        ColumnarResult instead of QuerySet, which MoviePagination pages
+        through, for searches evaluated in memory. Snapshot holds whole
+        catalogue, so queryset already filtered (e.g. by subclass) is
+        searched with ORM.
+        """
+
+        search = get_columnar_search()
+        if search is None:
+            return super(MovieSearchView, self).filter_queryset(queryset)
+
+        filterset = self.filterset_class(data=self.request.query_params,
+                                         queryset=queryset,
+                                         request=self.request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+
+        params = filterset.form.cleaned_data
+        if not search.supports(params) or queryset.query.where:
+            return filterset.qs
+        return search.search(params, queryset,
+                             version=self.get_cache_version())
+
+
+@query_budget(GET=4)
+class MovieFacetsView(CachedResponseMixin, RetrieveAPIView):
+    """View to aggregate genre counts and score statistics of movie search
+
+    Notes
+    -----
+    Only Authenticated user can read facets.
+
+    Takes same filters as MovieSearchView. Returns number of movies found,
+    their count per genre and min, max, avg and histogram of imdb_score
+    and 99popularity, computed with grouped SQL aggregates.
+
+    Responses are cached until movie catalogue changes.
     """
 
-    serializer_class = MovieSerializer
     permission_classes = (IsAuthenticated,)
     queryset = Movie.objects.all()
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = MovieFilter
+    response_cache = response_cache
+
+    def retrieve(self, request, *args, **kwargs):
+        """Returns facets of filtered movies"""
+
+        return Response(get_facets(self.filter_queryset(self.get_queryset())))
+
+
+class MovieExportView(MovieSearchView):
+    """View to export all movies of search as NDJSON or CSV
+
+    Notes
+    -----
+    Only Authenticated user can export movies.
+
+    Takes same filters and 'ordering' as MovieSearchView. Format is
+    negotiated from Accept header (application/x-ndjson, text/csv) or
+    'format' query parameter (ndjson, csv).
+
+    Movies are fetched in chunks of MOVIE_EXPORT_CHUNK_SIZE with keyset
+    condition, genres prefetched per chunk, and rows are streamed as each
+    chunk is serialized. Memory doesn't grow with number of movies
+    exported, and first rows are sent after first chunk is fetched.
+    Exports aren't cached.
+    """
+
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    csv_header = ('id', 'name', 'director', 'imdb_score', '99popularity',
+                  'genre')
+
+    def get(self, request, *args, **kwargs):
+        """Returns streaming response of filtered movies
+
+        Notes
+        -----
+        Filters and ordering are validated before response starts, so
+        invalid searches get error response with 400 status.
+        """
+
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = self.paginator.get_chunks(
+            queryset, request,
+            getattr(settings, 'MOVIE_EXPORT_CHUNK_SIZE', 500))
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            self.stream_rows(renderer, chunks),
+            content_type='{0}; charset={1}'.format(renderer.media_type,
+                                                   renderer.charset))
+        response['Content-Disposition'] = \
+            'attachment; filename="movies.{0}"'.format(renderer.format)
+        return response
+
+    def stream_rows(self, renderer, chunks):
+        """Yields rendered rows of movies, chunk by chunk"""
+
+        rows = (row for chunk in chunks
+                for row in self.get_serializer(chunk, many=True).data)
+        if isinstance(renderer, CSVRenderer):
+            return renderer.stream(rows, self.csv_header)
+        return renderer.stream(rows)
+
+
+@query_budget(POST=30)
+class MovieBulkView(GenericAPIView):
+    """View to create, update and delete batch of Movie instances
+
+    Notes
+    -----
+    Only Admin user can modify movie instances.
+
+    Request data:
+        {
+            'create': [{movie}, ...],
+            'update': [{'id': int, fields to update}, ...],
+            'delete': [id, ...]
+        }
+
+    Every operation is validated as with single movie views. Uniqueness of
+    (name, director) is checked for whole batch with single query, against
+    movies in DB and other operations of batch. If any operation is
+    invalid, nothing is applied and errors are returned per operation.
+    Else, all operations are applied in single transaction with bulk queries
+    and result is returned per operation.
+    """
+
+    serializer_class = MovieBulkSerializer
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        """Apply batch of movie operations"""
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data
+
+        with transaction.atomic(), deferred_bump():
+            create_data, create_errors = self.validate_create(
+                operations.get('create', []))
+            update_changes, update_errors = self.validate_update(
+                operations.get('update', []))
+            # Errors of valid updates are empty, in order of changes
+            self.validate_unique(create_data, create_errors, update_changes,
+                                 [error for error in update_errors
+                                  if not error])
+
+            if any(create_errors) or any(update_errors):
+                # Discard genres created while validating
+                transaction.set_rollback(True)
+                return Response(OrderedDict([
+                    ('create', create_errors),
+                    ('update', update_errors)
+                ]), status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                with transaction.atomic():
+                    movies = create_movies(create_data)
+                    update_movies(update_changes)
+            except IntegrityError:
+                # Movie created concurrently by other request, or equal to
+                # another under case-insensitive collation
+                transaction.set_rollback(True)
+                return Response({'non_field_errors': [UNIQUE_MOVIE_ERROR]},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            delete_ids = operations.get('delete', [])
+            deleted = Movie.objects.filter(pk__in=delete_ids)
+            deleted_ids = set(deleted.values_list('pk', flat=True))
+            deleted.delete()
+
+        return Response(OrderedDict([
+            ('create', [{'id': movie.pk, 'status': status.HTTP_201_CREATED}
+                        for movie in movies]),
+            ('update', [{'id': movie.pk, 'status': status.HTTP_200_OK}
+                        for movie, _ in update_changes]),
+            ('delete', [{'id': pk, 'status': status.HTTP_204_NO_CONTENT
+                         if pk in deleted_ids else status.HTTP_404_NOT_FOUND}
+                        for pk in delete_ids])
+        ]))
+
+    def validate_create(self, items):
+        """Validates movies to create
+
+        Returns
+        -------
+        (list, list) :
+            Validated data and errors of each movie
+        """
+
+        if not items:
+            return [], []
+
+        serializer = MovieBulkItemSerializer(
+            data=items, many=True, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            return [], serializer.errors
+        return serializer.validated_data, [dict() for _ in items]
+
+    def validate_update(self, items):
+        """Validates partial updates of movies
+
+        Returns
+        -------
+        (list, list) :
+            (Movie, validated data) and errors of each update
+        """
+
+        ids = [item.get('id') for item in items]
+        movies = Movie.objects.in_bulk(
+            [pk for pk in ids if isinstance(pk, int)])
+
+        changes, errors = list(), list()
+        seen = set()
+        for pk, item in zip(ids, items):
+            if isinstance(pk, bool) or pk not in movies:
+                errors.append({'id': ['Movie not found.']})
+                continue
+            if pk in seen:
+                errors.append({'id': ['Movie is updated more than once.']})
+                continue
+            seen.add(pk)
+
+            data = {key: value for key, value in item.items() if key != 'id'}
+            serializer = MovieBulkItemSerializer(
+                movies[pk], data=data, partial=True,
+                context=self.get_serializer_context())
+            if serializer.is_valid():
+                changes.append((movies[pk], serializer.validated_data))
+                errors.append({})
+            else:
+                errors.append(serializer.errors)
+        return changes, errors
+
+    def validate_unique(self, create_data, create_errors, update_changes,
+                        update_errors):
+        """Validates movies are unique on (name, director) once batch is
+        applied
+
+        Notes
+        -----
+        (name, director) of created movies and of updated movies whose name
+        or director changes are looked up with single query, and compared as
+        DB compares them (see movies.bulk.movie_key). Movie clashes with
+        movie in DB other than itself, even if that one is updated too, and
+        with created or updated movie preceding it in batch.
+        Errors are added to 'create_errors' and 'update_errors', which are
+        aligned with 'create_data' and 'update_changes'.
+        """
+
+        operations = [((data['name'], data['director']), None, error)
+                      for data, error in zip(create_data, create_errors)]
+        for (movie, data), error in zip(update_changes, update_errors):
+            key = (data.get('name', movie.name),
+                   data.get('director', movie.director))
+            if key != (movie.name, movie.director):
+                operations.append((key, movie.pk, error))
+        if not operations:
+            return
+
+        movies = fetch_movies(set(key for key, _, _ in operations))
+        seen = set()
+        for key, pk, error in operations:
+            if movie_key(*key) in seen or \
+                    key in movies and movies[key].pk != pk:
+                error['non_field_errors'] = [UNIQUE_MOVIE_ERROR]
+            seen.add(movie_key(*key))
+
+
+@query_budget(GET=2)
+class MovieCacheStatsView(APIView):
+    """View to read statistics of movie response cache
+
+    Notes
+    -----
+    Only Admin user can read statistics. Statistics are of the process
+    serving request only.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        """Returns catalogue version and statistics of response cache"""
+
+        data = OrderedDict([('version', get_catalogue_version())])
+        data.update(response_cache.get_stats())
+        return Response(data)
@@ -0,0 +1,111 @@
+import copy
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import authentication, exceptions
+from rest_framework.authentication import BaseAuthentication, \
+    get_authorization_header
+
+from utils.cache import LRUCache
+from utils.perf import timer
+from .models import AuthToken
+
+# Tokens verified recently, cached by digest of token key
+token_cache = LRUCache(
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60))
+
+
+def revoke_tokens(tokens):
+    """Deletes tokens and evicts them from cache of current process
+
+    Parameters
+    ----------
+    tokens : <django.db.models.QuerySet>
+        QuerySet of AuthToken to revoke
+
+    Notes
+    -----
+    Other processes may serve revoked token from their cache until cache
+    entry expires (AUTH_TOKEN_CACHE_TTL seconds).
+    """
+
+    for digest in tokens.values_list('digest', flat=True):
+        token_cache.delete(digest)
+    tokens.delete()
+
+
+class TokenAuthentication(BaseAuthentication):
+    """Authenticates requests with 'Authorization: Token <key>' header
+
+    Notes
+    -----
+    Token is looked up by digest of key in in-process cache first, then in
+    DB. Cached token and User are copied for each request.
+    """
+
+    keyword = 'Token'
+
+    @timer('auth')
+    def authenticate(self, request):
+        """Returns (User, AuthToken) of valid token, None if token header
+        isn't provided
+
+        Raises
+        ------
+        <rest_framework.exceptions.AuthenticationFailed> :
+            if token is malformed, unknown or user is inactive
+        """
+
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header.'))
+        try:
+            key = auth[1].decode('ascii')
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header.'))
+
+        return self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        """Returns (User, AuthToken) for token key"""
+
+        digest = AuthToken.get_digest(key)
+        token = token_cache.get(digest)
+        if token is None:
+            try:
+                token = AuthToken.objects.select_related('user').get(
+                    digest=digest)
+            except AuthToken.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token_cache.set(digest, token)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
+
+    def authenticate_header(self, request):
+        """Returns value of 'WWW-Authenticate' header for 401 responses"""
+
+        return self.keyword
+
+
+class BasicAuthentication(authentication.BasicAuthentication):
+    """HTTP Basic authentication, timed as 'auth' of instrumented requests
+    (utils.middleware.PerformanceMiddleware)"""
+
+    @timer('auth')
+    def authenticate(self, request):
+        """Returns (User, None) of valid credentials, None if credentials
+        aren't provided"""
+
+        return super(BasicAuthentication, self).authenticate(request)
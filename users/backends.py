@@ -0,0 +1,30 @@
+from django.contrib.auth import backends, get_user_model
+
+from .hashers import hash_password, verify_password
+
+UserModel = get_user_model()
+
+
+class ModelBackend(backends.ModelBackend):
+    """Authenticates against User model, with passwords hashed by hashing
+    pool (users.hashers)
+
+    Notes
+    -----
+    Outdated hashes are upgraded in background instead of during login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """Returns User of valid credentials, None otherwise"""
+
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash password anyway, so unknown users aren't told by timing
+            hash_password(password)
+        else:
+            if verify_password(user, password) and \
+                    self.user_can_authenticate(user):
+                return user
@@ -0,0 +1,195 @@
+import atexit
+import threading
+import multiprocessing
+from collections import Counter
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .hashers import hashing_pool
+from .serializers import UserProvisionSerializer, UserSerializer
+
+DUPLICATE_USERNAME = 'A user with that username already exists.'
+
+
+def open_hashing_processes(processes):
+    """Returns pool of processes hashing passwords
+
+    Notes
+    -----
+    Processes are started with 'spawn' and set up Django with settings of
+    DJANGO_SETTINGS_MODULE: forking a process serving requests from several
+    threads isn't safe.
+    """
+
+    return multiprocessing.get_context('spawn').Pool(
+        processes, initializer=django.setup)
+
+
+# Pool of hashing processes of this process, for provisioning endpoint
+_processes = None
+_processes_lock = threading.Lock()
+
+
+def get_hashing_processes():
+    """Returns pool of USER_BULK_PROCESSES hashing processes, None if
+    setting is less than 2
+
+    Notes
+    -----
+    Pool is started on first use and kept until process exits: each web
+    worker then has USER_BULK_PROCESSES more resident processes, each
+    with Django loaded, hashing beside threads of hashing pool
+    (users.hashers). Disabled by default, passwords are hashed by hashing
+    pool, bounded by PASSWORD_HASHING_THREADS.
+    """
+
+    global _processes
+    if getattr(settings, 'USER_BULK_PROCESSES', 0) < 2:
+        return None
+    with _processes_lock:
+        if _processes is None:
+            _processes = open_hashing_processes(settings.USER_BULK_PROCESSES)
+            atexit.register(_processes.terminate)
+        return _processes
+
+
+def hash_passwords(passwords, processes=None):
+    """Returns passwords encoded by preferred hasher
+
+    Parameters
+    ----------
+    passwords : list of str
+        Raw passwords
+    processes : <multiprocessing.pool.Pool>
+        Pool of processes hashing passwords in parallel. If None, passwords
+        are hashed in parallel by hashing pool of this process
+        (users.hashers)
+
+    Notes
+    -----
+    Every password is submitted to hashing pool before any result is
+    awaited, so pool hashes PASSWORD_HASHING_THREADS passwords at once.
+    Submitting waits for room once PASSWORD_HASHING_QUEUE passwords are
+    pending.
+    """
+
+    if processes is None:
+        futures = [hashing_pool.submit(make_password, password)
+                   for password in passwords]
+        return [future.result() for future in futures]
+    return processes.map(make_password, passwords)
+
+
+class UserProvisioner(object):
+    """Creates users of stream of user records, chunk by chunk
+
+    Parameters
+    ----------
+    chunk_size : int
+        Number of records validated and inserted together
+    processes : <multiprocessing.pool.Pool>
+        Pool of processes hashing passwords, see 'hash_passwords'
+
+    Notes
+    -----
+    Records are validated as by UserSerializer (registration). Uniqueness
+    of username is checked for whole chunk with one query, against users
+    in DB and other records. Passwords of valid records of chunk are hashed
+    in parallel, then users are inserted with bulk insert, in transaction
+    per chunk. Only one chunk of records is held in memory.
+
+    Invalid records are skipped and added to 'errors' as (record index,
+    errors), other records are created. Counts are kept in 'stats'.
+    """
+
+    def __init__(self, chunk_size=500, processes=None):
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self.stats = Counter()
+        self.errors = list()
+
+    def provision(self, records, callback=None):
+        """Creates users of records (iterable of dict), returns 'stats'
+
+        Parameters
+        ----------
+        callback : callable
+            Called with 'stats' after each chunk, e.g. to report progress
+        """
+
+        rows = enumerate(records)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return self.stats
+            self.write(chunk)
+            if callback is not None:
+                callback(self.stats)
+
+    def write(self, rows):
+        """Creates users of chunk of (index, record)"""
+
+        self.stats['records'] += len(rows)
+        valid = self.validate(rows)
+        if not valid:
+            return
+
+        passwords = hash_passwords(
+            [data.pop('password') for index, data in valid], self.processes)
+        users = [(index, UserSerializer.build_user(data, password))
+                 for (index, data), password in zip(valid, passwords)]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for index, user in users])
+            self.stats['created'] += len(users)
+        except IntegrityError:
+            # Username taken since it was checked, or equal to another under
+            # case-insensitive collation: users are inserted one by one
+            for index, user in users:
+                try:
+                    with transaction.atomic():
+                        user.save()
+                    self.stats['created'] += 1
+                except IntegrityError:
+                    self.add_error(index, {'username': [DUPLICATE_USERNAME]})
+
+    def validate(self, rows):
+        """Returns (index, validated data) of valid records of chunk
+
+        Notes
+        -----
+        Errors of invalid records are added to 'errors'.
+        """
+
+        valid = list()
+        for index, record in rows:
+            serializer = UserProvisionSerializer(data=record)
+            if serializer.is_valid():
+                valid.append((index, dict(serializer.validated_data)))
+            else:
+                self.add_error(index, serializer.errors)
+
+        usernames = [User.normalize_username(data['username'])
+                     for index, data in valid]
+        taken = set(User.objects.filter(username__in=usernames).values_list(
+            'username', flat=True))
+
+        unique = list()
+        for (index, data), username in zip(valid, usernames):
+            if username in taken:
+                self.add_error(index, {'username': [DUPLICATE_USERNAME]})
+            else:
+                taken.add(username)
+                unique.append((index, data))
+        return unique
+
+    def add_error(self, index, errors):
+        """Adds errors of record to 'errors'"""
+
+        self.stats['invalid'] += 1
+        self.errors.append((index, errors))
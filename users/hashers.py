@@ -0,0 +1,200 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.db import connections, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 hasher with PASSWORD_PBKDF2_ITERATIONS iterations"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS',
+                       hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 hasher with PASSWORD_ARGON2_TIME_COST, _MEMORY_COST (KiB) and
+    _PARALLELISM work factors. Requires argon2-cffi, which is optional"""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST',
+                       hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST',
+                       hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM',
+                       hashers.Argon2PasswordHasher.parallelism)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """bcrypt hasher with PASSWORD_BCRYPT_ROUNDS rounds (log2). Requires
+    bcrypt, which is optional"""
+
+    @property
+    def rounds(self):
+        return getattr(settings, 'PASSWORD_BCRYPT_ROUNDS',
+                       hashers.BCryptSHA256PasswordHasher.rounds)
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when hashing pool has no room for password within timeout"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many passwords being verified, try again later.'
+    default_code = 'password_hashing_busy'
+
+
+class HashingPool(object):
+    """Bounded pool of threads hashing passwords in a process
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of passwords hashed at once
+    max_pending : int
+        Maximum number of passwords being hashed or waiting for thread
+    timeout : float
+        Maximum seconds 'submit' waits for room among pending passwords
+
+    Notes
+    -----
+    Hashers (hashlib, argon2-cffi, bcrypt) release GIL while hashing, so
+    hashing uses at most 'max_workers' cores however many requests log in
+    at once, and other requests keep being served. Threads are started on
+    first use in each process (after fork of workers).
+    """
+
+    def __init__(self, max_workers=2, max_pending=64, timeout=10):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+
+    def submit(self, func, *args, wait=True):
+        """Schedules func(*args), returns its future
+
+        Parameters
+        ----------
+        wait : bool
+            If False, raises at once when pool is full
+
+        Raises
+        ------
+        <users.hashers.PasswordHashingBusy> :
+            if pool is full for 'timeout' seconds
+        """
+
+        executor, slots = self._get_executor()
+        if not slots.acquire(wait, self.timeout if wait else None):
+            raise PasswordHashingBusy()
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda future: slots.release())
+        return future
+
+    def run(self, func, *args):
+        """Returns result of func(*args) run by pool"""
+
+        return self.submit(func, *args).result()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_workers)
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+
+# Pool hashing passwords of process
+hashing_pool = HashingPool(
+    max_workers=getattr(settings, 'PASSWORD_HASHING_THREADS', 2),
+    max_pending=getattr(settings, 'PASSWORD_HASHING_QUEUE', 64),
+    timeout=getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 10))
+
+
+def hash_password(password):
+    """Returns password encoded by preferred hasher, hashed by pool
+
+    Notes
+    -----
+    None makes unusable password, as 'make_password' does, without pool.
+    """
+
+    if password is None:
+        return hashers.make_password(None)
+    return hashing_pool.run(hashers.make_password, password)
+
+
+def verify_password(user, password):
+    """Returns True if password is password of user, hashed by pool
+
+    Notes
+    -----
+    Unlike 'User.check_password', hash made by other hasher or work
+    factors than preferred ones isn't upgraded in request. It's upgraded
+    by pool in background, once transaction of request commits, see
+    'rehash_password'.
+    """
+
+    encoded = user.password
+    outdated = list()
+    is_correct = hashing_pool.run(hashers.check_password, password, encoded,
+                                  outdated.append)
+    if outdated:
+        transaction.on_commit(
+            lambda: schedule_rehash(user.pk, password, encoded))
+    return is_correct
+
+
+def schedule_rehash(user_id, password, encoded):
+    """Upgrades hash of user in background, skipped if pool is full, so
+    it's retried on next login"""
+
+    try:
+        hashing_pool.submit(_rehash_password, user_id, password, encoded,
+                            wait=False)
+    except PasswordHashingBusy:
+        pass
+
+
+def rehash_password(user_id, password, encoded):
+    """Stores password of user hashed by preferred hasher, unless hash of
+    user changed since it was verified (e.g. password was changed)
+
+    Returns
+    -------
+    bool :
+        True if hash was upgraded
+    """
+
+    return bool(get_user_model().objects.filter(
+        pk=user_id, password=encoded).update(
+        password=hashers.make_password(password)))
+
+
+def _rehash_password(user_id, password, encoded):
+    """Runs 'rehash_password' in thread of pool, closing its connection"""
+
+    try:
+        rehash_password(user_id, password, encoded)
+    finally:
+        connections.close_all()
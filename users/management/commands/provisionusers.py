@@ -0,0 +1,121 @@
+import os
+import csv
+import time
+from os.path import isfile, join, isabs
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.ingest import open_fixture, iter_json_items
+from users.bulk import UserProvisioner, open_hashing_processes
+from utils.parsers import iter_csv_items
+
+
+class Command(BaseCommand):
+    """Command registers users from CSV or JSON file"""
+
+    help = 'Registers users in bulk from CSV or JSON file'
+
+    def add_arguments(self, parser):
+        """Adds positional and optional arguments to Command
+
+        Notes
+        -----
+        Add positional argument:
+            filepath - file path of users to register. File is CSV with
+            header row, JSON array or JSON Lines, optionally gzip
+            compressed. Fields are those of user registration
+
+        Add optional arguments:
+            --format - 'csv' or 'json', guessed from file name by default
+            --chunk-size - number of users validated and inserted together
+            --processes - number of processes hashing passwords
+        """
+
+        # positional arguments
+        parser.add_argument('filepath', type=str)
+
+        # optional arguments
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help='Format of file, csv if file name ends '
+                                 'with .csv or .csv.gz, else json')
+        parser.add_argument('--chunk-size', type=int,
+                            default=settings.USER_BULK_CHUNK_SIZE,
+                            help='Number of users validated and inserted '
+                                 'together')
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1,
+                            help='Number of processes hashing passwords')
+
+    def handle(self, *args, **options):
+        """Registers users of file, chunk by chunk
+
+        Notes
+        -----
+        File is streamed, only one chunk of users is held in memory. Users
+        are validated as by registration endpoint, invalid users are
+        skipped and reported, with their index in file. Progress is
+        reported per chunk with verbosity 2.
+        """
+
+        file_path = options['filepath']
+        fixture_path = file_path if isabs(file_path) else join(
+            settings.BASE_DIR, file_path)
+        if not isfile(fixture_path):
+            raise CommandError('Invalid filepath')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if options['processes'] < 1:
+            raise CommandError('--processes must be positive')
+
+        file_format = options['format'] or (
+            'csv' if fixture_path.endswith(('.csv', '.csv.gz')) else 'json')
+        started_at = time.monotonic()
+
+        processes = open_hashing_processes(options['processes']) \
+            if options['processes'] > 1 else None
+        try:
+            provisioner = UserProvisioner(options['chunk_size'], processes)
+            with open_fixture(fixture_path) as file_obj:
+                records = iter_csv_items(file_obj) if file_format == 'csv' \
+                    else iter_json_items(file_obj)
+                provisioner.provision(
+                    records, self.write_progress
+                    if options['verbosity'] >= 2 else None)
+        except (ValueError, csv.Error) as exc:
+            raise CommandError('Invalid {0} file: {1}'.format(file_format,
+                                                              exc))
+        finally:
+            if processes is not None:
+                processes.terminate()
+
+        self.write_summary(provisioner.stats, time.monotonic() - started_at)
+        self.write_errors(provisioner.errors)
+
+    def write_progress(self, stats):
+        """Writes number of users processed"""
+
+        self.stdout.write('Processed {0} users'.format(stats['records']))
+
+    def write_summary(self, stats, elapsed):
+        """Writes throughput and counts of registered users"""
+
+        self.stdout.write(
+            'Processed {records} users in {elapsed:.2f}s ({rate:.0f} '
+            'users/s): {created} created, {invalid} invalid'.format(
+                elapsed=elapsed, rate=stats['records'] / max(elapsed, 1e-9),
+                **{key: stats[key] for key in (
+                    'records', 'created', 'invalid')}))
+
+    def write_errors(self, errors, limit=20):
+        """Writes invalid users skipped"""
+
+        if not errors:
+            return
+
+        self.stderr.write('Skipped {0} invalid users'.format(len(errors)))
+        for index, messages in sorted(errors, key=lambda error: error[0])[
+                :limit]:
+            self.stderr.write('  user {0}: {1}'.format(index, '; '.join(
+                '{0}: {1}'.format(field, ' '.join(map(str, field_messages)))
+                for field, field_messages in messages.items())))
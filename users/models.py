@@ -1,3 +1,49 @@
+import hashlib
+import binascii
+import os
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class AuthToken(models.Model):
+    """Token issued to User for authentication
+
+    Notes
+    -----
+    Only SHA-256 digest of token key is stored. Key is random, so fast
+    digest is sufficient and token can be verified without costly password
+    hashing.
+    """
+
+    digest = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             related_name='auth_tokens',
+                             on_delete=models.CASCADE)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Define human-readable representation of AuthToken model"""
+
+        return '{0} ({1})'.format(self.user, self.created)
+
+    @staticmethod
+    def get_digest(key):
+        """Returns SHA-256 hex digest of token key"""
+
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def issue(cls, user):
+        """Creates token for user
+
+        Returns
+        -------
+        (<users.models.AuthToken>, str) :
+            Token object and token key. Key is not stored and can't be
+            retrieved later.
+        """
+
+        key = binascii.hexlify(os.urandom(20)).decode('ascii')
+        token = cls.objects.create(user=user, digest=cls.get_digest(key))
+        return token, key
@@ -1,8 +1,12 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.validators import UniqueValidator
 
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 
+from .hashers import hash_password
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User Model
@@ -45,17 +49,59 @@ class UserSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        """Uses 'create_user' instead of 'create' to create User
+        """Creates User as 'create_user' does
 
         Notes
         -----
         Generic 'create' method doesn't perform some important tasks
         required to create user.
-        'create_user' sets up the password, normalize username and email
-        before saving to DB.
+        Like 'create_user', password is hashed, username and email are
+        normalized before saving to DB. Password is hashed by hashing pool
+        (users.hashers), so registrations don't saturate CPU.
         """
 
-        return User.objects.create_user(**validated_data)
+        password = validated_data.pop('password', None)
+        user = self.build_user(validated_data, hash_password(password))
+        # As by 'set_password', validators are told of password once saved
+        user._password = password
+        user.save()
+        return user
+
+    @staticmethod
+    def build_user(validated_data, encoded_password):
+        """Returns unsaved User of validated data without password
+
+        Notes
+        -----
+        Username and email are normalized as by 'create_user'. Password is
+        already encoded by hasher.
+        """
+
+        user = User(**validated_data)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.password = encoded_password
+        return user
+
+
+class UserProvisionSerializer(UserSerializer):
+    """UserSerializer validating users of bulk provisioning
+
+    Notes
+    -----
+    Uniqueness of username isn't validated per user, it's checked for
+    whole chunk of users with one query (see 'users.bulk').
+    """
+
+    def get_fields(self):
+        """Returns fields of UserSerializer, without unique validator of
+        username"""
+
+        fields = super(UserProvisionSerializer, self).get_fields()
+        fields['username'].validators = [
+            validator for validator in fields['username'].validators
+            if not isinstance(validator, UniqueValidator)]
+        return fields
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -70,3 +116,35 @@ class ChangePasswordSerializer(serializers.Serializer):
 
     old_password = serializers.CharField(max_length=128)
     new_password = serializers.CharField(max_length=128, min_length=8)
+
+
+class AuthTokenSerializer(serializers.Serializer):
+    """Serializer to verify User credentials for issuing token
+
+    Fields
+    ------
+
+        username -  Username of User
+        password -  Password of User
+    """
+
+    username = serializers.CharField(max_length=150)
+    password = serializers.CharField(max_length=128, write_only=True)
+
+    def validate(self, attrs):
+        """Authenticates User with credentials
+
+        Raises
+        ------
+        <rest_framework.exception.Validation> :
+            if credentials are invalid or user is inactive
+        """
+
+        user = authenticate(request=self.context.get('request'),
+                            username=attrs['username'],
+                            password=attrs['password'])
+        if user is None:
+            raise ValidationError('Invalid username/password.')
+
+        attrs['user'] = user
+        return attrs
@@ -1,13 +1,35 @@
+import os
 import json
 import base64
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock, skipIf
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from django.test import TestCase
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.contrib.auth.hashers import check_password, identify_hasher, \
+    make_password
 from django.contrib.auth.models import User
 
+from utils.testing import QueryBudgetTestMixin
 
-class UserTestCase(TestCase):
+from .bulk import hash_passwords
+from .hashers import HashingPool, PasswordHashingBusy, hash_password, \
+    rehash_password
+from .models import AuthToken
+
+try:
+    import argon2
+except ImportError:  # pragma: no cover
+    argon2 = None
+
+
+class UserTestCase(QueryBudgetTestMixin, TestCase):
     """Test cases for 'users' app"""
 
     def setUp(self):
@@ -49,6 +71,88 @@ class UserTestCase(TestCase):
         self.assertEqual(len(users), 1)
         self.assertEqual(users[0].id, response_data['id'])
 
+    @override_settings(USER_BULK_PROCESSES=0, USER_BULK_CHUNK_SIZE=2,
+                       USER_BULK_MAX_ROWS=5)
+    def test_user_bulk_register(self):
+        """Test bulk registration of users from CSV and JSON Lines"""
+
+        url = '/user/bulk/'
+        User.objects.create_user(username='admin_tester',
+                                 password='xyz01234', is_staff=True)
+        admin_header = 'Basic ' + base64.b64encode(
+            b'admin_tester:xyz01234').decode('ascii')
+
+        body = '\n'.join([
+            'username,password,email,is_staff',
+            'bulk_a,efgh5678,a@seynse.com,true',
+            'app_tester,efgh5678,,',
+            'bulk_c,,c@seynse.com,',
+            'bulk_b,efgh5678,,false',
+            'bulk_a,efgh5678,,',
+        ])
+        response = self.client.post(url, body, content_type='text/csv',
+                                    HTTP_AUTHORIZATION=self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Usernames are looked up once per chunk of 2 users
+        with self.assertLogs('utils.querybudget', 'WARNING') as logs:
+            response = self.client.post(url, body, content_type='text/csv',
+                                        HTTP_AUTHORIZATION=admin_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('repeated 3 times', logs.output[0])
+        self.assertEqual((response.data['created'], response.data['invalid']),
+                         (2, 3))
+        duplicate = ['A user with that username already exists.']
+        self.assertEqual(response.data['errors'], [
+            {'index': 1, 'errors': {'username': duplicate}},
+            {'index': 2, 'errors': {'password': ['This field is required.']}},
+            {'index': 4, 'errors': {'username': duplicate}},
+        ])
+
+        user = User.objects.get(username='bulk_a')
+        self.assertTrue(user.check_password('efgh5678'))
+        self.assertTrue(user.is_staff)
+        self.assertEqual(user.email, 'a@seynse.com')
+        self.assertFalse(User.objects.get(username='bulk_b').is_staff)
+
+        lines = '\n'.join(json.dumps({'username': 'line_{0}'.format(index),
+                                      'password': 'efgh5678'})
+                          for index in range(6))
+        response = self.client.post(url, lines,
+                                    content_type='application/x-ndjson',
+                                    HTTP_AUTHORIZATION=admin_header)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(
+            username__startswith='line_').exists())
+
+        response = self.client.post(url, '[{"username": "broken"',
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=admin_header)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_provision_users_command(self):
+        """Test registering users from JSON Lines file with process pool"""
+
+        records = [{'username': 'loaded_{0}'.format(index),
+                    'password': 'efgh5678'} for index in range(5)]
+        records[3] = {'username': 'loaded_1', 'password': 'efgh5678'}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.jsonl')
+            with open(path, 'w') as file_obj:
+                file_obj.write('\n'.join(map(json.dumps, records)))
+
+            stdout, stderr = StringIO(), StringIO()
+            call_command('provisionusers', path, processes=2, chunk_size=2,
+                         stdout=stdout, stderr=stderr)
+
+        self.assertIn('4 created, 1 invalid', stdout.getvalue())
+        self.assertIn('user 3: username: A user with that username already '
+                      'exists.', stderr.getvalue())
+        users = User.objects.filter(username__startswith='loaded_')
+        self.assertEqual(users.count(), 4)
+        self.assertTrue(users[0].check_password('efgh5678'))
+
     def test_user_update(self):
         """Test update operation on User"""
 
@@ -147,9 +251,150 @@ class UserTestCase(TestCase):
         self.assertEqual(response_data['old_password'][0], 'Wrong password.')
 
         data['old_password'] = 'abcd1234'
-        response = self.client.post(url, json.dumps(data),
-                                    content_type=self.content_type, **headers)
+        with mock.patch('django.contrib.auth.password_validation.'
+                        'password_changed') as password_changed:
+            response = self.client.post(url, json.dumps(data),
+                                        content_type=self.content_type,
+                                        **headers)
         self.assertTrue(status.is_success(response.status_code))
+        self.assertEqual(password_changed.call_args[0][0],
+                         data['new_password'])
 
         user_obj = User.objects.get(id=self.user.id)
         self.assertTrue(user_obj.check_password(data['new_password']))
+
+    def test_token_authentication(self):
+        """Test issuing, using and revoking authentication token"""
+
+        url = '/user/token/'
+        data = {'username': 'app_tester', 'password': 'abcd1239'}
+        response = self.client.post(url, json.dumps(data),
+                                    content_type=self.content_type)
+        self.assertTrue(status.is_client_error(response.status_code))
+        self.assertEqual(response.data['non_field_errors'][0],
+                         'Invalid username/password.')
+
+        data['password'] = 'abcd1234'
+        response = self.client.post(url, json.dumps(data),
+                                    content_type=self.content_type)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        token = response.data['token']
+        self.assertFalse(AuthToken.objects.filter(digest=token).exists())
+
+        headers = {'HTTP_AUTHORIZATION': 'Token ' + token}
+        for _ in range(2):
+            response = self.client.get('/user/details/', **headers)
+            self.assertTrue(status.is_success(response.status_code))
+            self.assertEqual(response.data['id'], self.user.id)
+
+        response = self.client.get('/user/details/',
+                                   HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Changing password revokes tokens
+        data = {'old_password': 'abcd1234', 'new_password': 'asdf9000'}
+        response = self.client.post('/user/change_password/',
+                                    json.dumps(data),
+                                    content_type=self.content_type, **headers)
+        self.assertTrue(status.is_success(response.status_code))
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+
+        response = self.client.get('/user/details/', **headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Token can be revoked with DELETE
+        data = {'username': 'app_tester', 'password': 'asdf9000'}
+        response = self.client.post(url, json.dumps(data),
+                                    content_type=self.content_type)
+        headers = {'HTTP_AUTHORIZATION': 'Token ' + response.data['token']}
+        response = self.client.delete(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get('/user/details/', **headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_rehash(self):
+        """Test outdated password hash is upgraded after login"""
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.user.set_password('abcd1234')
+            self.user.save()
+        encoded = self.user.password
+        self.assertEqual(encoded.split('$')[1], '1000')
+
+        data = {'username': 'app_tester', 'password': 'abcd1234'}
+        response = self.client.post('/user/token/', json.dumps(data),
+                                    content_type=self.content_type)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Upgrade is scheduled once request commits, which never happens in
+        # test case
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, encoded)
+        self.assertEqual(len(connection.run_on_commit), 1)
+
+        self.assertTrue(rehash_password(self.user.pk, 'abcd1234', encoded))
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.password.split('$')[1],
+                         str(settings.PASSWORD_PBKDF2_ITERATIONS))
+        self.assertTrue(user.check_password('abcd1234'))
+
+        # Hash changed since it was verified isn't overwritten
+        self.assertFalse(rehash_password(self.user.pk, 'abcd1234', encoded))
+
+        # Hashes of every default hasher of Django are still verified
+        for encoded in ('pbkdf2_sha1$36000$salt$hash', 'bcrypt$$2b$12$hash',
+                        'bcrypt_sha256$$2b$12$hash', 'argon2$argon2i$hash'):
+            self.assertEqual(identify_hasher(encoded).algorithm,
+                             encoded.split('$')[0])
+
+    def test_hashing_pool(self):
+        """Test hashing pool rejects passwords when it's full"""
+
+        pool = HashingPool(max_workers=1, max_pending=1, timeout=0.01)
+        release = threading.Event()
+        pending = pool.submit(release.wait)
+        with self.assertRaises(PasswordHashingBusy):
+            pool.submit(make_password, 'abcd1234')
+        with self.assertRaises(PasswordHashingBusy):
+            pool.submit(make_password, 'abcd1234', wait=False)
+
+        release.set()
+        pending.result()
+        self.assertTrue(check_password(
+            'abcd1234', pool.run(make_password, 'abcd1234')))
+
+    def test_hash_passwords(self):
+        """Test bulk passwords are hashed in parallel by hashing pool"""
+
+        # Each hash waits for another one to be in flight, so hashing
+        # passwords one by one breaks barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def make_password(password):
+            barrier.wait()
+            return 'hash of ' + password
+
+        passwords = ['password%d' % i for i in range(4)]
+        with mock.patch('users.bulk.make_password', make_password):
+            self.assertEqual(hash_passwords(passwords),
+                             ['hash of ' + password for password in passwords])
+
+    @skipIf(argon2 is None, 'argon2-cffi is not installed')
+    def test_argon2_hasher(self):
+        """Test Argon2 hasher with tuned work factors"""
+
+        hashers = ['users.hashers.Argon2PasswordHasher',
+                   'users.hashers.PBKDF2PasswordHasher']
+        with override_settings(PASSWORD_HASHERS=hashers,
+                               PASSWORD_ARGON2_MEMORY_COST=1024):
+            encoded = hash_password('abcd1234')
+            self.assertTrue(encoded.startswith('argon2$'))
+            self.assertIn('m=1024,', encoded)
+            self.assertTrue(check_password('abcd1234', encoded))
+
+            # Legacy hash still verifies, and is upgraded on login
+            data = {'username': 'app_tester', 'password': 'abcd1234'}
+            response = self.client.post('/user/token/', json.dumps(data),
+                                        content_type=self.content_type)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(connection.run_on_commit), 1)
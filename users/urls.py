@@ -4,6 +4,8 @@ from . import views
 
 urlpatterns = [
     url(r'^register/$', views.UserRegisterView.as_view()),
+    url(r'^bulk/$', views.UserBulkRegisterView.as_view()),
+    url(r'^token/$', views.AuthTokenView.as_view()),
     url(r'^change_password/$', views.ChangePasswordView.as_view()),
     url(r'^details/$', views.UserDetailsView.as_view())
 ]
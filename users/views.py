@@ -1,10 +1,23 @@
+from collections import OrderedDict
+from itertools import islice
+
+from django.conf import settings
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView, RetrieveDestroyAPIView
 
 from utils.mixins import PartialUpdateMixin
-from .serializers import UserSerializer, ChangePasswordSerializer
+from utils.parsers import CSVParser, NDJSONParser, StreamingJSONParser
+from utils.querybudget import query_budget
+from .authentication import revoke_tokens
+from .bulk import UserProvisioner, get_hashing_processes
+from .hashers import hash_password, verify_password
+from .models import AuthToken
+from .serializers import UserSerializer, ChangePasswordSerializer, \
+    AuthTokenSerializer
 
 
 class UserRegisterView(CreateAPIView):
@@ -13,6 +26,109 @@ class UserRegisterView(CreateAPIView):
     serializer_class = UserSerializer
 
 
+class UserBulkRegisterView(APIView):
+    """View registers batch of Users
+
+    Notes
+    -----
+    Only Admin user can register users in bulk.
+
+    Request body is list of users, as for UserRegisterView: JSON array,
+    JSON Lines (application/x-ndjson) or CSV with header row (text/csv).
+    At most USER_BULK_MAX_ROWS users are accepted per request, use
+    'provisionusers' command for larger batches.
+
+    Users are validated and created in chunks of USER_BULK_CHUNK_SIZE,
+    with passwords hashed by hashing pool, or by pool of
+    USER_BULK_PROCESSES processes if enabled (see
+    'users.bulk.UserProvisioner'). Invalid users are skipped, others are
+    created. Response has number of users created and errors of invalid
+    users, with their index in body.
+    """
+
+    permission_classes = (IsAdminUser,)
+    parser_classes = (StreamingJSONParser, NDJSONParser, CSVParser)
+
+    def post(self, request, *args, **kwargs):
+        """Register batch of users
+
+        Raises
+        ------
+        <rest_framework.exceptions.ValidationError> :
+            if body has no users or more than USER_BULK_MAX_ROWS
+        <rest_framework.exceptions.ParseError> :
+            if body is malformed
+        """
+
+        max_rows = settings.USER_BULK_MAX_ROWS
+        records = list(islice(request.data, max_rows + 1))
+        if not records:
+            raise ValidationError('No users provided.')
+        if len(records) > max_rows:
+            raise ValidationError(
+                'Ensure this batch has no more than {0} users.'.format(
+                    max_rows))
+
+        provisioner = UserProvisioner(
+            chunk_size=settings.USER_BULK_CHUNK_SIZE,
+            processes=get_hashing_processes())
+        stats = provisioner.provision(records)
+        return Response(OrderedDict([
+            ('created', stats['created']),
+            ('invalid', stats['invalid']),
+            ('errors', [OrderedDict([('index', index), ('errors', errors)])
+                        for index, errors in sorted(
+                            provisioner.errors, key=lambda error: error[0])])
+        ]))
+
+
+@query_budget(POST=2, DELETE=4)
+class AuthTokenView(CreateAPIView):
+    """View issues and revokes authentication tokens
+
+    Notes
+    -----
+    POST username and password to get token. Send token in header
+    'Authorization: Token <token>' to authenticate further requests without
+    verifying password.
+
+    DELETE revokes token used to authenticate request.
+    """
+
+    serializer_class = AuthTokenSerializer
+
+    def post(self, request, *args, **kwargs):
+        """Issue token for User
+
+        Parameters
+        ----------
+        request : <rest_framework.requests.Request>
+            Request Object with data
+                {
+                    'username': 'string',
+                    'password': 'string'
+                }
+        """
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token, key = AuthToken.issue(serializer.validated_data['user'])
+        return Response({'token': key, 'created': token.created},
+                        status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        """Revoke token used to authenticate request"""
+
+        if not isinstance(request.auth, AuthToken):
+            return Response({'detail': 'Token authentication required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        revoke_tokens(AuthToken.objects.filter(pk=request.auth.pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@query_budget(POST=4)
 class ChangePasswordView(CreateAPIView):
     """View to change User password
     
@@ -50,7 +166,9 @@ class ChangePasswordView(CreateAPIView):
         Notes
         -----
         1. Verify old password against Authenticated user
-        2. If successfully verified, set new password
+        2. If successfully verified, set new password. Passwords are
+        hashed by hashing pool (users.hashers)
+        3. Revoke all tokens of user
         """
         user = self.get_object()
 
@@ -59,16 +177,22 @@ class ChangePasswordView(CreateAPIView):
         serializer.is_valid(raise_exception=True)
 
         # Check old password
-        if not user.check_password(serializer.data['old_password']):
+        if not verify_password(user, serializer.data['old_password']):
             return Response({"old_password": ["Wrong password."]},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # set_password sets and hashes the password that the user will get
-        user.set_password(serializer.data['new_password'])
+        # Hash the password that the user will get, with hashing pool. Raw
+        # password is kept as by 'set_password', so password validators are
+        # told of change once user is saved
+        password = serializer.data['new_password']
+        user.password = hash_password(password)
+        user._password = password
         user.save()
+        revoke_tokens(user.auth_tokens.all())
         return Response("Success.", status=status.HTTP_200_OK)
 
 
+@query_budget(GET=1, PUT=2, PATCH=2)
 class UserDetailsView(RetrieveDestroyAPIView, PartialUpdateMixin):
     """View implements Update, Retrieve and Delete operation on User
     
@@ -91,7 +215,9 @@ class UserDetailsView(RetrieveDestroyAPIView, PartialUpdateMixin):
         return self.request.user
 
     def perform_destroy(self, instance):
-        """Instance is made inactive instead of deleting."""
+        """Instance is made inactive instead of deleting. Tokens of instance
+        are revoked."""
 
         instance.is_active = False
         instance.save()
+        revoke_tokens(instance.auth_tokens.all())
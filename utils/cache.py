@@ -0,0 +1,190 @@
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+
+
+class LRUCache(object):
+    """Thread-safe in-process cache with bounded size and time to live
+
+    Notes
+    -----
+    Least recently used entry is evicted when cache is full. Entries older
+    than 'ttl' seconds are treated as missing.
+
+    Number of hits, misses, evictions and expirations are counted, see
+    'get_stats'.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def get(self, key, default=None):
+        """Returns value cached for key, default if missing or expired"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats['misses'] += 1
+                self._stats['expirations'] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        """Caches value for key, evicting least recently used entries"""
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        """Removes key from cache"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes all entries from cache and resets statistics"""
+
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def get_stats(self):
+        """Returns statistics of cache
+
+        Returns
+        -------
+        dict :
+            Number of 'hits', 'misses', 'evictions' (least recently used
+            entries removed to make room) and 'expirations', current 'size',
+            'maxsize' and 'ttl'
+        """
+
+        with self._lock:
+            stats = {key: self._stats[key] for key in (
+                'hits', 'misses', 'evictions', 'expirations')}
+            stats.update(size=len(self._entries), maxsize=self.maxsize,
+                         ttl=self.ttl)
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class VersionedCache(object):
+    """Two tier cache whose entries are invalidated together by version
+
+    Parameters
+    ----------
+    get_version : callable
+        Returns current version of cached data. Entries cached for other
+        versions are never returned, so bumping version invalidates all of
+        them at once
+    maxsize, ttl : int
+        Bounds of in-process LRU tier
+    alias : str, optional
+        Alias of Django cache (CACHES setting) used as shared tier behind
+        in-process tier. Shared tier isn't used if not provided
+    prefix : str
+        Prefix of keys in shared tier
+
+    Notes
+    -----
+    Keys must be hashable and have stable 'repr', values must be picklable
+    if shared tier is used. Stale entries aren't deleted, they expire from
+    both tiers.
+    """
+
+    def __init__(self, get_version, maxsize=1024, ttl=60, alias=None,
+                 prefix='versioned'):
+        self.get_version = get_version
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.alias = alias
+        self.prefix = prefix
+        self._shared_stats = Counter()
+
+    @property
+    def shared(self):
+        """Django cache of shared tier, None if not configured"""
+
+        return caches[self.alias] if self.alias else None
+
+    def get_shared_key(self, version, key):
+        """Returns key of shared tier for versioned key"""
+
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return '{0}:{1}:{2}'.format(self.prefix, version, digest)
+
+    def get(self, key, default=None, version=None):
+        """Returns value cached for key and version, default if missing in
+        both tiers
+
+        Notes
+        -----
+        Current version is used if version isn't provided. Value found in
+        shared tier only is copied to in-process tier.
+        """
+
+        version = self.get_version() if version is None else version
+        value = self.local.get((version, key))
+        if value is not None or self.shared is None:
+            return default if value is None else value
+
+        value = self.shared.get(self.get_shared_key(version, key))
+        self._shared_stats['hits' if value is not None else 'misses'] += 1
+        if value is None:
+            return default
+        self.local.set((version, key), value)
+        return value
+
+    def set(self, key, value, version=None):
+        """Caches value for key in both tiers
+
+        Parameters
+        ----------
+        version : optional
+            Version value was computed for, current version if not provided.
+            Pass version read before computing value, so value computed
+            while version was bumped isn't cached for new version
+        """
+
+        version = self.get_version() if version is None else version
+        self.local.set((version, key), value)
+        if self.shared is not None:
+            self.shared.set(self.get_shared_key(version, key), value,
+                            timeout=self.local.ttl)
+
+    def clear(self):
+        """Removes all entries from in-process tier and resets statistics"""
+
+        self.local.clear()
+        self._shared_stats.clear()
+
+    def get_stats(self):
+        """Returns statistics of in-process tier and shared tier"""
+
+        shared = None
+        if self.shared is not None:
+            shared = {key: self._shared_stats[key]
+                      for key in ('hits', 'misses')}
+            shared['alias'] = self.alias
+        return {'local': self.local.get_stats(), 'shared': shared}
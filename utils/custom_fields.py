@@ -1,26 +1,103 @@
-from rest_framework.relations import PrimaryKeyRelatedField
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
+from rest_framework.relations import PrimaryKeyRelatedField, \
+    ManyRelatedField, MANY_RELATION_KWARGS
 
 
 class GetOrCreatePrimaryKeyRelatedField(PrimaryKeyRelatedField):
     """Custom PrimaryRelatedField
-    
+
     Notes
     -----
     If primary value provided doesn't exist in DB,
     Field creates related object with primary key
+
+    Objects are built from primary keys without fetching their rows. With
+    many=True, list of primary keys is resolved with single lookup and
+    single bulk insert.
     """
 
     def __init__(self, **kwargs):
         self.model = kwargs.pop('model')
         super(GetOrCreatePrimaryKeyRelatedField, self).__init__(**kwargs)
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """Use GetOrCreateManyRelatedField for many=True"""
+
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return GetOrCreateManyRelatedField(**list_kwargs)
+
     def to_internal_value(self, data):
         """Overrides method to create object if not found"""
 
+        return self.get_or_create_many([data])[0]
+
+    def get_or_create_many(self, data):
+        """Returns objects for list of primary keys, creating missing ones
+
+        Notes
+        -----
+        Primary keys are looked up with single query, missing objects are
+        created with single bulk insert. Lookup isn't skipped for keys seen
+        before: objects may be deleted, or their insert rolled back, by
+        other requests.
+        """
+
+        data = [self.to_primary_key(item) for item in data]
+        pks = list(OrderedDict.fromkeys(data))
+
+        found = set(self.model.objects.filter(
+            pk__in=pks).values_list('pk', flat=True))
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            self.create_missing(missing)
+
+        db = router.db_for_write(self.model)
+        attname = self.model._meta.pk.attname
+        objects = {pk: self.model.from_db(db, [attname], [pk]) for pk in pks}
+        return [objects[pk] for pk in data]
+
+    def to_primary_key(self, data):
+        """Returns primary key of item of data, fails with type of item"""
+
         if self.pk_field is not None:
             data = self.pk_field.to_internal_value(data)
         try:
-            instance, _ = self.model.objects.get_or_create(pk=data)
-            return instance
-        except (TypeError, ValueError):
+            return self.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, ValidationError):
             self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def create_missing(self, pks):
+        """Creates objects for primary keys with single bulk insert"""
+
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(
+                    [self.model(pk=pk) for pk in pks])
+        except IntegrityError:
+            # Created concurrently by other request
+            for pk in pks:
+                self.model.objects.get_or_create(pk=pk)
+
+
+class GetOrCreateManyRelatedField(ManyRelatedField):
+    """ManyRelatedField resolving whole list of primary keys at once"""
+
+    def to_internal_value(self, data):
+        """Returns objects for list of primary keys, creating missing ones"""
+
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        data = list(data)
+        if not data:
+            return []
+        return self.child_relation.get_or_create_many(data)
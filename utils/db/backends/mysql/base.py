@@ -0,0 +1,12 @@
+from django.db.backends.mysql import base
+
+from utils.db.backends.pooled import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """MySQL backend with pooled connections"""
+
+    def ping_connection(self, connection):
+        """Pings server with mysqlclient, without running query"""
+
+        connection.ping()
@@ -0,0 +1,76 @@
+from django.conf import settings
+
+from utils.db.pool import PoolTimeout, get_pool, ping
+
+
+class PooledDatabaseWrapperMixin(object):
+    """Mixin of database backend which takes connections from pool
+
+    Notes
+    -----
+    Connection is checked out of pool of process (utils.db.pool) when
+    Django connects, and returned to it when Django closes connection, at
+    end of each request with CONN_MAX_AGE 0. Threads of worker share pool,
+    so number of connections is bounded by pool size instead of number of
+    threads.
+
+    Pool is configured by 'POOL' dict of database settings: 'MAX_SIZE',
+    'IDLE_TIMEOUT', 'TIMEOUT' and 'PRE_PING', defaulting to
+    DATABASE_POOL_* settings.
+
+    Connection closed inside transaction, or found unusable after error,
+    is closed instead of returned. Other connections are rolled back
+    before they're returned.
+    """
+
+    def get_pool(self):
+        """Returns pool of database alias"""
+
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(self.alias, **{
+            option.lower(): options.get(option, getattr(
+                settings, 'DATABASE_POOL_' + option, default))
+            for option, default in (('MAX_SIZE', 10), ('IDLE_TIMEOUT', 300),
+                                    ('TIMEOUT', 10), ('PRE_PING', True))})
+
+    def ping_connection(self, connection):
+        """Raises if DB-API connection is broken"""
+
+        ping(connection)
+
+    def get_new_connection(self, conn_params):
+        """Returns connection checked out of pool
+
+        Raises
+        ------
+        <django.db.utils.OperationalError> :
+            if no connection is released within timeout of pool
+        """
+
+        parent = super(PooledDatabaseWrapperMixin, self)
+        try:
+            return self.get_pool().checkout(
+                lambda: parent.get_new_connection(conn_params),
+                self.ping_connection)
+        except PoolTimeout as exc:
+            with self.wrap_database_errors:
+                raise self.Database.OperationalError(str(exc))
+
+    def _close(self):
+        """Returns connection to pool, or closes it if it isn't reusable"""
+
+        if self.connection is None:
+            return
+        pool = self.get_pool()
+        if self.in_atomic_block or (self.errors_occurred and
+                                    not self.is_usable()):
+            pool.discard(self.connection)
+            return
+
+        try:
+            if not self.autocommit:
+                self.connection.rollback()
+        except self.Database.Error:
+            pool.discard(self.connection)
+            return
+        pool.checkin(self.connection)
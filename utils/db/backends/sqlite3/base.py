@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from utils.db.backends.pooled import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite backend with pooled connections, for development"""
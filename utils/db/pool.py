@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection of pool is released within timeout"""
+
+
+def ping(connection):
+    """Runs trivial query on DB-API connection, raises if it's broken"""
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+        cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def close_quietly(connection):
+    """Closes DB-API connection, ignoring errors of broken connection"""
+
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of DB-API connections of a process
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of open connections, idle and checked out
+    idle_timeout : float
+        Idle connections older than this many seconds are closed
+    timeout : float
+        Maximum seconds 'checkout' waits for connection to be released
+    pre_ping : bool
+        If True, idle connection is pinged before it's checked out, and
+        replaced if it's broken
+
+    Notes
+    -----
+    Most recently released connection is checked out first, so surplus
+    connections stay idle and are closed after 'idle_timeout'. Connections
+    inherited from parent process (fork of workers) are dropped, never
+    shared.
+
+    Number of checkouts, connections created, closed and replaced, and time
+    spent waiting for connection are counted, see 'get_stats'.
+    """
+
+    def __init__(self, max_size=10, idle_timeout=300, timeout=10,
+                 pre_ping=True):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self._idle = deque()
+        self._size = 0
+        self._pid = os.getpid()
+        self._condition = threading.Condition()
+        self._stats = Counter()
+        self._wait_max = 0.0
+
+    def checkout(self, connect, ping=ping):
+        """Returns idle connection, or new one opened with connect
+
+        Parameters
+        ----------
+        connect : callable
+            Returns new DB-API connection
+        ping : callable
+            Raises if connection passed is broken, used with 'pre_ping'
+
+        Raises
+        ------
+        <utils.db.pool.PoolTimeout> :
+            if pool is full and no connection is released within 'timeout'
+        """
+
+        started_at = time.monotonic()
+        while True:
+            connection = self._acquire(started_at)
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                self._count('created')
+                break
+
+            if not self.pre_ping:
+                break
+            try:
+                ping(connection)
+                break
+            except Exception:
+                self._count('ping_failures')
+                self.discard(connection)
+
+        waited = time.monotonic() - started_at
+        with self._condition:
+            self._stats['checkouts'] += 1
+            self._stats['wait_seconds'] += waited
+            self._wait_max = max(self._wait_max, waited)
+        return connection
+
+    def _acquire(self, started_at):
+        """Returns idle connection, or None after reserving slot for new
+        connection, waiting until either is available"""
+
+        deadline = started_at + self.timeout
+        with self._condition:
+            self._check_process()
+            while True:
+                self._close_expired()
+                if self._idle:
+                    connection = self._idle.pop()[0]
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        'No database connection released within {0} '
+                        'seconds, pool size is {1}'.format(
+                            self.timeout, self.max_size))
+                self._condition.wait(remaining)
+            return connection
+
+    def checkin(self, connection):
+        """Returns checked out connection to pool"""
+
+        with self._condition:
+            if self._check_process():
+                return
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Closes checked out connection and frees its place in pool"""
+
+        close_quietly(connection)
+        self._count('discarded')
+        self._release_slot()
+
+    def clear(self):
+        """Closes idle connections"""
+
+        with self._condition:
+            while self._idle:
+                close_quietly(self._idle.popleft()[0])
+                self._size -= 1
+            self._condition.notify_all()
+
+    def get_stats(self):
+        """Returns size of pool and counters
+
+        Returns
+        -------
+        <collections.OrderedDict> :
+            'max_size', 'size' (open connections), 'idle', 'in_use',
+            'checkouts', 'created', 'closed_idle', 'discarded',
+            'ping_failures', 'timeouts', 'wait_avg' and 'wait_max' (seconds
+            spent by checkouts, including connecting and pinging)
+        """
+
+        with self._condition:
+            stats = OrderedDict([
+                ('max_size', self.max_size),
+                ('size', self._size),
+                ('idle', len(self._idle)),
+                ('in_use', self._size - len(self._idle)),
+            ])
+            for key in ('checkouts', 'created', 'closed_idle', 'discarded',
+                        'ping_failures', 'timeouts'):
+                stats[key] = self._stats[key]
+            checkouts = self._stats['checkouts']
+            stats['wait_avg'] = self._stats['wait_seconds'] / checkouts \
+                if checkouts else 0.0
+            stats['wait_max'] = self._wait_max
+            return stats
+
+    def _count(self, key):
+        with self._condition:
+            self._stats[key] += 1
+
+    def _release_slot(self):
+        with self._condition:
+            if not self._check_process():
+                self._size -= 1
+            self._condition.notify()
+
+    def _close_expired(self):
+        """Closes connections idle longer than 'idle_timeout', oldest are
+        at left"""
+
+        expires_before = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] <= expires_before:
+            close_quietly(self._idle.popleft()[0])
+            self._size -= 1
+            self._stats['closed_idle'] += 1
+
+    def _check_process(self):
+        """Drops connections of parent process after fork, returns True if
+        they were dropped"""
+
+        if self._pid == os.getpid():
+            return False
+        self._pid = os.getpid()
+        self._idle.clear()
+        self._size = 0
+        return True
+
+
+# Pools of process, per database alias
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, **options):
+    """Returns pool of database alias, created with options on first use"""
+
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(**options)
+        return pool
+
+
+def get_pool_stats():
+    """Returns statistics of pools of process, per database alias"""
+
+    with _pools_lock:
+        pools = sorted(_pools.items())
+    return OrderedDict((alias, pool.get_stats()) for alias, pool in pools)
@@ -1,6 +1,10 @@
+from functools import reduce
+
+from django.db.models import F
 from django_filters import rest_framework as filters
 
 from movies.models import Movie
+from utils.search import text_search
 
 
 class MovieFilter(filters.FilterSet):
@@ -8,13 +12,15 @@ class MovieFilter(filters.FilterSet):
 
     Filters
     -------
-    name : Allows filtering movies based on if string in movie name
+    name : Allows filtering movies based on if every word in string is
+    prefix of a word in movie name
 
-    director : Allows filtering movies based on if string in movie's
-    director name
+    director : Allows filtering movies based on if every word in string is
+    prefix of a word in movie's director name
 
     genre : filter movies based on if string matches (case insensitive)
-    any of movie genres
+    any of movie genres. Matched with sub-query on genre relation instead of
+    join, so movies are not duplicated in result
 
     min_99popularity : filter movies where movie popularity is greater than or
      equal to value
@@ -27,13 +33,16 @@ class MovieFilter(filters.FilterSet):
 
     max_imdb_score : filter movies where movie imdb score is lower than or
      equal to value
+
+    Notes
+    -----
+    name and director are matched with full-text search. Searched movies are
+    annotated with 'relevance' of match.
     """
 
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
-    director = filters.CharFilter(field_name='director',
-                                  lookup_expr='icontains')
-    genre = filters.CharFilter(field_name='genres__genre_name',
-                               lookup_expr='iexact')
+    name = filters.CharFilter(field_name='name', method='filter_text')
+    director = filters.CharFilter(field_name='director', method='filter_text')
+    genre = filters.CharFilter(method='filter_genre')
     min_99popularity = filters.NumberFilter(field_name='popularity',
                                             lookup_expr='gte')
     max_99popularity = filters.NumberFilter(field_name='popularity',
@@ -47,3 +56,34 @@ class MovieFilter(filters.FilterSet):
         model = Movie
         fields = ['name', 'director', 'genre', 'max_99popularity',
                   'min_99popularity', 'max_imdb_score', 'min_imdb_score']
+
+    def filter_queryset(self, queryset):
+        """Filter queryset and annotate total relevance of text search"""
+
+        queryset = super(MovieFilter, self).filter_queryset(queryset)
+        ranks = [F(annotation) for annotation in queryset.query.annotations
+                 if annotation.endswith('_relevance')]
+        if ranks:
+            queryset = queryset.annotate(
+                relevance=reduce(lambda total, rank: total + rank, ranks))
+        return queryset
+
+    def filter_text(self, queryset, name, value):
+        """Filter movies with full-text search on field"""
+
+        return text_search(queryset, name, value)
+
+    def filter_genre(self, queryset, name, value):
+        """Filter movies having genre matching (case insensitive) value
+
+        Notes
+        -----
+        Filtering on 'genres__genre_name' joins movie with genre relation and
+        yields one row per matching genre. Genre names are case sensitive
+        primary keys, so a movie may match more than once. Movie ids are
+        selected from through table in sub-query to keep each movie once.
+        """
+
+        movie_ids = Movie.genres.through.objects.filter(
+            genre__genre_name__iexact=value).values('movie_id')
+        return queryset.filter(id__in=movie_ids)
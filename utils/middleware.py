@@ -0,0 +1,174 @@
+import json
+import time
+import random
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+
+from utils.perf import TIMINGS, PerformanceAggregator, RequestMetrics, \
+    get_current_metrics, set_current_metrics, timed_queries
+from utils.querybudget import QueryBudgetExceeded, QueryRecorder, \
+    get_query_budget
+
+logger = logging.getLogger('utils.perf')
+budget_logger = logging.getLogger('utils.querybudget')
+
+# Metrics of instrumented requests of process, served at /perf/
+performance_stats = PerformanceAggregator(
+    window=getattr(settings, 'PERF_WINDOW_SIZE', 1000))
+
+
+def get_view_class(request):
+    """Returns view class (or function) request was routed to, None if URL
+    wasn't resolved"""
+
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return getattr(match.func, 'view_class', match.func)
+
+
+def get_view_name(request):
+    """Returns name of view class (or function) request was routed to,
+    None if URL wasn't resolved"""
+
+    view = get_view_class(request)
+    return None if view is None else view.__name__
+
+
+class PerformanceMiddleware(object):
+    """Instruments sample of requests with timings and query counts
+
+    Notes
+    -----
+    Fraction PERF_SAMPLE_RATE of requests is instrumented, others pass
+    through untouched. For instrumented request are measured: wall time,
+    authentication ('auth'), database queries and their time ('db'),
+    serializers producing data ('serialize'), rendering of response, e.g.
+    JSON encoding ('render'), and size of response.
+
+    Metrics are sent in 'Server-Timing' header, logged as JSON line to
+    'utils.perf' logger and recorded per view in 'performance_stats',
+    served to staff at /perf/.
+
+    Content of streaming responses is produced after middleware returns,
+    so it isn't measured. Middleware should be first of MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0.1)
+        if not sample_rate or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        set_current_metrics(metrics)
+        try:
+            with timed_queries(connections.all(), metrics):
+                response = self.get_response(request)
+        finally:
+            set_current_metrics(None)
+        total = time.perf_counter() - metrics.started_at
+
+        response['Server-Timing'] = self.get_server_timing(metrics, total)
+        sample = self.get_sample(metrics, total, response)
+        view = get_view_name(request) or 'unresolved'
+        performance_stats.record(view, sample)
+        logger.info(json.dumps(OrderedDict(
+            [('view', view), ('method', request.method),
+             ('path', request.path), ('status', response.status_code)] +
+            list(sample.items()))))
+        return response
+
+    def process_template_response(self, request, response):
+        """Measures rendering of response, which follows this hook"""
+
+        metrics = get_current_metrics()
+        if metrics is not None:
+            started_at = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: metrics.add(
+                    'render', time.perf_counter() - started_at))
+        return response
+
+    @staticmethod
+    def get_server_timing(metrics, total):
+        """Returns Server-Timing header value of metrics, in milliseconds"""
+
+        entries = ['total;dur={0:.1f}'.format(total * 1000)]
+        for name in TIMINGS:
+            if name == 'db':
+                entries.append('db;dur={0:.1f};desc="{1} queries"'.format(
+                    metrics.timings[name] * 1000, metrics.queries))
+            elif name in metrics.timings:
+                entries.append('{0};dur={1:.1f}'.format(
+                    name, metrics.timings[name] * 1000))
+        return ', '.join(entries)
+
+    @staticmethod
+    def get_sample(metrics, total, response):
+        """Returns metrics of request as dict of name and value"""
+
+        sample = OrderedDict([('total_ms', round(total * 1000, 3))])
+        for name in TIMINGS:
+            sample[name + '_ms'] = round(metrics.timings[name] * 1000, 3)
+        sample['db_queries'] = metrics.queries
+        sample['response_bytes'] = None if response.streaming else \
+            len(response.content)
+        return sample
+
+
+class QueryBudgetMiddleware(object):
+    """Checks queries of requests against budget of their views
+
+    Notes
+    -----
+    Active with QUERY_BUDGET_CHECKS setting (DEBUG by default), as queries
+    are inspected one by one. Budget is declared on view with
+    'utils.querybudget.query_budget'.
+
+    Number of queries and budget are sent in 'X-Query-Count' and
+    'X-Query-Budget' headers. Similar queries (equal but for parameters)
+    run at least QUERY_BUDGET_REPEAT_THRESHOLD times, likely N+1 pattern,
+    are logged as warning to 'utils.querybudget' logger with serializer
+    field which ran them, so is exceeded budget. With QUERY_BUDGET_STRICT,
+    exceeded budget raises QueryBudgetExceeded instead, as in tests.
+
+    Content of streaming responses is produced after middleware returns,
+    so its queries aren't counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_CHECKS', settings.DEBUG):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with timed_queries(connections.all(), recorder):
+            response = self.get_response(request)
+
+        view = get_view_class(request)
+        budget = None if view is None else \
+            get_query_budget(view, request.method)
+        threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 3)
+        response['X-Query-Count'] = str(recorder.count)
+        if budget is not None:
+            response['X-Query-Budget'] = str(budget)
+
+        exceeded = budget is not None and recorder.count > budget
+        if not exceeded and not recorder.get_repeated(threshold):
+            return response
+
+        message = '{0} {1} ({2}): {3}'.format(
+            request.method, request.path, get_view_name(request),
+            recorder.describe(budget, threshold))
+        if exceeded and getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        budget_logger.warning(message)
+        return response
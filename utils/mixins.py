@@ -1,4 +1,26 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
 from rest_framework.mixins import UpdateModelMixin
+from rest_framework.response import Response
+
+
+def get_request_key(view, request):
+    """Returns key identifying GET request to view
+
+    Notes
+    -----
+    Key is made of view, absolute URL path and sorted query parameters, so
+    equivalent requests have same key.
+    """
+
+    query_params = tuple((key, tuple(values)) for key, values in sorted(
+        request.query_params.lists()))
+    url = request.build_absolute_uri(request.path)
+    return type(view).__name__, url, query_params
 
 
 class PartialUpdateMixin(UpdateModelMixin):
@@ -13,3 +35,123 @@ class PartialUpdateMixin(UpdateModelMixin):
         Rest will remain unchanged.
         """
         return self.partial_update(request, *args, **kwargs)
+
+
+class CachedResponseMixin(object):
+    """Mixin to cache data of successful GET responses
+
+    Notes
+    -----
+    Data is cached in 'response_cache' (utils.cache.VersionedCache) keyed
+    on request (see 'get_request_key'), so equivalent requests share entry.
+    Authentication and permissions are checked before cache is looked up.
+    Responses aren't cached if 'response_cache' is None. Version of cache
+    is read once per request (see 'get_cache_version'), views building
+    response from versioned data reuse it.
+
+    'X-Cache' header of response tells if data was served from cache.
+    """
+
+    response_cache = None
+
+    def get_cache_key(self, request):
+        """Returns cache key of request"""
+
+        return get_request_key(self, request)
+
+    def get_cache_version(self):
+        """Returns version of 'response_cache' read for request, None if
+        responses aren't cached"""
+
+        if self.response_cache is None:
+            return None
+        if not hasattr(self, '_cache_version'):
+            self._cache_version = self.response_cache.get_version()
+        return self._cache_version
+
+    def get(self, request, *args, **kwargs):
+        """Returns cached response data, or caches data of response"""
+
+        if self.response_cache is None:
+            return super(CachedResponseMixin, self).get(
+                request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        version = self.get_cache_version()
+        data = self.response_cache.get(key, version=version)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super(CachedResponseMixin, self).get(
+            request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache.set(key, response.data, version=version)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class ConditionalResponseMixin(object):
+    """Mixin to answer conditional GET requests
+
+    Notes
+    -----
+    Views define 'get_revision', which returns modification time and
+    revision of requested resource with a query cheaper than building the
+    response. Strong ETag is digest of request, renderer format and
+    revision; Last-Modified is modification time.
+
+    Both headers are set on successful responses, Last-Modified only if
+    view returns modification time. Request with matching 'If-None-Match'
+    (or 'If-Modified-Since' if not provided) is answered with 304 before
+    response is built.
+    """
+
+    def get_revision(self, request):
+        """Returns (modification time, revision) of requested resource
+
+        Returns
+        -------
+        (datetime or None, object) or None :
+            Modification time and any value with stable 'repr' that
+            changes whenever response would change. Modification time is
+            None if it doesn't change whenever response would (e.g. when
+            item leaves a list), response is conditional on ETag only then.
+            None if resource is not found, response is built then
+        """
+
+        raise NotImplementedError('get_revision() must be implemented')
+
+    def get_etag(self, request, revision):
+        """Returns strong ETag of response for revision"""
+
+        data = (get_request_key(self, request),
+                request.accepted_renderer.format, revision)
+        return quote_etag(hashlib.sha1(repr(data).encode('utf-8')).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        """Returns 304 response if resource isn't modified, else sets
+        validators on response"""
+
+        state = self.get_revision(request)
+        if state is None:
+            return super(ConditionalResponseMixin, self).get(
+                request, *args, **kwargs)
+
+        modified_at, revision = state
+        etag = self.get_etag(request, revision)
+        last_modified = modified_at and timegm(modified_at.utctimetuple())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super(ConditionalResponseMixin, self).get(
+                request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,387 @@
+import json
+import hashlib
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict, namedtuple
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple('Cursor', ['ordering', 'value', 'pk', 'reverse',
+                               'signature'])
+
+
+def get_field_value(obj, field):
+    """Returns value of field of model instance or of values() row
+
+    Notes
+    -----
+    Primary key of row is read from 'id' key.
+    """
+
+    if isinstance(obj, dict):
+        return obj['id' if field == 'pk' else field]
+    return getattr(obj, field)
+
+
+class KeysetPagination(BasePagination):
+    """Cursor based pagination over keyset (ordering field, primary key)
+
+    Notes
+    -----
+    Each page is fetched with a range condition on ordering field and
+    primary key instead of OFFSET, so deep pages are as cheap as the first
+    page when ordering field is indexed. Primary key breaks ties between
+    rows with equal ordering value.
+
+    NULL values are treated as smallest values, same as MySQL and SQLite
+    sort them.
+
+    Cursor is opaque to client. It encodes ordering, position of boundary
+    row, direction and signature of query parameters (filters) of the
+    request it was issued for. Cursor used with different filters or
+    ordering is rejected.
+
+    With 'limit' query parameter (top-K), only first 'limit' objects in
+    ordering are fetched and no cursor links are returned. With index on
+    (ordering field, primary key), database reads only those rows.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    limit_query_param = 'limit'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 20
+    max_page_size = 100
+
+    # Maps ordering names accepted in query parameters to model fields
+    ordering_fields = {'id': 'pk'}
+    default_ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Returns list of objects for requested page of queryset"""
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_fields = self.get_ordering_fields(queryset)
+        self.ordering = self.get_ordering(request, queryset)
+        self.signature = self.get_signature(request)
+        self.base_url = request.build_absolute_uri()
+
+        field, descending = self.get_ordering_field(self.ordering)
+        self.field = field
+
+        limit = self.get_limit(request)
+        if limit is not None:
+            if self.cursor_query_param in request.query_params:
+                raise ValidationError({self.limit_query_param: [
+                    'Limit can not be combined with cursor.']})
+            self.page = self.get_page_objects(queryset, field, descending,
+                                              None, limit)
+            self.has_next = self.has_previous = False
+            return self.page
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor.reverse)
+
+        # Previous page is fetched by walking backwards from cursor
+        results = self.get_page_objects(queryset, field, descending ^ reverse,
+                                        cursor, self.page_size + 1)
+        has_following = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_objects(self, queryset, field, descending, cursor, limit):
+        """Returns up to limit objects following cursor in ordering
+
+        Notes
+        -----
+        Besides QuerySet, queryset may be any result exposing
+        'keyset_page(field, descending, position, limit)' with same
+        semantics, e.g. result of in-memory search (movies.columnar).
+        """
+
+        position = None if cursor is None else (cursor.value, cursor.pk)
+        if hasattr(queryset, 'keyset_page'):
+            return queryset.keyset_page(field, descending, position, limit)
+
+        queryset = self.order_queryset(queryset, field, descending)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_condition(
+                field, cursor.value, cursor.pk, descending))
+        return list(queryset[:limit])
+
+    def get_chunks(self, queryset, request, chunk_size):
+        """Returns iterator over all objects of queryset in chunks
+
+        Returns
+        -------
+        generator :
+            Yields lists of up to chunk_size objects, in requested ordering
+
+        Raises
+        ------
+        <rest_framework.exceptions.ValidationError> :
+            if requested ordering is invalid, before any chunk is fetched
+
+        Notes
+        -----
+        Each chunk is fetched with keyset condition following last object
+        of previous chunk, so only one chunk is held in memory and every
+        chunk costs same queries. Cursor and page size of request are
+        ignored.
+        """
+
+        self.ordering_fields = self.get_ordering_fields(queryset)
+        self.ordering = self.get_ordering(request, queryset)
+        field, descending = self.get_ordering_field(self.ordering)
+        return self.iterate_chunks(queryset, field, descending, chunk_size)
+
+    def iterate_chunks(self, queryset, field, descending, chunk_size):
+        """Yields successive chunks of objects of queryset in ordering"""
+
+        cursor = None
+        while True:
+            chunk = self.get_page_objects(queryset, field, descending,
+                                          cursor, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            last = chunk[-1]
+            cursor = Cursor(
+                ordering=self.ordering, pk=get_field_value(last, 'pk'),
+                value=None if field == 'pk' else get_field_value(last, field),
+                reverse=False, signature=None)
+
+    def get_paginated_response(self, data):
+        """Returns response with cursor links and page results"""
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_page_size(self, request):
+        """Returns page size requested, bounded by 'max_page_size'"""
+
+        page_size = self.get_positive_int(request, self.page_size_query_param)
+        if page_size is None:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_limit(self, request):
+        """Returns number of top objects requested, bounded by
+        'max_page_size'. None if not requested"""
+
+        limit = self.get_positive_int(request, self.limit_query_param)
+        return None if limit is None else min(limit, self.max_page_size)
+
+    @staticmethod
+    def get_positive_int(request, query_param):
+        """Returns positive integer of query parameter, None if not provided
+
+        Raises
+        ------
+        <rest_framework.exception.ValidationError> :
+            if value isn't a positive integer
+        """
+
+        value = request.query_params.get(query_param)
+        if value is None:
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError(
+                {query_param: ['A valid integer is required.']})
+        if value < 1:
+            raise ValidationError({query_param: [
+                'Ensure this value is greater than or equal to 1.']})
+        return value
+
+    def get_ordering_fields(self, queryset):
+        """Returns mapping of ordering names to fields available for
+        queryset"""
+
+        return self.ordering_fields
+
+    def get_default_ordering(self, queryset):
+        """Returns ordering used when it isn't requested"""
+
+        return self.default_ordering
+
+    def get_ordering(self, request, queryset):
+        """Returns ordering requested in query parameters
+
+        Raises
+        ------
+        <rest_framework.exception.ValidationError> :
+            if ordering is not one of 'ordering_fields'
+        """
+
+        ordering = request.query_params.get(
+            self.ordering_query_param, self.get_default_ordering(queryset))
+        if ordering.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({self.ordering_query_param: [
+                'Ordering must be one of: {0}'.format(
+                    ', '.join(sorted(self.ordering_fields)))]})
+        return ordering
+
+    def get_ordering_field(self, ordering):
+        """Returns model field and direction (True if descending)"""
+
+        return (self.ordering_fields[ordering.lstrip('-')],
+                ordering.startswith('-'))
+
+    def get_signature(self, request):
+        """Returns digest of query parameters except cursor and page size"""
+
+        params = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params
+            if key not in (self.cursor_query_param,
+                           self.page_size_query_param))
+        return hashlib.sha1(
+            json.dumps(params).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def order_queryset(queryset, field, descending):
+        """Orders queryset by field, then by primary key to break ties"""
+
+        prefix = '-' if descending else ''
+        if field == 'pk':
+            return queryset.order_by(prefix + 'pk')
+        return queryset.order_by(prefix + field, prefix + 'pk')
+
+    @staticmethod
+    def get_keyset_condition(field, value, pk, descending):
+        """Returns condition selecting rows following (value, pk) position"""
+
+        if field == 'pk':
+            return Q(pk__lt=pk) if descending else Q(pk__gt=pk)
+
+        isnull = {field + '__isnull': True}
+        if descending:
+            if value is None:
+                return Q(pk__lt=pk, **isnull)
+            return (Q(**{field + '__lt': value}) |
+                    Q(pk__lt=pk, **{field: value}) | Q(**isnull))
+
+        if value is None:
+            return Q(pk__gt=pk, **isnull) | ~Q(**isnull)
+        return (Q(**{field + '__gt': value}) |
+                Q(pk__gt=pk, **{field: value}))
+
+    def get_next_link(self):
+        """Returns url of next page, None if it's last page"""
+
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Returns url of previous page, None if it's first page"""
+
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        """Returns url with cursor positioned at instance"""
+
+        value = None if self.field == 'pk' else \
+            get_field_value(instance, self.field)
+        tokens = {
+            'o': self.ordering,
+            'v': value,
+            'p': get_field_value(instance, 'pk'),
+            'r': int(reverse),
+            's': self.signature
+        }
+        encoded = urlsafe_b64encode(
+            json.dumps(tokens, sort_keys=True).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded)
+
+    def decode_cursor(self, request):
+        """Returns cursor of request, None if cursor isn't provided
+
+        Raises
+        ------
+        <rest_framework.exception.NotFound> :
+            if cursor is malformed or was issued for different ordering or
+            filters
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            cursor = Cursor(ordering=tokens['o'], value=tokens['v'],
+                            pk=int(tokens['p']), reverse=bool(tokens['r']),
+                            signature=tokens['s'])
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if (cursor.ordering != self.ordering or
+                cursor.signature != self.signature):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+
+class MoviePagination(KeysetPagination):
+    """Keyset pagination for Movie search
+
+    Movies can be ordered by: id, imdb_score, 99popularity
+    (prefix with '-' for descending order)
+
+    Movies searched by name or director can also be ordered by 'relevance',
+    which is their default ordering (most relevant first).
+    """
+
+    ordering_fields = {
+        'id': 'pk',
+        'imdb_score': 'imdb_score',
+        '99popularity': 'popularity'
+    }
+    default_ordering = '-id'
+
+    @staticmethod
+    def is_ranked(queryset):
+        """Returns True if movies are annotated with relevance of full-text
+        search"""
+
+        annotations = getattr(queryset, 'query', queryset).annotations
+        return 'relevance' in annotations
+
+    def get_ordering_fields(self, queryset):
+        """Adds 'relevance' to ordering fields of full-text searched movies"""
+
+        if self.is_ranked(queryset):
+            return dict(self.ordering_fields, relevance='relevance')
+        return self.ordering_fields
+
+    def get_default_ordering(self, queryset):
+        """Orders full-text searched movies by relevance by default"""
+
+        if self.is_ranked(queryset):
+            return '-relevance'
+        return self.default_ordering
@@ -0,0 +1,78 @@
+import csv
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from movies.ingest import iter_json_items
+
+
+def iter_csv_items(file_obj):
+    """Yields rows of CSV text stream with header row as dicts
+
+    Notes
+    -----
+    Empty cells are left out of items, as fields not provided. Cells
+    beyond header are ignored.
+    """
+
+    for row in csv.DictReader(file_obj):
+        yield {key: value for key, value in row.items()
+               if key is not None and value not in (None, '')}
+
+
+def iter_parsed(items):
+    """Yields items, raising ParseError if document turns out malformed"""
+
+    try:
+        for item in items:
+            yield item
+    except (ValueError, csv.Error) as exc:
+        raise ParseError('Parse error - {0}'.format(exc))
+
+
+class StreamingJSONParser(BaseParser):
+    """Parses JSON array or JSON Lines body into iterator of items
+
+    Notes
+    -----
+    Items are decoded as body is read (see 'movies.ingest.iter_json_items')
+    and iterated, so large bodies aren't held in memory. Malformed document
+    raises ParseError while items are iterated.
+    """
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Returns iterator of items of body"""
+
+        return iter_parsed(iter_json_items(
+            self.get_reader(stream, parser_context)))
+
+    @staticmethod
+    def get_reader(stream, parser_context):
+        """Returns text stream decoding body"""
+
+        encoding = (parser_context or {}).get('encoding',
+                                              settings.DEFAULT_CHARSET)
+        return codecs.getreader(encoding)(stream)
+
+
+class NDJSONParser(StreamingJSONParser):
+    """Parses newline delimited JSON body into iterator of items"""
+
+    media_type = 'application/x-ndjson'
+
+
+class CSVParser(StreamingJSONParser):
+    """Parses CSV body with header row into iterator of dicts, see
+    'iter_csv_items'"""
+
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Returns iterator of rows of body"""
+
+        return iter_parsed(iter_csv_items(
+            self.get_reader(stream, parser_context)))
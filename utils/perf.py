@@ -0,0 +1,215 @@
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+from django.db.backends.utils import CursorWrapper
+from rest_framework.serializers import ListSerializer
+
+# Metrics of request being instrumented by current thread
+_local = threading.local()
+
+# Timings reported by instrumented requests, in Server-Timing order
+TIMINGS = ('auth', 'db', 'serialize', 'render')
+
+
+class RequestMetrics(object):
+    """Timings and database queries of instrumented request
+
+    Notes
+    -----
+    Timings are sums of seconds spent in each part, and may overlap: e.g.
+    queries run while serializing count in both 'db' and 'serialize'.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.timings = Counter()
+        self.queries = 0
+
+    def add(self, name, seconds):
+        """Adds seconds spent in part of request"""
+
+        self.timings[name] += seconds
+
+    def add_query(self, seconds, sql=None):
+        """Adds query run on database"""
+
+        self.queries += 1
+        self.timings['db'] += seconds
+
+
+def get_current_metrics():
+    """Returns metrics of request instrumented by current thread, None if
+    request isn't instrumented"""
+
+    return getattr(_local, 'metrics', None)
+
+
+def set_current_metrics(metrics):
+    """Sets metrics of request instrumented by current thread"""
+
+    _local.metrics = metrics
+
+
+@contextmanager
+def timer(name):
+    """Adds time spent in block (or decorated function) to metrics of
+    current request, no-op if request isn't instrumented"""
+
+    metrics = get_current_metrics()
+    if metrics is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started_at)
+
+
+class TimedCursorWrapper(CursorWrapper):
+    """Cursor wrapper adding each query to metrics of request
+
+    Notes
+    -----
+    Metrics may be any object with 'add_query(seconds, sql)' method.
+    """
+
+    def __init__(self, cursor, db, metrics):
+        super(TimedCursorWrapper, self).__init__(cursor, db)
+        self.metrics = metrics
+
+    def callproc(self, procname, params=None):
+        return self._timed(super(TimedCursorWrapper, self).callproc,
+                           procname, params)
+
+    def execute(self, sql, params=None):
+        return self._timed(super(TimedCursorWrapper, self).execute,
+                           sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._timed(super(TimedCursorWrapper, self).executemany,
+                           sql, param_list)
+
+    def _timed(self, method, sql, *args):
+        started_at = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            self.metrics.add_query(time.perf_counter() - started_at, sql)
+
+
+@contextmanager
+def timed_queries(connections, metrics):
+    """Adds queries run on connections within block to metrics
+
+    Notes
+    -----
+    Cursors of connections (of current thread) are wrapped for duration of
+    block only, Django 1.11 has no execute wrapper hook. Blocks may be
+    nested. Query logging of DEBUG keeps working.
+    """
+
+    wrapped = list()
+    for connection in connections:
+        for name in ('make_cursor', 'make_debug_cursor'):
+            make = getattr(connection, name)
+            wrapped.append((connection, name, connection.__dict__.get(name)))
+            setattr(connection, name, lambda cursor, make=make,
+                    connection=connection: TimedCursorWrapper(
+                        make(cursor), connection, metrics))
+    try:
+        yield
+    finally:
+        for connection, name, previous in reversed(wrapped):
+            if previous is None:
+                delattr(connection, name)
+            else:
+                setattr(connection, name, previous)
+
+
+class TimedSerializerMixin(object):
+    """Mixin of serializer adding time spent producing 'data' to 'serialize'
+    timing of request"""
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super(TimedSerializerMixin, self).data
+
+
+class TimedListSerializer(TimedSerializerMixin, ListSerializer):
+    """List serializer timing 'data', set as 'list_serializer_class' of Meta
+    of serializer"""
+
+
+def percentile(values, percent):
+    """Returns percentile of sorted values, nearest rank"""
+
+    if not values:
+        return None
+    rank = max(int(-(-len(values) * percent // 100)), 1)
+    return values[rank - 1]
+
+
+class PerformanceAggregator(object):
+    """Thread-safe rolling window of request metrics per view
+
+    Notes
+    -----
+    Last 'window' instrumented requests of each view are kept, percentiles
+    are computed over them when statistics are read.
+    """
+
+    percentiles = (50, 95, 99)
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = dict()
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, view, sample):
+        """Records metrics (dict of name and value) of request to view"""
+
+        with self._lock:
+            samples = self._samples.get(view)
+            if samples is None:
+                samples = self._samples[view] = deque(maxlen=self.window)
+            samples.append(sample)
+            self._counts[view] += 1
+
+    def clear(self):
+        """Drops all samples"""
+
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def get_stats(self):
+        """Returns percentiles of each metric per view
+
+        Returns
+        -------
+        <collections.OrderedDict> :
+            Maps view name to 'count' of requests recorded, number of
+            requests in 'window' and 'p50', 'p95', 'p99' of each metric
+        """
+
+        with self._lock:
+            views = sorted((view, list(samples), self._counts[view])
+                           for view, samples in self._samples.items())
+
+        stats = OrderedDict()
+        for view, samples, count in views:
+            view_stats = stats[view] = OrderedDict([
+                ('count', count), ('window', len(samples))])
+            for name in samples[0]:
+                values = sorted(sample[name] for sample in samples
+                                if sample.get(name) is not None)
+                view_stats[name] = OrderedDict(
+                    ('p{0}'.format(percent), percentile(values, percent))
+                    for percent in self.percentiles)
+        return stats
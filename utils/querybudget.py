@@ -0,0 +1,155 @@
+import re
+import sys
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from rest_framework.fields import Field
+from rest_framework.serializers import BaseSerializer
+
+# Depth of 'unbudgeted' blocks entered by current thread
+_local = threading.local()
+
+# Placeholder lists of 'IN' lookups, their length varies with values
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+# Literals inlined in SQL, e.g. 'LIMIT 21'
+NUMBER = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when request runs more queries than budget of its view"""
+
+
+def query_budget(default=None, **methods):
+    """Class decorator declaring maximum number of queries of view
+
+    Parameters
+    ----------
+    default : int
+        Budget of each request method not given in 'methods'
+    methods :
+        Budget of request method, e.g. GET=5
+
+    Notes
+    -----
+    Budget is set as 'query_budget' attribute of view, which may be set
+    directly instead: int, or dict of request method and int. Budget
+    counts all queries of request, including authentication.
+    """
+
+    budget = dict(methods, default=default) if methods else default
+
+    def decorator(view_class):
+        view_class.query_budget = budget
+        return view_class
+    return decorator
+
+
+def get_query_budget(view_class, method):
+    """Returns budget of view for request method, None if not declared"""
+
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method.upper(), budget.get('default'))
+    return budget
+
+
+@contextmanager
+def unbudgeted():
+    """Excludes queries of block from budget of request
+
+    Notes
+    -----
+    For work amortized over many requests, e.g. rebuilding of in-memory
+    snapshot, which one unlucky request pays for.
+    """
+
+    _local.depth = getattr(_local, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+
+
+def normalize_sql(sql):
+    """Returns SQL with numbers and lengths of 'IN' lists removed, so
+    queries differing only in them are equal"""
+
+    return NUMBER.sub('N', IN_LIST.sub('IN (...)', ' '.join(sql.split())))
+
+
+def get_serializer_origin(frame):
+    """Returns 'Serializer.field' being serialized in frame or its
+    callers, None if query isn't run by serializer field"""
+
+    while frame is not None:
+        field = frame.f_locals.get('self')
+        if isinstance(field, Field) and not isinstance(field,
+                                                       BaseSerializer):
+            # Child of many related field is bound to it, not serializer
+            while field.parent is not None and \
+                    not isinstance(field.parent, BaseSerializer):
+                field = field.parent
+            return '{0}.{1}'.format(type(field.parent).__name__,
+                                    field.field_name)
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder(object):
+    """Queries run within block of 'timed_queries', with serializer field
+    which ran each
+
+    Notes
+    -----
+    Caller frames are inspected for every query, so recorder is meant for
+    development and tests, not production.
+    """
+
+    def __init__(self):
+        self.queries = list()
+
+    def add_query(self, seconds, sql=None):
+        """Adds query run on database"""
+
+        if getattr(_local, 'depth', 0):
+            return
+        self.queries.append((normalize_sql(sql or ''),
+                             get_serializer_origin(sys._getframe(1))))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def get_repeated(self, threshold=3):
+        """Returns queries run at least threshold times, likely N+1
+
+        Returns
+        -------
+        list of <collections.OrderedDict> :
+            'sql' (normalized), 'count' and 'origins' (serializer fields
+            which ran it), most repeated first
+        """
+
+        counts = Counter(sql for sql, origin in self.queries)
+        repeated = list()
+        for sql, count in counts.most_common():
+            if count < threshold:
+                break
+            origins = sorted(set(origin for query, origin in self.queries
+                                 if query == sql and origin is not None))
+            repeated.append(OrderedDict([('sql', sql), ('count', count),
+                                         ('origins', origins)]))
+        return repeated
+
+    def describe(self, budget=None, threshold=3):
+        """Returns report of queries against budget, for logs and test
+        failures"""
+
+        lines = ['{0} queries'.format(self.count) if budget is None else
+                 '{0} queries, budget is {1}'.format(self.count, budget)]
+        for query in self.get_repeated(threshold):
+            lines.append('  repeated {0} times{1}: {2}'.format(
+                query['count'], ' by ' + ', '.join(query['origins'])
+                if query['origins'] else '', query['sql'][:300]))
+        return '\n'.join(lines)
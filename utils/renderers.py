@@ -0,0 +1,100 @@
+import csv
+import json
+from io import StringIO
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders list as newline delimited JSON, one item per line
+
+    Notes
+    -----
+    Data other than list (e.g. errors) is rendered as single line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Returns NDJSON document of data"""
+
+        items = data if isinstance(data, list) else [data]
+        return ''.join(self.stream(items)).encode(self.charset)
+
+    def stream(self, items):
+        """Yields NDJSON lines of items"""
+
+        for item in items:
+            yield json.dumps(item, cls=JSONEncoder,
+                             ensure_ascii=False) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """Renders list of dicts as CSV with header row
+
+    Notes
+    -----
+    Columns are 'header' of renderer, or keys of first item. List values
+    are joined with 'list_separator'. Dict data (e.g. errors) is rendered
+    as rows of key and value.
+    """
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+    header = None
+    list_separator = '|'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Returns CSV document of data"""
+
+        if isinstance(data, dict):
+            data = [{'field': key, 'value': value}
+                    for key, value in data.items()]
+            header = ['field', 'value']
+        else:
+            header = None
+        return ''.join(self.stream(data, header)).encode(self.charset)
+
+    def stream(self, items, header=None):
+        """Yields CSV lines of items, header line first"""
+
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        header = header or self.header
+        header_written = False
+        for item in items:
+            if not header_written:
+                header = header or list(item)
+                writer.writerow(header)
+                header_written = True
+            writer.writerow([self.format_value(item.get(key))
+                             for key in header])
+            yield self.flush(buffer)
+
+        if not header_written and header:
+            writer.writerow(header)
+            yield self.flush(buffer)
+
+    @staticmethod
+    def flush(buffer):
+        """Returns text written to buffer and empties it"""
+
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    def format_value(self, value):
+        """Returns CSV cell of value"""
+
+        if value is None:
+            return ''
+        if isinstance(value, (list, tuple)):
+            return self.list_separator.join(str(item) for item in value)
+        if isinstance(value, dict):
+            return json.dumps(value, cls=JSONEncoder)
+        return value
@@ -0,0 +1,116 @@
+import re
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Case, FloatField, Func, Q, Value, When
+
+# Words ignored by InnoDB full-text index (innodb_ft_default_stopword)
+FULLTEXT_STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en',
+    'for', 'from', 'how', 'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or',
+    'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+    'will', 'with', 'und', 'www'
+))
+
+# Shortest word indexed by InnoDB full-text index (innodb_ft_min_token_size)
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+
+class Match(Func):
+    """MySQL full-text search relevance of column against boolean query
+
+    Notes
+    -----
+    Column must be covered by FULLTEXT index.
+    """
+
+    template = 'MATCH (%(expressions)s) AGAINST (%%s IN BOOLEAN MODE)'
+
+    def __init__(self, expression, search_query, **extra):
+        self.search_query = search_query
+        super(Match, self).__init__(expression, output_field=FloatField(),
+                                    **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        """Appends search query to parameters of compiled SQL"""
+
+        sql, params = super(Match, self).as_sql(compiler, connection,
+                                                **extra_context)
+        return sql, list(params) + [self.search_query]
+
+
+def get_search_terms(value):
+    """Returns lowercase words of search string"""
+
+    return re.findall(r'\w+', value.lower())
+
+
+def word_prefix_condition(field_name, term):
+    """Returns condition matching rows where any word of field starts with
+    term"""
+
+    return (Q(**{field_name + '__istartswith': term}) |
+            Q(**{field_name + '__icontains': ' ' + term}))
+
+
+def text_search(queryset, field_name, value):
+    """Filters queryset to rows where every word of value prefixes a word of
+    field and ranks them by relevance
+
+    Parameters
+    ----------
+    queryset : <django.db.models.QuerySet>
+        QuerySet to be filtered
+    field_name : str
+        Name of text field to search in
+    value : str
+        Search string
+
+    Returns
+    -------
+    <django.db.models.QuerySet> :
+        Filtered queryset annotated with '<field_name>_relevance'. Higher
+        value is more relevant row
+
+    Notes
+    -----
+    On MySQL FULLTEXT index of field is used. Words not covered by index
+    (stopwords, too short words) are matched with LIKE conditions.
+
+    On other databases, (e.g. SQLite for tests) words are matched with LIKE
+    conditions. Row where field starts with word is ranked higher.
+    """
+
+    terms = get_search_terms(value)
+    if not terms:
+        return queryset
+
+    annotation = field_name + '_relevance'
+    if connections[queryset.db].vendor == 'mysql':
+        indexed_terms = [term for term in terms
+                         if len(term) >= FULLTEXT_MIN_TOKEN_SIZE and
+                         term not in FULLTEXT_STOPWORDS]
+        terms = [term for term in terms if term not in indexed_terms]
+
+        if indexed_terms:
+            search_query = ' '.join('+{0}*'.format(term)
+                                    for term in indexed_terms)
+            queryset = queryset.annotate(**{
+                annotation: Match(field_name, search_query)
+            }).filter(**{annotation + '__gt': 0})
+        else:
+            queryset = queryset.annotate(**{
+                annotation: Value(1.0, output_field=FloatField())
+            })
+    else:
+        ranks = [Case(When(Q(**{field_name + '__istartswith': term}),
+                           then=Value(2.0)),
+                      default=Value(1.0), output_field=FloatField())
+                 for term in terms]
+        queryset = queryset.annotate(**{
+            annotation: reduce(lambda total, rank: total + rank, ranks)
+        })
+
+    for term in terms:
+        queryset = queryset.filter(word_prefix_condition(field_name, term))
+    return queryset
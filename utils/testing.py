@@ -0,0 +1,95 @@
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+
+from utils.perf import timed_queries
+from utils.querybudget import QueryRecorder, get_query_budget
+
+
+class QueryBudgetTestMixin(object):
+    """Mixin of TestCase failing tests which exceed query budgets
+
+    Notes
+    -----
+    Requests of test client are checked strictly by QueryBudgetMiddleware,
+    request exceeding budget of its view raises QueryBudgetExceeded with
+    report of its queries. Code other than views is checked with
+    'assertQueryBudget'.
+
+    Repeated queries (N+1) reported to 'utils.querybudget' logger by
+    requests within budget fail test too, unless test expects them with
+    'assertLogs'.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._query_budget_settings = override_settings(
+            QUERY_BUDGET_CHECKS=True, QUERY_BUDGET_STRICT=True)
+        cls._query_budget_settings.enable()
+        super(QueryBudgetTestMixin, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(QueryBudgetTestMixin, cls).tearDownClass()
+        cls._query_budget_settings.disable()
+
+    def _pre_setup(self):
+        super(QueryBudgetTestMixin, self)._pre_setup()
+        # Reports are kept by handler instead of being written, as by
+        # 'assertLogs'
+        logger = logging.getLogger('utils.querybudget')
+        handler = QueryReportHandler()
+        state = logger.handlers, logger.propagate
+        logger.handlers, logger.propagate = [handler], False
+        self.addCleanup(setattr, logger, 'handlers', state[0])
+        self.addCleanup(setattr, logger, 'propagate', state[1])
+        self.addCleanup(self.checkQueryReports, handler)
+
+    def checkQueryReports(self, handler):
+        """Fails if test logged query reports it doesn't expect"""
+
+        if handler.reports:
+            self.fail('Unexpected query reports:\n' + '\n'.join(
+                handler.reports))
+
+    @contextmanager
+    def assertQueryBudget(self, budget, method='GET'):
+        """Fails if block runs more queries than budget
+
+        Parameters
+        ----------
+        budget : int or view class
+            Maximum number of queries, or view whose budget for request
+            method applies
+
+        Notes
+        -----
+        Unlike 'assertNumQueries', fewer queries pass. Failure message
+        lists repeated queries (N+1) and serializer fields which ran them.
+        """
+
+        if not isinstance(budget, int):
+            view, budget = budget, get_query_budget(budget, method)
+            if budget is None:
+                self.fail('{0} has no query budget for {1}'.format(
+                    view.__name__, method))
+        recorder = QueryRecorder()
+        with timed_queries(connections.all(), recorder):
+            yield recorder
+        if recorder.count > budget:
+            self.fail(recorder.describe(budget, getattr(
+                settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 3)))
+
+
+class QueryReportHandler(logging.Handler):
+    """Handler keeping messages of query reports instead of writing them"""
+
+    def __init__(self):
+        super(QueryReportHandler, self).__init__(logging.WARNING)
+        self.reports = list()
+
+    def emit(self, record):
+        self.reports.append(self.format(record))
@@ -0,0 +1,42 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from utils.db.pool import get_pool_stats
+from utils.middleware import performance_stats
+
+
+class DatabasePoolStatsView(APIView):
+    """View to read statistics of database connection pools
+
+    Notes
+    -----
+    Only Admin user can read statistics. Statistics are of the process
+    serving request only, per database alias. Empty if DATABASE_POOL is
+    disabled.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        """Returns size, checkout and wait time statistics of pools"""
+
+        return Response(get_pool_stats())
+
+
+class PerformanceStatsView(APIView):
+    """View to read percentiles of request metrics per view
+
+    Notes
+    -----
+    Only Admin (staff member) user can read statistics. Statistics are of
+    requests instrumented by the process serving request only (see
+    utils.middleware.PerformanceMiddleware).
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        """Returns p50, p95 and p99 of request metrics per view"""
+
+        return Response(performance_stats.get_stats())